@@ -0,0 +1,4 @@
+"""
+Empty __init__.py so the Daily Planner service can be imported as a package
+(used by unified_host.py)
+"""
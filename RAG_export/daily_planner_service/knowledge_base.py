@@ -5,6 +5,7 @@ Knowledge base with daily routine and task templates for the Daily Planner RAG.
 DAILY_TEMPLATES = [
     {
         "category": "Routine Matinale",
+        "default_duration": 15,
         "prompt": "organiser ma matinée",
         "tasks": [
             "Se réveiller à 7h00",
@@ -18,6 +19,7 @@ DAILY_TEMPLATES = [
     },
     {
         "category": "Travail / Productivité",
+        "default_duration": 60,
         "prompt": "planifier ma journée de travail",
         "tasks": [
             "Identifier les 3 tâches les plus importantes (MITs)",
@@ -31,6 +33,7 @@ DAILY_TEMPLATES = [
     },
     {
         "category": "Santé / Sport",
+        "default_duration": 45,
         "prompt": "ajouter du sport à ma journée",
         "tasks": [
             "Préparer ses affaires de sport la veille",
@@ -42,6 +45,7 @@ DAILY_TEMPLATES = [
     },
     {
         "category": "Maison / Personnel",
+        "default_duration": 20,
         "prompt": "tâches ménagères aujourd'hui",
         "tasks": [
             "Faire une lessive",
@@ -53,6 +57,7 @@ DAILY_TEMPLATES = [
     },
     {
         "category": "Courses / Alimentation",
+        "default_duration": 30,
         "prompt": "organiser mes courses et repas",
         "tasks": [
             "Vérifier le contenu du frigo et des placards",
@@ -65,6 +70,7 @@ DAILY_TEMPLATES = [
     # English Daily Templates
     {
         "category": "Morning Routine",
+        "default_duration": 15,
         "prompt": "organize my morning",
         "tasks": [
             "Wake up at 7:00 AM",
@@ -78,6 +84,7 @@ DAILY_TEMPLATES = [
     },
     {
         "category": "Work / Productivity",
+        "default_duration": 60,
         "prompt": "plan my workday",
         "tasks": [
             "Identify top 3 Most Important Tasks (MITs)",
@@ -91,6 +98,7 @@ DAILY_TEMPLATES = [
     },
     {
         "category": "Errands / Household",
+        "default_duration": 20,
         "prompt": "daily chores and errands",
         "tasks": [
             "Do the laundry",
@@ -116,3 +124,18 @@ def get_daily_kb_text() -> list:
             text += f"{i}. {task}\n"
         texts.append(text)
     return texts
+
+def get_category_durations() -> dict:
+    """
+    Default task duration in minutes for each category (used by the scheduler).
+    """
+    return {template['category']: template['default_duration'] for template in DAILY_TEMPLATES}
+
+def get_daily_kb_documents() -> list:
+    """
+    Return (doc_id, text) pairs with ids stable across reordering and edits.
+    """
+    return [
+        (f"daily:{template['category']}:{template['prompt']}", text)
+        for template, text in zip(DAILY_TEMPLATES, get_daily_kb_text())
+    ]
@@ -2,10 +2,13 @@
 FastAPI backend for Daily Planner RAG (Port 8001)
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import os
 import sys
 from dotenv import load_dotenv
@@ -14,9 +17,82 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".env"))
 
-from rag_engine import DailyRAGEngine
+from rag_common.admission import AdmissionController, AdmissionRejected, AdmissionTicket
+from rag_common.deadline import TIMEOUT_HEADER, Deadline, RequestCancelled, RequestGuard
+from rag_common.log import RequestIdMiddleware, get_logger
+from rag_common.metrics import (
+    MetricsMiddleware, Stopwatch, engine_metrics, register_collector, render_metrics, stage_timer
+)
+from rag_common.profiler import ADMIN_TOKEN_HEADER, ProfilerBusy, SamplingProfiler
+from rag_common.rate_limiter import rate_limiter_stats
+from rag_common.response_parser import ResponseParseError
+from rag_common.startup import EngineLoader, timed
+from rag_common.streaming import SSE_HEADERS, format_sse
+
+groq_api_key = os.getenv("GROQ_API_KEY")
+if not groq_api_key:
+    raise ValueError("GROQ_API_KEY not found in environment variables.")
+
+logger = get_logger("daily.api")
+
+def _build_engine():
+    # Heavy imports (torch, MiniLM, Groq, ChromaDB) happen here, off the startup path
+    with timed(engine_loader.timings, "import"):
+        try:
+            from .rag_engine import DailyRAGEngine
+        except ImportError:
+            from rag_engine import DailyRAGEngine
+    return DailyRAGEngine(groq_api_key=groq_api_key)
+
+engine_loader = EngineLoader("Daily Planner RAG", _build_engine)
+register_collector("daily", lambda: engine_metrics(engine_loader.engine))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    engine_loader.start()
+    yield
+
+def get_rag_engine():
+    if engine_loader.engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Daily planner engine is not ready ({engine_loader.state})",
+            headers={"Retry-After": "5"}
+        )
+    return engine_loader.engine
+
+# Bounded in-flight generations and wait queue (None when disabled)
+admission = AdmissionController.from_env("daily")
 
-app = FastAPI(title="Daily Planner RAG API")
+# Per-request deadlines and cancellation on client disconnect
+request_guard = RequestGuard.from_env("daily")
+
+def request_deadline(http_request: Request, timeout_ms: Optional[int]) -> Deadline:
+    try:
+        return request_guard.deadline(http_request.headers.get(TIMEOUT_HEADER), timeout_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def cancelled(e: RequestCancelled) -> HTTPException:
+    # 504 past the deadline, 499 once the client is gone
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+async def admit(http_request: Request, deadline: Deadline) -> Optional[AdmissionTicket]:
+    # Fail fast with 429 instead of queueing without bound; stop waiting at the deadline
+    if admission is None:
+        return None
+    try:
+        return await request_guard.queue(http_request, deadline, admission.acquire, release)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except RequestCancelled as e:
+        raise cancelled(e)
+
+def release(ticket: Optional[AdmissionTicket]):
+    if ticket is not None:
+        ticket.release()
+
+app = FastAPI(title="Daily Planner RAG API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,24 +101,201 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, service="daily")
+app.add_middleware(RequestIdMiddleware)
 
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY not found in environment variables.")
+# Admin-only sampling profiler (None unless RAG_ADMIN_TOKEN is set)
+profiler = SamplingProfiler.from_env()
 
-rag_engine = DailyRAGEngine(groq_api_key=groq_api_key)
+BATCH_MAX_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", "50"))
 
 class PlanRequest(BaseModel):
     prompt: str
+    # Time budget in milliseconds (or the X-Request-Timeout-Ms header)
+    timeout_ms: Optional[int] = None
+
+class BatchPlanRequest(BaseModel):
+    prompts: List[str]
+    max_concurrency: Optional[int] = None
+    timeout_ms: Optional[int] = None
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "rag_engine": engine_loader.state}
+
+@app.get("/ready")
+async def readiness_check():
+    body = engine_loader.readiness()
+    if engine_loader.engine is None:
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 @app.post("/generate-plan")
-async def generate_plan(request: PlanRequest):
+async def generate_plan(request: PlanRequest, http_request: Request):
+    rag_engine = get_rag_engine()
+    deadline = request_deadline(http_request, request.timeout_ms)
+    ticket = await admit(http_request, deadline)
+    try:
+        result = await request_guard.run(
+            http_request, deadline, lambda: rag_engine.agenerate_daily_plan(request.prompt)
+        )
+        with stage_timer("serialize"):
+            return JSONResponse(content=result)
+    except RequestCancelled as e:
+        raise cancelled(e)
+    except ResponseParseError as e:
+        logger.error("Unparseable daily plan", extra={"error": str(e)})
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        logger.exception("Error generating daily plan")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        release(ticket)
+
+@app.post("/generate-plan/batch")
+async def generate_plan_batch(request: BatchPlanRequest, http_request: Request):
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="Prompts cannot be empty")
+    if len(request.prompts) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch size cannot exceed {BATCH_MAX_SIZE}")
+    if request.max_concurrency is not None and request.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    rag_engine = get_rag_engine()
+    deadline = request_deadline(http_request, request.timeout_ms)
+    ticket = await admit(http_request, deadline)
     try:
-        result = rag_engine.generate_daily_plan(request.prompt)
-        return result
+        results = await request_guard.run(
+            http_request, deadline, lambda: rag_engine.agenerate_daily_plans(request.prompts, request.max_concurrency)
+        )
+    except RequestCancelled as e:
+        raise cancelled(e)
     except Exception as e:
+        logger.exception("Error generating batch of daily plans")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        release(ticket)
+    with stage_timer("serialize"):
+        return JSONResponse(content={
+            "results": [
+                {"error": str(result)} if isinstance(result, Exception) else result
+                for result in results
+            ]
+        })
+
+@app.post("/generate-plan/stream")
+async def generate_plan_stream(request: PlanRequest, http_request: Request):
+    rag_engine = get_rag_engine()
+    deadline = request_deadline(http_request, request.timeout_ms)
+    ticket = await admit(http_request, deadline)
+    
+    async def event_stream():
+        serialize = Stopwatch("serialize")
+        try:
+            events = rag_engine.astream_daily_plan(request.prompt)
+            async for event, data in request_guard.stream(http_request, deadline, events):
+                with serialize:
+                    message = format_sse(event, data)
+                yield message
+        except Exception as e:
+            logger.error("Error streaming daily plan", extra={"error": str(e)})
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            serialize.observe()
+            release(ticket)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(release, ticket)
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_metrics("daily"), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def require_admin(http_request: Request):
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler disabled (set RAG_ADMIN_TOKEN)")
+    if not profiler.authorized(http_request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(http_request: Request, seconds: float = 10.0, interval_ms: float = 10.0):
+    require_admin(http_request)
+    try:
+        result = await profiler.profile(seconds, interval_ms / 1000.0)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(result["collapsed"], headers={
+        "Content-Disposition": f'attachment; filename="daily-{os.getpid()}.collapsed"',
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Overhead": f"{result['overhead']:.4f}"
+    })
+
+@app.get("/admin/profile/stats")
+async def admin_profile_stats(http_request: Request):
+    require_admin(http_request)
+    return profiler.stats()
+
+@app.get("/embeddings/stats")
+async def embedding_stats():
+    rag_engine = get_rag_engine()
+    return rag_engine.embedding_batcher.stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    rag_engine = get_rag_engine()
+    return {
+        "exact": rag_engine.response_cache.stats() if rag_engine.response_cache else {"enabled": False},
+        "semantic": rag_engine.semantic_cache.stats() if rag_engine.semantic_cache else {"enabled": False},
+        "inflight": rag_engine.inflight.stats()
+    }
+
+@app.get("/extractor/stats")
+async def extractor_stats():
+    rag_engine = get_rag_engine()
+    if rag_engine.strict_extractor is None:
+        return {"enabled": False}
+    return rag_engine.strict_extractor.stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return admission.stats()
+
+@app.get("/ratelimit/stats")
+async def ratelimit_stats():
+    return rate_limiter_stats()
+
+@app.get("/cancellation/stats")
+async def cancellation_stats():
+    return request_guard.stats()
+
+@app.get("/router/stats")
+async def router_stats():
+    rag_engine = get_rag_engine()
+    return rag_engine.router.stats()
+
+@app.get("/context/stats")
+async def context_stats():
+    rag_engine = get_rag_engine()
+    return rag_engine.context_builder.stats()
+
+@app.get("/parser/stats")
+async def parser_stats():
+    rag_engine = get_rag_engine()
+    return rag_engine.parser.stats()
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    workers = int(os.getenv("RAG_WORKERS", "1"))
+    if workers > 1:
+        # Load the model once, then fork workers sharing it copy-on-write
+        from rag_common.prefork import serve_prefork
+        serve_prefork(app, engine_loader, host="0.0.0.0", port=8001, workers=workers)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -2,61 +2,163 @@
 RAG Engine for Daily Planner.
 """
 
+import asyncio
 import os
-from typing import List, Dict
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple, Union
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
-from knowledge_base import get_daily_kb_text
+try:
+    from .knowledge_base import get_category_durations, get_daily_kb_documents
+    from .scheduler import DayScheduler
+    from .strict_extractor import StrictPlanExtractor
+except ImportError:
+    from knowledge_base import get_category_durations, get_daily_kb_documents
+    from scheduler import DayScheduler
+    from strict_extractor import StrictPlanExtractor
+from rag_common.compact_format import CompactTaskParser, compact_instructions, get_output_format
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_batcher import EmbeddingBatcher
+from rag_common.executor import run_blocking
+from rag_common.kb_artifact import ARTIFACT_DIRNAME, load_kb_artifact, load_kb_vectors
+from rag_common.kb_index import sync_chroma_index
+from rag_common.log import get_logger
+from rag_common.metrics import stage_timer
+from rag_common.model_router import TIERS, ModelRouter
+from rag_common.rate_limiter import BATCH, INTERACTIVE, get_rate_limiter, groq_client_kwargs
+from rag_common.retrievers import ChromaRetriever, NumpyRetriever, Retriever, get_retriever_backend
+from rag_common.response_cache import ResponseCache, normalize_prompt
+from rag_common.response_parser import ActivityPlanSchema, PlanSchema, ResponseParser
+from rag_common.semantic_cache import SemanticCache
+from rag_common.shared import create_embeddings, get_shared_resources
+from rag_common.singleflight import SingleFlight
+from rag_common.startup import timed
+from rag_common.streaming import IncrementalTaskParser
 from dotenv import load_dotenv
 
 load_dotenv()
 
+STRICT_CONTEXT = "L'utilisateur a fourni son propre plan. Extrais UNIQUEMENT ses tâches. NE PAS ajouter de suggestions."
+
+# Precomputed KB embeddings (python -m rag_common.kb_artifact)
+KB_ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ARTIFACT_DIRNAME)
+
+logger = get_logger("daily.engine")
+
+LANGUAGES = ("fr", "en")
+# Mode written into the system message, by is_custom_plan
+MODE_LABELS = {True: "STRICT (Extraire uniquement)", False: "SUGGESTION (RAG)"}
+
+
 class DailyRAGEngine:
     def __init__(self, groq_api_key: str):
         self.groq_api_key = groq_api_key
+        self.init_timings = {}
+        self.shared = get_shared_resources()
         
-        print("Initializing Daily Planner embeddings...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        logger.info("Initializing Daily Planner embeddings")
+        with timed(self.init_timings, "embeddings"):
+            if self.shared is not None:
+                self.embeddings = self.shared.embeddings()
+                self.embedding_batcher = self.shared.embedding_batcher()
+            else:
+                self.embeddings = create_embeddings()
+                self.embedding_batcher = EmbeddingBatcher.from_env(self.embeddings)
         
-        print("Initializing Daily Planner Groq LLM...")
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
-            model_name="llama-3.3-70b-versatile",
-            temperature=0.5,
-            max_tokens=1500
-        )
+        logger.info("Initializing Daily Planner Groq LLM")
+        with timed(self.init_timings, "llm"):
+            # Fast and slow model tiers, each behind its model's rate limiter
+            self.router = ModelRouter.from_env("daily", groq_api_key, temperature=0.5, max_tokens=1500)
+            self.llm = self.router.tiers["slow"].llm
+            repair_model = os.getenv("RAG_REPAIR_MODEL", "llama-3.1-8b-instant")
+            self.repair_llm = ChatGroq(
+                groq_api_key=groq_api_key,
+                model_name=repair_model,
+                temperature=0,
+                max_tokens=1500,
+                **groq_client_kwargs(get_rate_limiter(repair_model))
+            )
+        self.parser = ResponseParser("daily")
         
-        print("Initializing Daily Planner ChromaDB...")
-        self.vector_store = self._initialize_vector_store()
+        self.vector_store = None
+        self.index_stats = {}
+        with timed(self.init_timings, "retriever"):
+            self.retriever = self._initialize_retriever()
         
-        print("Daily Planner RAG Engine ready!")
-    
-    def _initialize_vector_store(self) -> Chroma:
-        kb_texts = get_daily_kb_text()
-        documents = [
-            Document(page_content=text, metadata={"source": f"daily_{i}"})
-            for i, text in enumerate(kb_texts)
-        ]
+        self.response_cache = ResponseCache.from_env("daily", "./response_cache_daily.db")
+        if self.response_cache is not None and any(self.index_stats.get(key) for key in ("added", "updated", "removed")):
+            self.response_cache.clear()
+        self.semantic_cache = SemanticCache.from_env()
+        # STRICT extractions depend on the exact items and times the user typed,
+        # so they are only matched semantically when a threshold is configured.
+        strict_threshold = os.getenv("RAG_SEMANTIC_CACHE_STRICT_THRESHOLD")
+        self.strict_semantic_threshold = float(strict_threshold) if strict_threshold else None
+        self.inflight = SingleFlight()
+        self.batch_concurrency = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+        # Parses user-written plans locally; the LLM only sees the unclear ones
+        self.strict_extractor = StrictPlanExtractor.from_env()
+        # Assigns SUGGESTION-mode times locally; the LLM only suggests activities
+        self.scheduler = DayScheduler.from_env(get_category_durations())
+        self.output_format = get_output_format()
+        # Relevance filtering, task dedupe and token budget of the SUGGESTION context
+        self.context_builder = ContextBuilder.from_env("daily", max_docs=5, max_tokens=600)
+        # One prebuilt chain per (language, is_custom_plan)
+        self.chains = self._build_chains()
         
-        persist_directory = "./chroma_db_daily"
+        logger.info("Daily Planner RAG Engine initialized", extra={"timings": self.init_timings})
+    
+    def warmup(self) -> Dict[str, float]:
+        """
+        One embedding and one retrieval so the first request is not cold.
+        """
+        timings = {}
+        with timed(timings, "warmup_embedding"):
+            query_embedding = self._embed_query("organiser ma matinée")
+        with timed(timings, "warmup_retrieval"):
+            self._retrieve_context(query_embedding, False)
+        return timings
+    
+    def _initialize_retriever(self) -> Retriever:
+        if get_retriever_backend() == "numpy":
+            logger.info("Initializing Daily Planner NumPy retriever")
+            kb_documents = get_daily_kb_documents()
+            return NumpyRetriever(
+                self.embeddings,
+                [text for _, text in kb_documents],
+                [{"source": doc_id} for doc_id, _ in kb_documents],
+                vectors=load_kb_vectors(KB_ARTIFACT_DIR, kb_documents, self.embeddings)
+            )
         
-        if os.path.exists(persist_directory):
+        logger.info("Initializing Daily Planner ChromaDB")
+        self.vector_store = self._initialize_vector_store()
+        return ChromaRetriever(self.vector_store)
+    
+    def _initialize_vector_store(self) -> Chroma:
+        if self.shared is not None:
+            persist_directory = self.shared.persist_directory
+            collection_name = "daily_templates"
             vector_store = Chroma(
-                persist_directory=persist_directory,
+                client=self.shared.chroma_client(),
+                collection_name=collection_name,
                 embedding_function=self.embeddings
             )
         else:
-            vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=persist_directory
+            persist_directory = "./chroma_db_daily"
+            collection_name = None
+            vector_store = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings
             )
+        # Only embed templates that are new or changed since the last start
+        self.index_stats = sync_chroma_index(
+            vector_store,
+            persist_directory,
+            get_daily_kb_documents(),
+            self.embeddings.model_name,
+            collection_name,
+            artifact=load_kb_artifact(KB_ARTIFACT_DIR, self.embeddings.model_name)
+        )
+        logger.info("Daily Planner knowledge base index synced", extra={"index": self.index_stats})
         
         return vector_store
     
@@ -65,26 +167,80 @@ class DailyRAGEngine:
             'journée', 'matin', 'soir', 'aujourd\'hui', 'faire', 'manger',
             'sport', 'travail', 'maison', 'routine', 'organiser', 'planifier'
         ]
-        text_lower = text.lower()
-        french_count = sum(1 for word in french_indicators if word in text_lower)
+        with stage_timer("language_detect"):
+            text_lower = text.lower()
+            french_count = sum(1 for word in french_indicators if word in text_lower)
         return 'fr' if french_count >= 1 else 'en'
     
-    def generate_daily_plan(self, user_prompt: str) -> Dict[str, any]:
-        language = self._detect_language(user_prompt)
-        
+    def _is_custom_plan(self, user_prompt: str) -> bool:
         # Detection logic for specific tasks
         list_indicators = ['-', '*', '1.', '•', '\n', ',', ';', ':']
         # Check if the user is providing specific tasks or just asking for a plan
-        is_custom_plan = any(ind in user_prompt for ind in list_indicators) or len(user_prompt.split()) > 15
-        
+        return any(ind in user_prompt for ind in list_indicators) or len(user_prompt.split()) > 15
+    
+    def _extract_locally(self, user_prompt: str, language: str, is_custom_plan: bool) -> Optional[Dict[str, Any]]:
+        """
+        STRICT-mode plan parsed without the LLM, or None when the local
+        extractor is disabled, not applicable or not confident enough.
+        """
+        if not is_custom_plan or self.strict_extractor is None:
+            return None
+        return self.strict_extractor.try_extract(user_prompt, language)
+    
+    def _embed_query(self, user_prompt: str) -> List[float]:
+        with stage_timer("embed"):
+            return self.embedding_batcher.embed(user_prompt)
+    
+    def _retrieve_context(self, query_embedding: Optional[List[float]], is_custom_plan: bool) -> str:
         if is_custom_plan:
-            context = "L'utilisateur a fourni son propre plan. Extrais UNIQUEMENT ses tâches. NE PAS ajouter de suggestions."
-        else:
-            relevant_docs = self.vector_store.similarity_search(user_prompt, k=3)
-            context = "\n\n".join([doc.page_content for doc in relevant_docs])
-        
-        mode_label = "STRICT (Extraire uniquement)" if is_custom_plan else "SUGGESTION (RAG)"
-        
+            return STRICT_CONTEXT
+        with stage_timer("retrieve"):
+            relevant_docs = self.retriever.search_by_vector(query_embedding, k=self.context_builder.max_docs)
+        with stage_timer("prompt_build"):
+            return self.context_builder.build(relevant_docs)
+    
+    def _retrieve_contexts(self, query_embeddings: List[List[float]]) -> List[str]:
+        """
+        Batched SUGGESTION-mode retrieval: one retriever query for all vectors.
+        """
+        with stage_timer("retrieve"):
+            results = self.retriever.search_by_vectors(query_embeddings, k=self.context_builder.max_docs)
+        with stage_timer("prompt_build"):
+            return [self.context_builder.build(relevant_docs) for relevant_docs in results]
+    
+    def _schedules_locally(self, is_custom_plan: bool) -> bool:
+        return not is_custom_plan and self.scheduler is not None
+    
+    def _output_fields(self, is_custom_plan: bool) -> List[str]:
+        """
+        Task fields, in line order, of the compact output format.
+        """
+        if self._schedules_locally(is_custom_plan):
+            return ["activity", "category", "time", "description"]
+        return ["time", "duration", "activity", "description"]
+    
+    def _build_chains(self) -> Dict[Tuple[str, bool, str], Any]:
+        return {
+            (language, is_custom_plan, tier): self._build_chain(language, is_custom_plan, tier)
+            for language in LANGUAGES
+            for is_custom_plan in (True, False)
+            for tier in TIERS
+        }
+    
+    def _chain(self, language: str, is_custom_plan: bool, tier: str = "slow"):
+        return self.chains[(language, is_custom_plan, tier)]
+    
+    def _tier_chains(self, language: str, is_custom_plan: bool) -> Dict[str, Any]:
+        return {tier: self.chains[(language, is_custom_plan, tier)] for tier in TIERS}
+    
+    def _route(self, user_prompt: str, language: str, is_custom_plan: bool) -> str:
+        return self.router.route(user_prompt, language, "strict" if is_custom_plan else "suggestion")
+    
+    def _build_chain(self, language: str, is_custom_plan: bool, tier: str = "slow"):
+        # The mode is baked into the system message so it stays byte-identical
+        # across requests of the same (language, mode) and prefix caching applies
+        if self._schedules_locally(is_custom_plan):
+            return self._build_activity_chain(language, is_custom_plan, tier)
         if language == 'fr':
             system_message = """Tu es un assistant qui organise des plannings.
 Ta mission est d'extraire ou de suggérer des tâches de manière structurée.
@@ -97,7 +253,8 @@ RÈGLES :
 3. NE JAMAIS ajouter "Se réveiller" ou "Boire de l'eau" SAUF si c'est dans le contexte ou demandé.
 4. Pour chaque tâche : 'time', 'duration', 'activity', 'description'. Utilise null si inconnu.
 
-Format JSON attendu :
+"""
+            answer_format = """Format JSON attendu :
 {{
     "title": "Ma journée : [Thème]",
     "tasks": [
@@ -121,7 +278,8 @@ RULES:
 3. NEVER add "Wake up" or "Drink water" UNLESS it's in the context or explicitly requested.
 4. For each task: 'time', 'duration', 'activity', 'description'. Use null if unknown.
 
-Expected JSON Format:
+"""
+            answer_format = """Expected JSON Format:
 {{
     "title": "My Day: [Theme]",
     "tasks": [
@@ -134,35 +292,383 @@ Expected JSON Format:
     ]
 }}"""
         
+        if self.output_format == "compact":
+            answer_format = compact_instructions(self._output_fields(is_custom_plan), language)
+        system_message = system_message.replace("{mode}", MODE_LABELS[is_custom_plan]) + answer_format
+        
+        prompt_template = ChatPromptTemplate.from_messages([
+            ("system", system_message),
+            ("user", "Context:\n{context}\n\nUser's day request: {user_prompt}")
+        ])
+        
+        return prompt_template | self.router.tiers[tier].llm
+    
+    def _build_activity_chain(self, language: str, is_custom_plan: bool, tier: str = "slow"):
+        """
+        SUGGESTION-mode chain asking only for activities; times and durations
+        are assigned afterwards by the local scheduler.
+        """
+        if language == 'fr':
+            system_message = """Tu es un assistant qui organise des plannings.
+Suggère les activités pertinentes pour la demande de l'utilisateur en t'appuyant sur le contexte.
+
+RÈGLES :
+1. N'invente NI horaires NI durées : ils sont calculés ensuite.
+2. 'time' : l'heure (HH:MM) uniquement si l'utilisateur l'a donnée pour cette activité, sinon null. Mets ces activités en premier.
+3. 'category' : la catégorie du contexte la plus proche.
+4. 'description' : quelques mots ou null.
+5. NE JAMAIS ajouter "Se réveiller" ou "Boire de l'eau" SAUF si c'est dans le contexte ou demandé.
+
+"""
+            answer_format = """Format JSON attendu :
+{{"title": "Ma journée : [Thème]", "tasks": [{{"activity": "Action", "description": "Détails ou null", "category": "Catégorie", "time": null}}]}}"""
+        else:
+            system_message = """You are a planning assistant.
+Suggest the activities relevant to the user's request, based on the context.
+
+RULES:
+1. Do NOT invent times or durations: they are computed afterwards.
+2. 'time': the time (HH:MM) only if the user gave one for this activity, otherwise null. List these activities first.
+3. 'category': the closest category from the context.
+4. 'description': a few words or null.
+5. NEVER add "Wake up" or "Drink water" UNLESS it's in the context or explicitly requested.
+
+"""
+            answer_format = """Expected JSON Format:
+{{"title": "My Day: [Theme]", "tasks": [{{"activity": "Action", "description": "Details or null", "category": "Category", "time": null}}]}}"""
+        
+        if self.output_format == "compact":
+            answer_format = compact_instructions(self._output_fields(is_custom_plan), language)
+        system_message += answer_format
+        
         prompt_template = ChatPromptTemplate.from_messages([
             ("system", system_message),
             ("user", "Context:\n{context}\n\nUser's day request: {user_prompt}")
         ])
         
-        chain = prompt_template | self.llm
-        response = chain.invoke({
-            "context": context, 
-            "user_prompt": user_prompt,
-            "mode": mode_label
-        })
-        
-        import json
-        try:
-            content = response.content.strip()
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].strip()
-            return json.loads(content)
-        except:
-            return {
-                "title": "Planning du jour",
-                "tasks": [
-                    {
-                        "time": "7h00",
-                        "duration": "N/A",
-                        "activity": "Organiser ma journée",
-                        "description": "Démarrer les activités"
-                    }
-                ]
-            }
+        return prompt_template | self.router.tiers[tier].llm
+    
+    def _finalize(self, result: Dict[str, Any], is_custom_plan: bool) -> Dict[str, Any]:
+        """
+        Give suggested activities their conflict-free time slots.
+        """
+        if self._schedules_locally(is_custom_plan):
+            return self.scheduler.schedule(result)
+        return result
+    
+    def _parse_kwargs(self, is_custom_plan: bool) -> Dict[str, Any]:
+        return {
+            "schema": ActivityPlanSchema if self._schedules_locally(is_custom_plan) else PlanSchema,
+            "default_title": "Planning du jour",
+            "compact_fields": self._output_fields(is_custom_plan),
+            "compact": self.output_format == "compact"
+        }
+    
+    def _parse_response(self, raw_content: str, is_custom_plan: bool) -> Dict[str, Any]:
+        # Repairs or re-asks once; raises ResponseParseError instead of inventing a plan
+        with stage_timer("parse"):
+            return self.parser.parse_or_reask(
+                raw_content, repair_llm=self.repair_llm, **self._parse_kwargs(is_custom_plan)
+            )
+    
+    async def _aparse_response(self, raw_content: str, is_custom_plan: bool) -> Dict[str, Any]:
+        with stage_timer("parse"):
+            return await self.parser.aparse_or_reask(
+                raw_content, repair_llm=self.repair_llm, **self._parse_kwargs(is_custom_plan)
+            )
+    
+    def _cache_key(self, user_prompt: str, language: str, is_custom_plan: bool) -> Optional[str]:
+        if self.response_cache is None:
+            return None
+        return self.response_cache.make_key(
+            user_prompt,
+            language=language,
+            mode="strict" if is_custom_plan else "suggestion",
+            local_schedule=self._schedules_locally(is_custom_plan),
+            output_format=self.output_format,
+            model=self.router.tiers[self._route(user_prompt, language, is_custom_plan)].model_name,
+            temperature=self.llm.temperature,
+            max_tokens=self.llm.max_tokens
+        )
+    
+    def _semantic_scope(self, language: str, is_custom_plan: bool, tier: str) -> str:
+        # Same model as the exact cache key: a fast-tier answer never serves a slow-tier request
+        mode = "strict" if is_custom_plan else "suggestion"
+        return f"{language}:{mode}:{self.router.tiers[tier].model_name}"
+    
+    def _semantic_threshold(self, is_custom_plan: bool) -> Optional[float]:
+        """
+        Threshold for the semantic cache in this mode, or None if it is not used.
+        """
+        if self.semantic_cache is None:
+            return None
+        return self.strict_semantic_threshold if is_custom_plan else self.semantic_cache.threshold
+    
+    def _remember_result(
+        self,
+        cache_key: Optional[str],
+        query_embedding: Optional[List[float]],
+        language: str,
+        is_custom_plan: bool,
+        tier: str,
+        result: Dict[str, Any]
+    ):
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+        if self._semantic_threshold(is_custom_plan) is not None:
+            self.semantic_cache.store(query_embedding, self._semantic_scope(language, is_custom_plan, tier), result)
+    
+    def generate_daily_plan(self, user_prompt: str) -> Dict[str, Any]:
+        language = self._detect_language(user_prompt)
+        is_custom_plan = self._is_custom_plan(user_prompt)
+        
+        local = self._extract_locally(user_prompt, language, is_custom_plan)
+        if local is not None:
+            return local
+        
+        cache_key = self._cache_key(user_prompt, language, is_custom_plan)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        # The query embedding serves both the semantic cache and retrieval
+        threshold = self._semantic_threshold(is_custom_plan)
+        query_embedding = None
+        if not is_custom_plan or threshold is not None:
+            query_embedding = self._embed_query(user_prompt)
+        if threshold is not None:
+            scope = self._semantic_scope(language, is_custom_plan, self._route(user_prompt, language, is_custom_plan))
+            cached = self.semantic_cache.lookup(query_embedding, scope, threshold)
+            if cached is not None:
+                return cached
+        
+        context = self._retrieve_context(query_embedding, is_custom_plan)
+        
+        tier = self._route(user_prompt, language, is_custom_plan)
+        response = self.router.invoke(self._tier_chains(language, is_custom_plan), {
+            "context": context,
+            "user_prompt": user_prompt
+        }, tier, context + user_prompt)
+        self.context_builder.record_usage(response)
+        
+        result = self._finalize(self._parse_response(response.content, is_custom_plan), is_custom_plan)
+        self._remember_result(cache_key, query_embedding, language, is_custom_plan, tier, result)
+        return result
+    
+    async def agenerate_daily_plan(self, user_prompt: str) -> Dict[str, Any]:
+        """
+        Async version of generate_daily_plan: retrieval runs in the bounded
+        executor and the LLM call is awaited instead of blocking the loop.
+        Concurrent identical requests are coalesced onto one generation.
+        """
+        language = self._detect_language(user_prompt)
+        is_custom_plan = self._is_custom_plan(user_prompt)
+        
+        local = self._extract_locally(user_prompt, language, is_custom_plan)
+        if local is not None:
+            return local
+        
+        mode = "strict" if is_custom_plan else "suggestion"
+        flight_key = f"{language}:{mode}:{normalize_prompt(user_prompt)}"
+        return await self.inflight.do(
+            flight_key, lambda: self._agenerate_daily_plan(user_prompt, language, is_custom_plan)
+        )
+    
+    async def _alookup_cached(
+        self,
+        user_prompt: str,
+        language: str,
+        is_custom_plan: bool
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[List[float]]]:
+        """
+        Check the exact cache, then the semantic one when the mode uses it.
+        Returns (cached result or None, cache key, query embedding or None).
+        """
+        cache_key = self._cache_key(user_prompt, language, is_custom_plan)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached, cache_key, None
+        
+        threshold = self._semantic_threshold(is_custom_plan)
+        query_embedding = None
+        if not is_custom_plan or threshold is not None:
+            with stage_timer("embed"):
+                query_embedding = await self.embedding_batcher.aembed(user_prompt)
+        if threshold is not None:
+            scope = self._semantic_scope(language, is_custom_plan, self._route(user_prompt, language, is_custom_plan))
+            cached = self.semantic_cache.lookup(query_embedding, scope, threshold)
+            if cached is not None:
+                return cached, cache_key, query_embedding
+        
+        return None, cache_key, query_embedding
+    
+    async def _agenerate_daily_plan(self, user_prompt: str, language: str, is_custom_plan: bool) -> Dict[str, Any]:
+        cached, cache_key, query_embedding = await self._alookup_cached(user_prompt, language, is_custom_plan)
+        if cached is not None:
+            return cached
+        
+        context = await run_blocking(self._retrieve_context, query_embedding, is_custom_plan)
+        
+        return await self._acomplete(user_prompt, language, is_custom_plan, context, cache_key, query_embedding)
+    
+    async def _acomplete(
+        self,
+        user_prompt: str,
+        language: str,
+        is_custom_plan: bool,
+        context: str,
+        cache_key: Optional[str],
+        query_embedding: Optional[List[float]],
+        priority: int = INTERACTIVE
+    ) -> Dict[str, Any]:
+        tier = self._route(user_prompt, language, is_custom_plan)
+        response = await self.router.ainvoke(self._tier_chains(language, is_custom_plan), {
+            "context": context,
+            "user_prompt": user_prompt
+        }, tier, context + user_prompt, priority)
+        self.context_builder.record_usage(response)
+        
+        result = self._finalize(await self._aparse_response(response.content, is_custom_plan), is_custom_plan)
+        await run_blocking(self._remember_result, cache_key, query_embedding, language, is_custom_plan, tier, result)
+        return result
+    
+    async def agenerate_daily_plans(
+        self,
+        user_prompts: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Generate plans for many prompts at once: one embedding pass and one
+        retrieval query for the batch, then Groq calls fanned out with a
+        concurrency cap. Returns one result or exception per prompt, in order.
+        """
+        results: List[Union[Dict[str, Any], Exception, None]] = [None] * len(user_prompts)
+        languages = [self._detect_language(prompt) for prompt in user_prompts]
+        custom = [self._is_custom_plan(prompt) for prompt in user_prompts]
+        cache_keys = [None] * len(user_prompts)
+        thresholds = [self._semantic_threshold(is_custom_plan) for is_custom_plan in custom]
+        
+        pending = []
+        for i, prompt in enumerate(user_prompts):
+            if not prompt or not prompt.strip():
+                results[i] = ValueError("Prompt cannot be empty")
+                continue
+            local = self._extract_locally(prompt, languages[i], custom[i])
+            if local is not None:
+                results[i] = local
+                continue
+            cache_keys[i] = self._cache_key(prompt, languages[i], custom[i])
+            cached = self.response_cache.get(cache_keys[i]) if cache_keys[i] is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+        
+        # Only SUGGESTION prompts (or STRICT ones using the semantic cache) need a vector
+        query_embeddings: Dict[int, List[float]] = {}
+        to_embed = [i for i in pending if not custom[i] or thresholds[i] is not None]
+        if to_embed:
+            with stage_timer("embed"):
+                embeddings = await run_blocking(self.embeddings.embed_documents, [user_prompts[i] for i in to_embed])
+            query_embeddings = dict(zip(to_embed, embeddings))
+        
+        to_generate = []
+        for i in pending:
+            cached = None
+            if thresholds[i] is not None:
+                cached = self.semantic_cache.lookup(
+                    query_embeddings[i],
+                    self._semantic_scope(languages[i], custom[i], self._route(user_prompts[i], languages[i], custom[i])),
+                    thresholds[i]
+                )
+            if cached is not None:
+                results[i] = cached
+            else:
+                to_generate.append(i)
+        
+        to_retrieve = [i for i in to_generate if not custom[i]]
+        contexts = dict(zip(
+            to_retrieve,
+            await run_blocking(self._retrieve_contexts, [query_embeddings[i] for i in to_retrieve])
+        ))
+        
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        
+        async def generate(i: int):
+            context = contexts.get(i, STRICT_CONTEXT)
+            async with semaphore:
+                try:
+                    mode = "strict" if custom[i] else "suggestion"
+                    flight_key = f"{languages[i]}:{mode}:{normalize_prompt(user_prompts[i])}"
+                    results[i] = await self.inflight.do(flight_key, lambda: self._acomplete(
+                        user_prompts[i], languages[i], custom[i], context,
+                        cache_keys[i], query_embeddings.get(i), BATCH
+                    ))
+                except Exception as e:
+                    results[i] = e
+        
+        await asyncio.gather(*(generate(i) for i in to_generate))
+        return results
+    
+    async def astream_daily_plan(self, user_prompt: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a plan while Groq generates it: yields ("title", str) and one
+        ("task", dict) per completed task, then ("done", result).
+
+        Streamed tasks of a locally scheduled plan carry provisional slots.
+        When the final schedule differs (a pinned task came after the tasks
+        it displaces), ("schedule", tasks) with every final slot comes
+        before "done".
+        """
+        language = self._detect_language(user_prompt)
+        is_custom_plan = self._is_custom_plan(user_prompt)
+        
+        cached = self._extract_locally(user_prompt, language, is_custom_plan)
+        cache_key = query_embedding = None
+        if cached is None:
+            cached, cache_key, query_embedding = await self._alookup_cached(user_prompt, language, is_custom_plan)
+        if cached is not None:
+            yield "title", cached.get("title")
+            for task in cached.get("tasks", []):
+                yield "task", task
+            yield "done", cached
+            return
+        
+        context = await run_blocking(self._retrieve_context, query_embedding, is_custom_plan)
+        tier = self._route(user_prompt, language, is_custom_plan)
+        if self.output_format == "compact":
+            parser = CompactTaskParser(self._output_fields(is_custom_plan))
+        else:
+            parser = IncrementalTaskParser()
+        # Streamed activities get their slot as soon as they are complete
+        day = self.scheduler.new_schedule() if self._schedules_locally(is_custom_plan) else None
+        streamed = []
+        chunk = None
+        async for chunk in self.router.astream(self._tier_chains(language, is_custom_plan), {
+            "context": context,
+            "user_prompt": user_prompt
+        }, tier, context + user_prompt):
+            for event, data in parser.feed(chunk.content):
+                if event == "task" and day is not None:
+                    data = day.place(data)
+                    streamed.append(data)
+                yield event, data
+        # Groq reports usage on the last chunk
+        self.context_builder.record_usage(chunk)
+        for event, data in parser.finish():
+            if event == "task" and day is not None:
+                data = day.place(data)
+                streamed.append(data)
+            yield event, data
+        
+        result = await self._aparse_response(parser.buffer, is_custom_plan)
+        if day is not None:
+            # Streamed slots are provisional (a pinned task may come last):
+            # "done" carries the same schedule as /generate-plan
+            result = self._finalize(result, is_custom_plan)
+            if result.get("tasks") != sorted(streamed, key=lambda task: task["time"]):
+                yield "schedule", result.get("tasks")
+        await run_blocking(self._remember_result, cache_key, query_embedding, language, is_custom_plan, tier, result)
+        yield "done", result
@@ -0,0 +1,233 @@
+"""
+Local time-slot scheduler for SUGGESTION-mode daily plans.
+
+The LLM only suggests activities (activity, description, category, and a
+time when the user gave one). This module assigns start times and
+durations:
+
+- tasks with a user-given time are pinned to it,
+- the others keep the model's order and fill the free slots of the day
+  window (RAG_DAY_START / RAG_DAY_END),
+- durations come from the task text ("(90 min)") or the category's
+  default_duration in DAILY_TEMPLATES,
+- a short break separates tasks, and a longer one follows long streaks,
+- pinned times outside the day window are moved into it (and logged).
+
+The resulting slots never overlap. When streaming, place() gives each task
+a provisional slot as it arrives; schedule() over the finished plan is the
+final answer, the same one /generate-plan returns. The two differ when a
+pinned task arrives after the tasks it displaces.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .strict_extractor import format_duration, format_time, parse_clock_time, parse_duration
+except ImportError:
+    from strict_extractor import format_duration, format_time, parse_clock_time, parse_duration
+from rag_common.log import get_logger
+
+# Shortest slot a task is squeezed into when the day is overbooked
+MIN_TASK_MINUTES = 10
+# Rounds of shrinking when the breaks push the last task past the day end
+_FIT_ROUNDS = 5
+
+logger = get_logger("daily.scheduler")
+
+
+def _parse_hhmm(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _round5(minutes: float) -> int:
+    return max(5, int(round(minutes / 5.0)) * 5)
+
+
+class DaySchedule:
+    """
+    Slots placed so far in one plan. place() can be called as tasks stream
+    in; each call returns the task with a slot that does not overlap the
+    ones placed before it, but later pinned tasks are not known yet.
+    """
+
+    def __init__(self, scheduler: "DayScheduler"):
+        self.scheduler = scheduler
+        self.busy: List[Tuple[int, int]] = []
+        self._cursor = scheduler.day_start
+
+    def _gap_after(self, end: int) -> int:
+        # Length of the streak of tasks ending at `end` (short gaps included)
+        scheduler = self.scheduler
+        streak = 0
+        boundary = end
+        for start, stop in sorted(self.busy, key=lambda slot: slot[1], reverse=True):
+            if stop > boundary:
+                continue
+            if boundary - stop >= scheduler.long_break_minutes:
+                break
+            streak += stop - start
+            boundary = start
+        return scheduler.long_break_minutes if streak >= scheduler.long_break_after else scheduler.break_minutes
+
+    def _first_free(self, earliest: int, duration: int, gap: bool) -> int:
+        candidate = earliest
+        for start, end in sorted(self.busy):
+            after = self._gap_after(end) if gap else 0
+            if end + after <= candidate:
+                continue
+            if candidate + duration + (self.scheduler.break_minutes if gap else 0) <= start:
+                break
+            candidate = end + after
+        return candidate
+
+    def place(self, task, duration: Optional[int] = None, pinned: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Schedule one suggested task (dict or plain activity string) after
+        the ones placed so far.
+        pinned is its start time already moved into the day window, if known.
+        """
+        task = task if isinstance(task, dict) else {"activity": str(task)}
+        if duration is None:
+            duration = self.scheduler.task_duration(task)
+        fixed = pinned
+        if fixed is None and self.scheduler.fixed_time(task) is not None:
+            fixed = self.scheduler.clamp(self.scheduler.fixed_time(task), duration, task)
+
+        if fixed is not None:
+            start = self._first_free(fixed, duration, gap=False)
+        else:
+            start = self._first_free(max(self._cursor, self.scheduler.day_start), duration, gap=True)
+            self._cursor = start + duration
+        self.busy.append((start, start + duration))
+
+        return {
+            "time": format_time(start),
+            "duration": format_duration(duration),
+            "activity": task.get("activity") or "",
+            "description": task.get("description")
+        }
+
+    def end(self) -> int:
+        return max((stop for _, stop in self.busy), default=self.scheduler.day_start)
+
+
+class DayScheduler:
+    def __init__(
+        self,
+        day_start: int = 8 * 60,
+        day_end: int = 22 * 60,
+        break_minutes: int = 10,
+        long_break_after: int = 120,
+        long_break_minutes: int = 20,
+        default_duration: int = 30,
+        category_durations: Optional[Dict[str, int]] = None
+    ):
+        """
+        Args:
+            day_start: Start of the day window, in minutes since midnight
+            day_end: End of the day window, in minutes since midnight
+            break_minutes: Gap between two tasks
+            long_break_after: Busy minutes after which the next gap is a long break
+            long_break_minutes: Length of the long break
+            default_duration: Duration of tasks of unknown category
+            category_durations: Default duration per knowledge base category
+        """
+        self.day_start = day_start
+        self.day_end = day_end
+        self.break_minutes = break_minutes
+        self.long_break_after = long_break_after
+        self.long_break_minutes = long_break_minutes
+        self.default_duration = default_duration
+        self.category_durations = {
+            category.lower(): minutes for category, minutes in (category_durations or {}).items()
+        }
+
+    @classmethod
+    def from_env(cls, category_durations: Optional[Dict[str, int]] = None) -> Optional["DayScheduler"]:
+        """
+        Build the scheduler from RAG_SCHEDULER_* / RAG_DAY_* environment variables.
+        Returns None when RAG_SCHEDULER_ENABLED is false.
+        """
+        if os.getenv("RAG_SCHEDULER_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            day_start=_parse_hhmm(os.getenv("RAG_DAY_START", "08:00")),
+            day_end=_parse_hhmm(os.getenv("RAG_DAY_END", "22:00")),
+            break_minutes=int(os.getenv("RAG_SCHEDULER_BREAK_MINUTES", "10")),
+            long_break_after=int(os.getenv("RAG_SCHEDULER_LONG_BREAK_AFTER", "120")),
+            long_break_minutes=int(os.getenv("RAG_SCHEDULER_LONG_BREAK_MINUTES", "20")),
+            default_duration=int(os.getenv("RAG_SCHEDULER_DEFAULT_MINUTES", "30")),
+            category_durations=category_durations
+        )
+
+    def fixed_time(self, task: Dict) -> Optional[int]:
+        value = task.get("time")
+        if not value or not isinstance(value, str):
+            return None
+        return parse_clock_time(value)
+
+    def clamp(self, start: int, duration: int, task: Dict) -> int:
+        """
+        Move a pinned start time into the day window.
+        """
+        latest = max(self.day_start, self.day_end - duration)
+        clamped = min(max(start, self.day_start), latest)
+        if clamped != start:
+            logger.warning("Pinned time outside the day window", extra={
+                "activity": task.get("activity"), "time": format_time(start), "moved_to": format_time(clamped)
+            })
+        return clamped
+
+    def task_duration(self, task: Dict) -> int:
+        for field in ("activity", "description"):
+            text = task.get(field)
+            if isinstance(text, str):
+                minutes = parse_duration(text)
+                if minutes:
+                    return _round5(minutes)
+        category = str(task.get("category") or "").lower()
+        return self.category_durations.get(category, self.default_duration)
+
+    def new_schedule(self) -> DaySchedule:
+        return DaySchedule(self)
+
+    def schedule(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Assign times and durations to every task of a suggested plan.
+        Pinned tasks are placed first; the rest are shortened proportionally
+        when they do not fit in the day window, breaks included.
+        """
+        tasks = [task if isinstance(task, dict) else {"activity": str(task)} for task in result.get("tasks", [])]
+        fixed = [task for task in tasks if self.fixed_time(task) is not None]
+        flexible = [task for task in tasks if self.fixed_time(task) is None]
+
+        wanted = {id(task): self.task_duration(task) for task in tasks}
+        pinned_minutes = sum(wanted[id(task)] for task in fixed)
+        total_wanted = sum(wanted[id(task)] for task in flexible)
+        free = self.day_end - self.day_start - pinned_minutes - self.break_minutes * len(tasks)
+        pins = {id(task): self.clamp(self.fixed_time(task), wanted[id(task)], task) for task in fixed}
+
+        for _ in range(_FIT_ROUNDS):
+            durations = dict(wanted)
+            if flexible and total_wanted > free > 0:
+                ratio = free / total_wanted
+                for task in flexible:
+                    durations[id(task)] = max(MIN_TASK_MINUTES, _round5(wanted[id(task)] * ratio))
+            day = self.new_schedule()
+            placed = [
+                day.place(task, durations[id(task)], pins[id(task)])
+                for task in sorted(fixed, key=lambda task: pins[id(task)])
+            ]
+            placed += [day.place(task, durations[id(task)]) for task in flexible]
+            # Long breaks are only known once placed: give their overflow back
+            overflow = day.end() - self.day_end
+            if overflow <= 0 or not flexible or free <= overflow:
+                break
+            free -= overflow
+        if overflow > 0:
+            logger.warning("Plan does not fit in the day window", extra={"overflow_minutes": overflow, "tasks": len(tasks)})
+
+        placed.sort(key=lambda task: task["time"])
+        return {"title": result.get("title"), "tasks": placed}
@@ -0,0 +1,340 @@
+"""
+Local rule-based extractor for STRICT-mode daily plans.
+
+When the user already lists their tasks, the LLM is only asked to split
+the list and pick out times and durations. This module does that locally
+for French and English ("7h00", "14:30", "9am", "de 9h à 11h", "45 min",
+"1h30", "pendant 2 heures", "half an hour"...) and returns the same
+{time, duration, activity, description} schema with a confidence score.
+The engine falls back to the LLM when the confidence is too low.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_BULLET = re.compile(r"^\s*(?:[-*•·▪►>–]+|\d{1,2}[.)]|[a-zA-Z][.)])\s+")
+
+# "7h", "7h00", "7 h 30", "14:30", "9am", "9:30 p.m."
+_TIME = (
+    r"(?<![\d:.,])(?P<{n}_h>[01]?\d|2[0-3])"
+    r"(?:\s*(?:h|:)\s*(?P<{n}_m>[0-5]\d)?(?:\s*(?P<{n}_ampm1>[ap]\.?m\.?))?"
+    r"|\s*(?P<{n}_ampm2>[ap]\.?m\.?))"
+    r"(?![^\W\d_])"
+)
+_NAMED_TIMES = {
+    "midi": (12, 0), "noon": (12, 0), "minuit": (0, 0), "midnight": (0, 0)
+}
+# Not inside a word: "après-midi" is no "midi"
+_NAMED_TIME = re.compile(r"(?<![\w-])(?P<word>midi|noon|minuit|midnight)(?![\w-])", re.IGNORECASE)
+# Times of day the rules cannot turn into a clock time ("l'après-midi", "tonight")
+_VAGUE_TIME = re.compile(
+    r"(?<![\w-])(?:midi|noon|minuit|midnight|matin|matinée|après-midi|soir|soirée|nuit"
+    r"|morning|afternoon|evening|night|tonight|o'clock)(?![\w-])",
+    re.IGNORECASE
+)
+_SINGLE_TIME = re.compile(_TIME.format(n="t"), re.IGNORECASE)
+_RANGE = re.compile(
+    r"(?:\b(?:de|from|between|entre)\s+)?"
+    + _TIME.format(n="a")
+    + r"\s*(?:-|–|—|\bà\b|\ba\b|\bto\b|\buntil\b|\btill\b|\bjusqu'?à\b|\band\b|\bet\b)\s*"
+    + _TIME.format(n="b"),
+    re.IGNORECASE
+)
+# "45 min", "2 heures", "1.5 hours", "1 h 30 min"
+_DURATION = re.compile(
+    r"(?<![\d:.,])(?P<value>\d+(?:[.,]\d+)?)\s*"
+    r"(?P<unit>heures?|hours?|hrs?|h|minutes?|mins?|mn)\b"
+    r"(?:\s*(?P<minutes>[0-5]?\d)\s*(?:minutes?|mins?|mn)?\b)?",
+    re.IGNORECASE
+)
+_NAMED_DURATIONS = [
+    (re.compile(r"\b(?:un\s+quart\s+d'heure|(?:a\s+)?quarter\s+(?:of\s+an\s+)?hour)\b", re.IGNORECASE), 15),
+    (re.compile(r"\b(?:une\s+)?demi[- ]heure\b|\bhalf\s+(?:an\s+)?hour\b", re.IGNORECASE), 30),
+    (re.compile(r"\b(?:une\s+heure|an\s+hour|one\s+hour)\b", re.IGNORECASE), 60),
+]
+# Words announcing a duration rather than a clock time
+_DURATION_CUE = re.compile(r"(?:\b(?:pendant|durant|during|for|environ|about)\s*|\(\s*)$", re.IGNORECASE)
+# "1h de lecture", "2h of reading": a duration, unless announced as a time ("à 8h de ...")
+_DURATION_FOLLOWER = re.compile(r"\s*(?:de|d'|of)\b", re.IGNORECASE)
+_TIME_CUE = re.compile(r"\b(?:à|a|at|vers|around|dès|by)\s*$", re.IGNORECASE)
+# Connectors left dangling once a time or duration is cut out
+_LEADING_CONNECTOR = re.compile(
+    r"(?:\b(?:à|a|at|de|from|vers|around|about|environ|pendant|durant|during|for|dès|by)\s*)$",
+    re.IGNORECASE
+)
+# Connectors left at the edge of an activity ("2 heures de piano" -> "de piano")
+_DANGLING_CONNECTOR = re.compile(
+    r"^(?:(?:de|d'|du|of|at|for|from|à|pendant|durant|during)\s+|d')|\s+(?:de|at|for|from|to|à|vers)$",
+    re.IGNORECASE
+)
+_EDGE_PUNCTUATION = " \t-–—:,.;/|~"
+# Structure score of an inline list whose items are not all timed (below
+# the default min_confidence: the LLM handles it)
+_UNTIMED_INLINE_SCORE = 0.5
+
+
+def _to_minutes(match: re.Match, name: str) -> int:
+    hours = int(match.group(f"{name}_h"))
+    minutes = int(match.group(f"{name}_m") or 0)
+    ampm = (match.group(f"{name}_ampm1") or match.group(f"{name}_ampm2") or "").lower().replace(".", "")
+    if ampm == "pm" and hours < 12:
+        hours += 12
+    elif ampm == "am" and hours == 12:
+        hours = 0
+    return hours * 60 + minutes
+
+
+def format_time(minutes: int) -> str:
+    return f"{(minutes // 60) % 24:02d}:{minutes % 60:02d}"
+
+
+def format_duration(minutes: int) -> str:
+    if minutes < 60:
+        return f"{minutes} min"
+    if minutes % 60 == 0:
+        return f"{minutes // 60}h"
+    return f"{minutes // 60}h{minutes % 60:02d}"
+
+
+def _duration_minutes(match: re.Match) -> int:
+    value = float(match.group("value").replace(",", "."))
+    unit = match.group("unit").lower()
+    if unit.startswith(("h", "hr")):
+        return int(round(value * 60)) + int(match.group("minutes") or 0)
+    return int(round(value))
+
+
+class _Item:
+    """
+    One task line being parsed: the text with matched spans cut out.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.spans: List[Tuple[int, int]] = []
+        self.time: Optional[int] = None
+        self.duration: Optional[int] = None
+
+    def free(self, start: int, end: int) -> bool:
+        return all(end <= s or start >= e for s, e in self.spans)
+
+    def consume(self, start: int, end: int):
+        # Take the connector in front of the span with it ("à 7h", "pendant 1h")
+        connector = _LEADING_CONNECTOR.search(self.text[:start])
+        if connector is not None:
+            start = connector.start()
+        self.spans.append((start, end))
+
+    def remainder(self) -> str:
+        text = self.text
+        for start, end in sorted(self.spans, reverse=True):
+            text = text[:start] + " " + text[end:]
+        text = re.sub(r"\(\s*\)", " ", text)
+        return " ".join(text.split()).strip(_EDGE_PUNCTUATION)
+
+
+def _parse_item(text: str) -> _Item:
+    item = _Item(text)
+
+    for match in _RANGE.finditer(text):
+        start, end = _to_minutes(match, "a"), _to_minutes(match, "b")
+        if end > start:
+            item.time, item.duration = start, end - start
+            item.consume(match.start(), match.end())
+            break
+
+    for match in _SINGLE_TIME.finditer(text):
+        if not item.free(match.start(), match.end()):
+            continue
+        before = text[:match.start()]
+        cued = _DURATION_CUE.search(before) is not None or (
+            _DURATION_FOLLOWER.match(text, match.end()) is not None and _TIME_CUE.search(before) is None
+        )
+        has_ampm = match.group("t_ampm1") or match.group("t_ampm2")
+        if item.time is None and (not cued or has_ampm):
+            item.time = _to_minutes(match, "t")
+        elif item.duration is None and not has_ampm:
+            # "8h sport 1h" or "pendant 1h30": hours and minutes of a duration
+            item.duration = int(match.group("t_h")) * 60 + int(match.group("t_m") or 0)
+        else:
+            continue
+        item.consume(match.start(), match.end())
+
+    for match in _NAMED_TIME.finditer(text):
+        if item.time is None and item.free(match.start(), match.end()):
+            hours, minutes = _NAMED_TIMES[match.group("word").lower()]
+            item.time = hours * 60 + minutes
+            item.consume(match.start(), match.end())
+
+    for match in _DURATION.finditer(text):
+        if item.duration is None and item.free(match.start(), match.end()):
+            item.duration = _duration_minutes(match)
+            item.consume(match.start(), match.end())
+
+    for pattern, minutes in _NAMED_DURATIONS:
+        match = pattern.search(text)
+        if match and item.duration is None and item.free(match.start(), match.end()):
+            item.duration = minutes
+            item.consume(match.start(), match.end())
+
+    return item
+
+
+def parse_clock_time(text: str) -> Optional[int]:
+    """
+    First clock time in text ("14:30", "7h", "2pm", "midi"), in minutes since midnight.
+    """
+    return _parse_item(text).time
+
+
+def parse_duration(text: str) -> Optional[int]:
+    """
+    Duration mentioned in text ("45 min", "(1h30)", "pendant 2 heures"), in minutes.
+    """
+    return _parse_item(text).duration
+
+
+def _split_items(user_prompt: str) -> Tuple[Optional[str], List[str], float]:
+    """
+    Split the prompt into task lines.
+
+    Returns:
+        (title line or None, items, structure score) where the score is 1.0
+        for one task per line and lower for inline separators (see
+        StrictPlanExtractor.extract for untimed inline items)
+    """
+    lines = [line.strip() for line in user_prompt.splitlines() if line.strip()]
+    title = None
+    if len(lines) > 1 and lines[0].endswith(":") and not _BULLET.match(lines[0]) \
+            and _SINGLE_TIME.search(lines[0]) is None:
+        # "Mon programme de demain :" introduces the list
+        title = lines[0].rstrip(": ").strip()
+        lines = lines[1:]
+
+    if len(lines) > 1:
+        return title, [_BULLET.sub("", line) for line in lines], 1.0
+
+    text = lines[0] if lines else ""
+    if ":" in text and not _SINGLE_TIME.search(text.split(":", 1)[0] + ":"):
+        # "Demain : sport à 7h, travail de 9h à 12h"
+        head, rest = text.split(":", 1)
+        if len(head.split()) <= 6 and re.search(r"[;,]", rest):
+            title, text = head.strip(), rest
+    for separator in (";", ",", " puis ", " then "):
+        parts = [part.strip() for part in text.split(separator) if part.strip()]
+        if len(parts) > 1:
+            return title, [_BULLET.sub("", part) for part in parts], 0.85
+    return title, [_BULLET.sub("", text)] if text else [], 0.3
+
+
+def _strip_connectors(activity: str) -> str:
+    while True:
+        stripped = _DANGLING_CONNECTOR.sub("", activity).strip(_EDGE_PUNCTUATION)
+        if stripped == activity or not stripped:
+            return activity
+        activity = stripped
+
+
+def _split_description(remainder: str) -> Tuple[str, Optional[str]]:
+    parenthesis = re.search(r"\(([^)]*)\)", remainder)
+    if parenthesis and parenthesis.group(1).strip():
+        activity = (remainder[:parenthesis.start()] + remainder[parenthesis.end():]).strip(_EDGE_PUNCTUATION)
+        return " ".join(activity.split()), parenthesis.group(1).strip()
+    for separator in (" : ", " - ", " – ", " — "):
+        if separator in remainder:
+            activity, description = remainder.split(separator, 1)
+            return activity.strip(_EDGE_PUNCTUATION), description.strip(_EDGE_PUNCTUATION) or None
+    return remainder, None
+
+
+def _item_score(activity: str) -> float:
+    if not activity:
+        return 0.0
+    score = 1.0
+    words = len(activity.split())
+    if words > 12:
+        score -= 0.5
+    elif words > 8:
+        score -= 0.2
+    if re.search(r"\d", activity) or _VAGUE_TIME.search(activity):
+        # A number or time of day we could not interpret: the LLM must place it
+        return 0.0
+    return max(score, 0.0)
+
+
+class StrictPlanExtractor:
+    def __init__(self, min_confidence: float = 0.75):
+        """
+        Args:
+            min_confidence: Below this score the engine asks the LLM instead
+        """
+        self.min_confidence = min_confidence
+        self._stats = {"local": 0, "llm_fallbacks": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["StrictPlanExtractor"]:
+        """
+        Build the extractor from RAG_STRICT_EXTRACTOR_* environment variables.
+        Returns None when RAG_STRICT_EXTRACTOR_ENABLED is false.
+        """
+        if os.getenv("RAG_STRICT_EXTRACTOR_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(min_confidence=float(os.getenv("RAG_STRICT_EXTRACTOR_MIN_CONFIDENCE", "0.75")))
+
+    def extract(self, user_prompt: str, language: str) -> Tuple[Dict[str, Any], float]:
+        """
+        Parse a user-written plan.
+
+        Returns:
+            (plan in the LLM's schema, confidence between 0 and 1)
+        """
+        title, lines, structure = _split_items(user_prompt)
+        tasks = []
+        scores = []
+        timed = True
+        for line in lines:
+            item = _parse_item(line)
+            activity, description = _split_description(item.remainder())
+            activity = _strip_connectors(activity)
+            activity = activity[:1].upper() + activity[1:]
+            scores.append(_item_score(activity))
+            timed = timed and (item.time is not None or bool(item.duration))
+            tasks.append({
+                "time": format_time(item.time) if item.time is not None else None,
+                "duration": format_duration(item.duration) if item.duration else None,
+                "activity": activity,
+                "description": description
+            })
+
+        if structure < 1.0 and not timed:
+            # "plan my day: work, exercise and read" is a sentence, not a schedule
+            structure = min(structure, _UNTIMED_INLINE_SCORE)
+        # One misread task spoils the plan: the weakest item decides
+        confidence = structure * min(scores) if scores else 0.0
+        if "?" in user_prompt:
+            # Questions usually ask for advice, not for a transcription
+            confidence *= 0.7
+        theme = title or ("Mon programme" if language == "fr" else "My Schedule")
+        title = f"Ma journée : {theme}" if language == "fr" else f"My Day: {theme}"
+        return {"title": title, "tasks": tasks}, round(confidence, 3)
+
+    def try_extract(self, user_prompt: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the local extraction, or None when the LLM should handle the prompt.
+        """
+        result, confidence = self.extract(user_prompt, language)
+        if confidence < self.min_confidence:
+            self._stats["llm_fallbacks"] += 1
+            return None
+        self._stats["local"] += 1
+        return result
+
+    def stats(self) -> Dict:
+        total = self._stats["local"] + self._stats["llm_fallbacks"]
+        return {
+            "enabled": True,
+            "min_confidence": self.min_confidence,
+            **self._stats,
+            "local_ratio": round(self._stats["local"] / total, 4) if total else 0.0
+        }
@@ -0,0 +1,3 @@
+"""
+Helpers shared by the To-Do List (rag_service) and Daily Planner services.
+"""
@@ -0,0 +1,181 @@
+"""
+Admission control for the generation endpoints.
+
+At most max_in_flight requests run at once; up to max_queue more wait in
+FIFO order for at most queue_timeout seconds. Anything beyond that is
+rejected right away with 429 and a Retry-After computed from the observed
+service rate, so a burst is shed at the door instead of piling work onto
+the Groq client and the CPU embedder until every request times out.
+
+A finished request hands its slot directly to the oldest waiter. Waiters
+that give up (deadline or client disconnect) leave the queue without
+taking a slot.
+"""
+
+import asyncio
+import collections
+import math
+import os
+import time
+from typing import Any, Dict, Optional
+
+from rag_common.histogram import Histogram
+
+_WAIT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+
+class AdmissionRejected(Exception):
+    """
+    The request was not admitted; retry_after is the suggested wait in seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}), retry in {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """
+    A granted slot. release() is idempotent, so it can be called both from
+    a streaming generator and from its fallback cleanup.
+    """
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._controller._release(time.monotonic() - self._admitted_at)
+
+
+class AdmissionController:
+    def __init__(self, name: str, max_in_flight: int = 16, max_queue: int = 64, queue_timeout: float = 10.0):
+        """
+        Args:
+            name: Service name used in log lines
+            max_in_flight: Requests processed concurrently
+            max_queue: Requests allowed to wait for a slot
+            queue_timeout: Longest wait for a slot, in seconds
+        """
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._in_flight = 0
+        self._waiters = collections.deque()
+        # Moving average of the time a request holds its slot
+        self._service_time: Optional[float] = None
+        self.wait_histogram = Histogram(_WAIT_BUCKETS)
+        self._stats = {
+            "admitted": 0,
+            "queued": 0,
+            "completed": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "abandoned": 0
+        }
+
+    @classmethod
+    def from_env(cls, name: str) -> Optional["AdmissionController"]:
+        """
+        Build from RAG_ADMISSION_* environment variables.
+        Returns None when RAG_ADMISSION_ENABLED is false.
+        """
+        if os.getenv("RAG_ADMISSION_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            name,
+            max_in_flight=int(os.getenv("RAG_ADMISSION_MAX_IN_FLIGHT", "16")),
+            max_queue=int(os.getenv("RAG_ADMISSION_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("RAG_ADMISSION_QUEUE_TIMEOUT", "10"))
+        )
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the current queue should have drained, from the observed
+        service rate (max_in_flight / mean service time).
+        """
+        service_time = self._service_time if self._service_time is not None else 1.0
+        rate = self.max_in_flight / max(service_time, 1e-3)
+        return max(1, min(60, math.ceil((len(self._waiters) + 1) / rate)))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self._stats[f"rejected_{reason}"] += 1
+        return AdmissionRejected(reason.replace("_", " "), self.retry_after())
+
+    async def acquire(self) -> AdmissionTicket:
+        """
+        Wait for a slot. Raises AdmissionRejected when the queue is full or
+        the wait exceeds queue_timeout.
+        """
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            self._stats["admitted"] += 1
+            self.wait_histogram.observe(0.0)
+            return AdmissionTicket(self)
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._stats["queued"] += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            if not (waiter.done() and not waiter.cancelled()):
+                raise self._reject("timeout")
+        except asyncio.CancelledError:
+            # Client went away while queued
+            self._abandon(waiter)
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over at the same moment: pass it on
+                self._release(None)
+            self._stats["abandoned"] += 1
+            raise
+        self._stats["admitted"] += 1
+        self.wait_histogram.observe(time.monotonic() - start)
+        return AdmissionTicket(self)
+
+    def _abandon(self, waiter: asyncio.Future):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiter.done():
+            waiter.cancel()
+
+    def _release(self, service_time: Optional[float]):
+        if service_time is not None:
+            self._stats["completed"] += 1
+            if self._service_time is None:
+                self._service_time = service_time
+            else:
+                self._service_time = 0.8 * self._service_time + 0.2 * service_time
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over: in_flight is unchanged
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats.update({
+            "in_flight": self._in_flight,
+            "queue_depth": len(self._waiters),
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "service_time_ms": round(self._service_time * 1000, 1) if self._service_time is not None else None,
+            "retry_after": self.retry_after(),
+            "wait_seconds": self.wait_histogram.snapshot()
+        })
+        return stats
@@ -0,0 +1,87 @@
+"""
+Per-request cost of preparing the LLM prompt: rebuilding the prompt
+template and chain on every call (the old path) versus looking up the
+chain prebuilt at engine init.
+
+Reports time and memory allocated per call (tracemalloc) for every
+(language, mode, model tier) chain, and checks that the system message, the prompt
+prefix providers can cache, is byte-identical across requests.
+
+Usage (from RAG_export/):
+    python -m rag_common.bench_hot_path [--calls 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from dotenv import load_dotenv
+
+
+def _measure(function: Callable, calls: int) -> Dict[str, float]:
+    function()
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [function() for _ in range(min(calls, 200))]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    return {"us": elapsed / calls * 1e6, "bytes": allocated / len(kept)}
+
+
+def _system_message(chain, context: str, user_prompt: str) -> str:
+    return chain.first.format_messages(context=context, user_prompt=user_prompt)[0].content
+
+
+def _build_engines(groq_api_key: str):
+    from rag_service.rag_engine import RAGEngine
+    from daily_planner_service.rag_engine import DailyRAGEngine
+    todo = RAGEngine(groq_api_key)
+    daily = DailyRAGEngine(groq_api_key)
+    rows = []
+    for key in todo.chains:
+        language, tier = key
+        rows.append((f"todo {language} {tier}", lambda key=key: todo._build_chain(*key), lambda key=key: todo._chain(*key)))
+    for key in daily.chains:
+        language, is_custom_plan, tier = key
+        rows.append((
+            f"daily {language} {'strict' if is_custom_plan else 'suggestion'} {tier}",
+            lambda key=key: daily._build_chain(*key),
+            lambda key=key: daily._chain(*key)
+        ))
+    return todo, daily, rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000, help="Calls measured per chain")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # The Groq client is only constructed, never called
+    todo, daily, rows = _build_engines(os.getenv("GROQ_API_KEY") or "unused")
+
+    print(f"{'chain':<31}{'rebuild us':>12}{'rebuild B':>12}{'prebuilt us':>13}{'prebuilt B':>12}")
+    for name, rebuild, lookup in rows:
+        old, new = _measure(rebuild, args.calls), _measure(lookup, args.calls)
+        print(f"{name:<31}{old['us']:>12.1f}{old['bytes']:>12.0f}{new['us']:>13.2f}{new['bytes']:>12.0f}")
+
+    identical = all(
+        _system_message(chain, "context A", "first request") == _system_message(chain, "context B", "second request")
+        for engine in (todo, daily)
+        for chain in engine.chains.values()
+    )
+    print(f"\nSystem message identical across requests: {'yes' if identical else 'NO'}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
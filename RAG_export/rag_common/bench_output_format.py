@@ -0,0 +1,113 @@
+"""
+Side-by-side benchmark of the JSON and compact LLM output formats.
+
+Runs the shipped knowledge base prompts through both engines in both
+formats (same retrieved context, caches bypassed) and reports output
+tokens, Groq latency and parse success per format. Needs GROQ_API_KEY.
+
+Usage (from RAG_export/):
+    python -m rag_common.bench_output_format [--runs 2] [--service rag_service]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from rag_common.compact_format import OUTPUT_FORMATS
+
+
+def _output_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    if usage.get("output_tokens"):
+        return usage["output_tokens"]
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage", {})
+    return token_usage.get("completion_tokens", 0)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _build_engine(service: str, groq_api_key: str):
+    if service == "rag_service":
+        from rag_service.knowledge_base import TASK_TEMPLATES
+        from rag_service.rag_engine import RAGEngine
+        return RAGEngine(groq_api_key), [template["prompt"] for template in TASK_TEMPLATES]
+    from daily_planner_service.knowledge_base import DAILY_TEMPLATES
+    from daily_planner_service.rag_engine import DailyRAGEngine
+    return DailyRAGEngine(groq_api_key), [template["prompt"] for template in DAILY_TEMPLATES]
+
+
+def _run_one(engine, service: str, prompt: str) -> Dict:
+    language = engine._detect_language(prompt)
+    inputs = {"user_prompt": prompt}
+    if service == "rag_service":
+        inputs["context"] = engine._retrieve_context(engine._embed_query(prompt))
+        chain = engine._chain(language)
+    else:
+        is_custom_plan = engine._is_custom_plan(prompt)
+        query_embedding = None if is_custom_plan else engine._embed_query(prompt)
+        inputs["context"] = engine._retrieve_context(query_embedding, is_custom_plan)
+        chain = engine._chain(language, is_custom_plan)
+
+    start = time.perf_counter()
+    response = chain.invoke(inputs)
+    latency = time.perf_counter() - start
+    # Parse without repair or re-ask: the format itself is being measured
+    if service == "rag_service":
+        parse_kwargs = engine._parse_kwargs()
+    else:
+        parse_kwargs = engine._parse_kwargs(is_custom_plan)
+    result, _ = engine.parser.try_parse(response.content, **parse_kwargs)
+    return {"tokens": _output_tokens(response), "latency": latency, "parsed": result is not None}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=1, help="Repetitions of every prompt per format")
+    parser.add_argument("--service", choices=["rag_service", "daily_planner_service"], action="append")
+    args = parser.parse_args()
+
+    load_dotenv()
+    groq_api_key = os.getenv("GROQ_API_KEY")
+    if not groq_api_key:
+        print("GROQ_API_KEY is not set")
+        return 1
+
+    for service in args.service or ["rag_service", "daily_planner_service"]:
+        engine, prompts = _build_engine(service, groq_api_key)
+        summary = {}
+        for output_format in OUTPUT_FORMATS:
+            engine.output_format = output_format
+            engine.chains = engine._build_chains()
+            samples = [_run_one(engine, service, prompt) for _ in range(args.runs) for prompt in prompts]
+            tokens = [sample["tokens"] for sample in samples]
+            latencies = [sample["latency"] for sample in samples]
+            summary[output_format] = {
+                "tokens": statistics.mean(tokens),
+                "latency": statistics.mean(latencies),
+                "p90": _percentile(latencies, 0.9),
+                "parsed": sum(sample["parsed"] for sample in samples) / len(samples)
+            }
+
+        print(f"\n[{service}] {len(prompts)} prompts x {args.runs} run(s)")
+        print(f"{'format':<10}{'out tokens':>12}{'latency s':>12}{'p90 s':>10}{'parsed':>9}")
+        for output_format, row in summary.items():
+            print(f"{output_format:<10}{row['tokens']:>12.1f}{row['latency']:>12.3f}{row['p90']:>10.3f}{row['parsed']:>9.0%}")
+        baseline, compact = summary["json"], summary["compact"]
+        if baseline["tokens"] and baseline["latency"]:
+            print(
+                f"compact vs json: {1 - compact['tokens'] / baseline['tokens']:.0%} fewer output tokens, "
+                f"{1 - compact['latency'] / baseline['latency']:.0%} lower latency"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
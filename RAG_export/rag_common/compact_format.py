@@ -0,0 +1,166 @@
+"""
+Compact line-oriented LLM output format.
+
+Pretty-printed JSON repeats every key ("time", "duration", "activity",
+"description") and its indentation on every task, and output tokens
+dominate generation latency. With RAG_OUTPUT_FORMAT=compact the model
+answers instead with a title line and one task per line:
+
+    TITLE|Ma journée : Sport
+    07:00|45 min|Yoga|-
+    12:30|1h|Déjeuner|avec Paul
+
+Fields are separated by "|" and "-" stands for null. To-do tasks have a
+single field. parse_compact() turns the lines back into the usual
+{"title": ..., "tasks": [...]} dict; JSON stays the default format.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+OUTPUT_FORMATS = ("json", "compact")
+SEPARATOR = "|"
+NULL = "-"
+TITLE_PREFIX = "TITLE" + SEPARATOR
+
+_BULLET = re.compile(r"^\s*(?:[-*•]\s+|\d{1,2}[.)]\s+)")
+_TITLE = re.compile(r"^\s*(?:TITLE|TITRE)\s*[|:]\s*", re.IGNORECASE)
+
+
+def get_output_format() -> str:
+    """
+    Output format selected by RAG_OUTPUT_FORMAT: "json" (default) or "compact".
+    """
+    output_format = os.getenv("RAG_OUTPUT_FORMAT", "json").lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown RAG_OUTPUT_FORMAT: {output_format}")
+    return output_format
+
+
+def compact_instructions(fields: Optional[List[str]], language: str) -> str:
+    """
+    Answer-format section of the system prompt for the compact format.
+
+    Args:
+        fields: Task fields in line order, or None for single-string tasks
+        language: 'fr' or 'en'
+    """
+    if language == 'fr':
+        if fields:
+            line = SEPARATOR.join(fields)
+            task_rule = f"Puis une ligne par tâche : {line} (mets {NULL} si inconnu, jamais de {SEPARATOR} dans un champ)."
+        else:
+            task_rule = "Puis une ligne par tâche, sans numéro ni puce."
+        return (
+            "Réponds UNIQUEMENT dans ce format texte (pas de JSON, pas de markdown) :\n"
+            f"Première ligne : {TITLE_PREFIX}<titre>\n"
+            f"{task_rule}\n"
+            "Rien d'autre."
+        )
+    if fields:
+        line = SEPARATOR.join(fields)
+        task_rule = f"Then one line per task: {line} (use {NULL} when unknown, never a {SEPARATOR} inside a field)."
+    else:
+        task_rule = "Then one line per task, without numbers or bullets."
+    return (
+        "Respond ONLY in this text format (no JSON, no markdown):\n"
+        f"First line: {TITLE_PREFIX}<title>\n"
+        f"{task_rule}\n"
+        "Nothing else."
+    )
+
+
+def _parse_title(line: str) -> Optional[str]:
+    match = _TITLE.match(line)
+    if match is None:
+        return None
+    return line[match.end():].strip()
+
+
+def _parse_task(line: str, fields: Optional[List[str]]) -> Optional[Any]:
+    line = _BULLET.sub("", line).strip()
+    if not line or line.startswith("```"):
+        return None
+    if not fields:
+        return line
+    values = [value.strip() for value in line.split(SEPARATOR, len(fields) - 1)]
+    if [value.lower() for value in values] == fields:
+        # The model echoed the header line
+        return None
+    values += [NULL] * (len(fields) - len(values))
+    task = {
+        field: None if value in ("", NULL) or value.lower() == "null" else value
+        for field, value in zip(fields, values)
+    }
+    if "activity" in task and task["activity"] is None:
+        # Not a task line (stray prose or a truncated line)
+        return None
+    return task
+
+
+def parse_compact(text: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Parse a compact answer. Returns None when it holds no task at all
+    (e.g. the model answered in JSON after all).
+    """
+    title = None
+    tasks = []
+    for line in text.strip().splitlines():
+        if not line.strip():
+            continue
+        line_title = _parse_title(line)
+        if line_title is not None:
+            title = title or line_title
+            continue
+        if line.lstrip().startswith(("{", "[", "}", "]", '"')):
+            return None
+        task = _parse_task(line, fields)
+        if task is not None:
+            tasks.append(task)
+    if not tasks:
+        return None
+    return {"title": title, "tasks": tasks}
+
+
+class CompactTaskParser:
+    """
+    Streaming counterpart of parse_compact with the IncrementalTaskParser
+    interface: feed() returns ("title", str) and ("task", item) events for
+    every completed line, finish() flushes the last one.
+    """
+
+    def __init__(self, fields: Optional[List[str]] = None):
+        self.fields = fields
+        self.buffer = ""
+        self._pos = 0
+        self._title_sent = False
+
+    def _line_events(self, line: str) -> List[Tuple[str, Any]]:
+        if not line.strip():
+            return []
+        title = _parse_title(line)
+        if title is not None:
+            if self._title_sent:
+                return []
+            self._title_sent = True
+            return [("title", title)]
+        if line.lstrip().startswith(("{", "[", "}", "]", '"')):
+            return []
+        task = _parse_task(line, self.fields)
+        return [("task", task)] if task is not None else []
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.buffer += chunk
+        events = []
+        newline = self.buffer.find("\n", self._pos)
+        while newline != -1:
+            events += self._line_events(self.buffer[self._pos:newline])
+            self._pos = newline + 1
+            newline = self.buffer.find("\n", self._pos)
+        return events
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        events = self._line_events(self.buffer[self._pos:])
+        self._pos = len(self.buffer)
+        return events
@@ -0,0 +1,59 @@
+"""
+Check that the NumPy and ChromaDB retrievers return the same top-k on the
+shipped knowledge bases.
+
+Usage (from RAG_export/):
+    python -m rag_common.compare_retrievers
+"""
+
+import importlib.util
+import os
+import sys
+import tempfile
+
+from rag_common.retrievers import ChromaRetriever, NumpyRetriever
+from rag_common.shared import create_embeddings
+
+SERVICES = {
+    "rag_service": ("TASK_TEMPLATES", "get_knowledge_base_text", 2),
+    "daily_planner_service": ("DAILY_TEMPLATES", "get_daily_kb_text", 3),
+}
+
+
+def load_knowledge_base(service: str):
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), service, "knowledge_base.py")
+    spec = importlib.util.spec_from_file_location(f"{service}_knowledge_base", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main() -> int:
+    from langchain_community.vectorstores import Chroma
+
+    # The model configuration the services run
+    embeddings = create_embeddings()
+    mismatches = 0
+    for service, (templates_name, text_fn, k) in SERVICES.items():
+        module = load_knowledge_base(service)
+        texts = getattr(module, text_fn)()
+        queries = [template["prompt"] for template in getattr(module, templates_name)]
+
+        with tempfile.TemporaryDirectory() as persist_directory:
+            chroma = ChromaRetriever(Chroma.from_texts(texts, embeddings, persist_directory=persist_directory))
+            numpy_retriever = NumpyRetriever(embeddings, texts)
+            vectors = embeddings.embed_documents(queries)
+            for query, expected, actual in zip(
+                queries, chroma.search_by_vectors(vectors, k), numpy_retriever.search_by_vectors(vectors, k)
+            ):
+                if [text for text, _ in expected] != [text for text, _ in actual]:
+                    mismatches += 1
+                    print(f"[{service}] top-{k} mismatch for: {query}")
+        print(f"[{service}] compared {len(queries)} queries (k={k})")
+
+    print("OK" if mismatches == 0 else f"{mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
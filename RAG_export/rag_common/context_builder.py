@@ -0,0 +1,215 @@
+"""
+Relevance-aware assembly of the knowledge base context sent to the LLM.
+
+Retrieval used to paste the top 2 (to-do) or 3 (daily) documents into the
+prompt whatever their score. ContextBuilder instead looks at up to
+max_docs scored results and:
+
+1. drops documents below min_score, or more than score_margin below the
+   best one (adaptive depth: one strong match is sent alone),
+2. drops task lines already present, or nearly so, in a better-ranked
+   document, and documents left without tasks,
+3. stops adding lines once the context reaches max_tokens.
+
+Token counts are estimated (about 4 UTF-8 bytes per token for the Llama
+tokenizer); the real prompt size is taken from the Groq usage metadata
+when the response carries it. stats() is served by /context/stats.
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+from rag_common.log import get_logger
+from rag_common.retrievers import SearchResult
+
+logger = get_logger("context")
+
+_TASK_LINE = re.compile(r"^\s*\d+[.)]\s+(.*\S)\s*$")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate Llama token count of text.
+    """
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+def _words(task: str) -> frozenset:
+    folded = unicodedata.normalize("NFKD", task.lower())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return frozenset(_WORD.findall(folded))
+
+
+def _similar(words: frozenset, other: frozenset, threshold: float) -> bool:
+    if not words or not other:
+        return words == other
+    return len(words & other) / len(words | other) >= threshold
+
+
+class ContextBuilder:
+    def __init__(
+        self,
+        name: str,
+        max_docs: int = 4,
+        min_score: float = 0.2,
+        score_margin: float = 0.15,
+        max_tokens: int = 500,
+        dedupe_threshold: float = 0.8
+    ):
+        """
+        Args:
+            name: Service name used in log lines
+            max_docs: Number of documents requested from the retriever
+            min_score: Minimum cosine similarity of a document
+            score_margin: Maximum distance below the best document's score
+            max_tokens: Token budget of the assembled context
+            dedupe_threshold: Word overlap (Jaccard) above which two tasks are duplicates
+        """
+        self.name = name
+        self.max_docs = max_docs
+        self.min_score = min_score
+        self.score_margin = score_margin
+        self.max_tokens = max_tokens
+        self.dedupe_threshold = dedupe_threshold
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "documents_retrieved": 0,
+            "documents_used": 0,
+            "below_threshold": 0,
+            "duplicate_tasks": 0,
+            "trimmed": 0,
+            "context_tokens": 0,
+            "prompt_tokens": 0,
+            "prompt_token_samples": 0
+        }
+
+    @classmethod
+    def from_env(cls, name: str, max_docs: int = 4, max_tokens: int = 500) -> "ContextBuilder":
+        """
+        Build from RAG_CONTEXT_* environment variables, with per-service defaults.
+        """
+        return cls(
+            name,
+            max_docs=int(os.getenv("RAG_CONTEXT_MAX_DOCS", str(max_docs))),
+            min_score=float(os.getenv("RAG_CONTEXT_MIN_SCORE", "0.2")),
+            score_margin=float(os.getenv("RAG_CONTEXT_SCORE_MARGIN", "0.15")),
+            max_tokens=int(os.getenv("RAG_CONTEXT_MAX_TOKENS", str(max_tokens))),
+            dedupe_threshold=float(os.getenv("RAG_CONTEXT_DEDUPE_THRESHOLD", "0.8"))
+        )
+
+    def _relevant(self, results: SearchResult) -> SearchResult:
+        if not results:
+            return []
+        floor = max(self.min_score, results[0][1] - self.score_margin)
+        return [(text, score) for text, score in results if score >= floor]
+
+    def _dedupe(self, texts: List[str]) -> Tuple[List[List[str]], int]:
+        """
+        Split documents into lines, removing tasks seen in an earlier document.
+
+        Returns:
+            (lines of every document that still has tasks, duplicate task count)
+        """
+        seen: List[frozenset] = []
+        documents = []
+        duplicates = 0
+        for text in texts:
+            lines = []
+            has_tasks = False
+            kept_tasks = 0
+            for line in text.strip().splitlines():
+                match = _TASK_LINE.match(line)
+                if match is None:
+                    if line.strip():
+                        lines.append(line.rstrip())
+                    continue
+                has_tasks = True
+                words = _words(match.group(1))
+                if any(_similar(words, other, self.dedupe_threshold) for other in seen):
+                    duplicates += 1
+                    continue
+                seen.append(words)
+                kept_tasks += 1
+                lines.append(f"{kept_tasks}. {match.group(1)}")
+            if kept_tasks or not has_tasks:
+                documents.append(lines)
+        return documents, duplicates
+
+    def build(self, results: SearchResult) -> str:
+        """
+        Assemble the prompt context from scored retriever results (best first).
+        """
+        relevant = self._relevant(results)
+        documents, duplicates = self._dedupe([text for text, _ in relevant])
+
+        blocks = []
+        tokens = 0
+        trimmed = False
+        for lines in documents:
+            block = []
+            for line in lines:
+                line_tokens = estimate_tokens(line + "\n")
+                if tokens + line_tokens > self.max_tokens:
+                    trimmed = True
+                    break
+                block.append(line)
+                tokens += line_tokens
+            if any(_TASK_LINE.match(line) for line in block) or (block and block == lines):
+                blocks.append("\n".join(block))
+            if trimmed:
+                break
+        context = "\n\n".join(blocks)
+        context_tokens = estimate_tokens(context)
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["documents_retrieved"] += len(results)
+            self._stats["documents_used"] += len(blocks)
+            self._stats["below_threshold"] += len(results) - len(relevant)
+            self._stats["duplicate_tasks"] += duplicates
+            self._stats["trimmed"] += int(trimmed)
+            self._stats["context_tokens"] += context_tokens
+        logger.debug("Context built", extra={
+            "service": self.name, "documents_used": len(blocks), "documents_retrieved": len(results),
+            "context_tokens": context_tokens, "best_score": round(results[0][1], 3) if results else None
+        })
+        return context
+
+    def record_usage(self, message: Optional[Any]):
+        """
+        Log the prompt tokens actually sent, from the LLM response usage metadata.
+        """
+        usage = getattr(message, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens")
+        if not prompt_tokens:
+            token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage", {})
+            prompt_tokens = token_usage.get("prompt_tokens")
+        if not prompt_tokens:
+            return
+        with self._lock:
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["prompt_token_samples"] += 1
+        logger.debug("Prompt tokens sent", extra={"service": self.name, "prompt_tokens": prompt_tokens})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        requests = stats["requests"]
+        samples = stats.pop("prompt_token_samples")
+        stats["avg_documents_used"] = round(stats["documents_used"] / requests, 2) if requests else 0.0
+        stats["avg_context_tokens"] = round(stats["context_tokens"] / requests, 1) if requests else 0.0
+        stats["avg_prompt_tokens"] = round(stats["prompt_tokens"] / samples, 1) if samples else 0.0
+        stats["config"] = {
+            "max_docs": self.max_docs,
+            "min_score": self.min_score,
+            "score_margin": self.score_margin,
+            "max_tokens": self.max_tokens
+        }
+        return stats
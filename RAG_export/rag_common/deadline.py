@@ -0,0 +1,343 @@
+"""
+Per-request deadlines and cancellation when the client goes away.
+
+A request may carry a time budget in milliseconds, in the
+X-Request-Timeout-Ms header or the timeout_ms body field (capped by
+RAG_REQUEST_TIMEOUT_MAX_MS; RAG_REQUEST_TIMEOUT_MS applies when neither is
+given). RequestGuard runs the work of the request as a task and cancels it
+as soon as the deadline passes or the client disconnects, so the Groq call
+in flight is aborted and queued work (admission queue, rate-limit queue,
+embedding batch, executor) is dropped instead of completing for nobody.
+
+The Deadline travels with the task in a context variable: the code it runs
+reads it through current_deadline(). The model router uses it to report
+the tokens an aborted call will not generate.
+
+Savings are estimates. An aborted call saves its expected completion
+tokens minus what it already produced; a request cancelled before reaching
+the LLM saves the mean tokens of a completed request. Seconds saved are
+the mean duration of a completed request minus the time already spent.
+"""
+
+import asyncio
+import contextvars
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from rag_common.log import get_logger
+
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("rag_deadline", default=None)
+_END = object()
+
+logger = get_logger("deadline")
+
+
+class RequestCancelled(Exception):
+    """
+    The request was stopped before completion; status_code is the HTTP
+    status to answer with.
+    """
+
+    status_code = 500
+
+
+class DeadlineExceeded(RequestCancelled):
+    status_code = 504
+
+
+class ClientDisconnected(RequestCancelled):
+    # nginx's "client closed request"; nobody reads it
+    status_code = 499
+
+
+class Deadline:
+    def __init__(self, timeout: Optional[float], guard: Optional["RequestGuard"] = None):
+        """
+        Args:
+            timeout: Seconds the request may take (None: no deadline)
+            guard: RequestGuard collecting the savings of this request
+        """
+        self.started_at = time.monotonic()
+        self.expires_at = self.started_at + timeout if timeout is not None else None
+        self.guard = guard
+        # "deadline" or "disconnect" once the request is being cancelled
+        self.reason: Optional[str] = None
+        self.llm_calls = 0
+        self.tokens_used = 0
+        self.tokens_saved = 0
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def save_tokens(self, tokens: int):
+        """
+        Record tokens not spent because of the cancellation.
+        """
+        if tokens <= 0:
+            return
+        self.tokens_saved += tokens
+        if self.guard is not None:
+            self.guard._stats["tokens_saved"] += tokens
+
+
+def current_deadline() -> Optional[Deadline]:
+    """
+    Deadline of the request being served by the current task, if any.
+    """
+    return _current.get()
+
+
+def bind_deadline(deadline: Optional[Deadline]):
+    """
+    Set the deadline of the current context (e.g. a fresh one for a task).
+    """
+    _current.set(deadline)
+
+
+class RequestGuard:
+    def __init__(
+        self,
+        name: str,
+        default_timeout: Optional[float] = None,
+        max_timeout: float = 120.0,
+        watch_disconnect: bool = True,
+        poll_interval: float = 0.25
+    ):
+        """
+        Args:
+            name: Service name used in log lines
+            default_timeout: Seconds allowed when the request sets no deadline (None: unlimited)
+            max_timeout: Upper bound on any requested deadline, in seconds
+            watch_disconnect: Cancel the work when the client disconnects
+            poll_interval: Seconds between two disconnect checks
+        """
+        self.name = name
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        self.watch_disconnect = watch_disconnect
+        self.poll_interval = poll_interval
+        # Moving averages over completed requests, for the savings estimates
+        self._request_seconds: Optional[float] = None
+        self._request_tokens: Optional[float] = None
+        self._stats = {
+            "requests": 0,
+            "with_deadline": 0,
+            "completed": 0,
+            "cancelled_deadline": 0,
+            "cancelled_disconnect": 0,
+            "cancelled_before_llm": 0,
+            "tokens_saved": 0,
+            "seconds_saved": 0.0
+        }
+
+    @classmethod
+    def from_env(cls, name: str) -> "RequestGuard":
+        """
+        Build from RAG_REQUEST_TIMEOUT_* / RAG_CANCEL_ON_DISCONNECT / RAG_DISCONNECT_POLL_MS.
+        """
+        default_ms = float(os.getenv("RAG_REQUEST_TIMEOUT_MS", "0"))
+        return cls(
+            name,
+            default_timeout=default_ms / 1000.0 if default_ms > 0 else None,
+            max_timeout=float(os.getenv("RAG_REQUEST_TIMEOUT_MAX_MS", "120000")) / 1000.0,
+            watch_disconnect=os.getenv("RAG_CANCEL_ON_DISCONNECT", "true").lower() not in ("0", "false", "no"),
+            poll_interval=float(os.getenv("RAG_DISCONNECT_POLL_MS", "250")) / 1000.0
+        )
+
+    def deadline(self, header_value: Optional[str], body_timeout_ms: Optional[int]) -> Deadline:
+        """
+        Deadline of a new request from its header and body field (the body
+        wins). Raises ValueError on a malformed or non-positive timeout.
+        """
+        timeout_ms: Optional[float] = body_timeout_ms
+        if timeout_ms is None and header_value:
+            try:
+                timeout_ms = float(header_value)
+            except ValueError:
+                raise ValueError(f"{TIMEOUT_HEADER} must be a number of milliseconds")
+        if timeout_ms is not None and timeout_ms <= 0:
+            raise ValueError("The request timeout must be positive")
+
+        timeout = timeout_ms / 1000.0 if timeout_ms is not None else self.default_timeout
+        if timeout is not None:
+            timeout = min(timeout, self.max_timeout)
+            self._stats["with_deadline"] += 1
+        self._stats["requests"] += 1
+        return Deadline(timeout, self)
+
+    def _start(self, deadline: Deadline, awaitable: Awaitable) -> asyncio.Future:
+        # The task copies the context, and with it the deadline
+        token = _current.set(deadline)
+        try:
+            return asyncio.ensure_future(awaitable)
+        finally:
+            _current.reset(token)
+
+    async def _supervise(self, request, deadline: Deadline, future: asyncio.Future) -> Optional[str]:
+        """
+        Wait for future; return why the request must stop first, if it must.
+        """
+        while not future.done():
+            timeout = self.poll_interval if self.watch_disconnect else None
+            remaining = deadline.remaining()
+            if remaining is not None:
+                if remaining <= 0:
+                    return "deadline"
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            await asyncio.wait([future], timeout=timeout)
+            if future.done():
+                return None
+            if deadline.expired():
+                return "deadline"
+            if self.watch_disconnect and await request.is_disconnected():
+                return "disconnect"
+        return None
+
+    async def _abort(self, deadline: Deadline, task: asyncio.Future, reason: str) -> RequestCancelled:
+        deadline.reason = reason
+        task.cancel()
+        self._stats[f"cancelled_{reason}"] += 1
+        if self._request_seconds is not None:
+            self._stats["seconds_saved"] += max(0.0, self._request_seconds - deadline.elapsed())
+        # Let the task unwind (abort the LLM call, leave queues) before answering
+        await asyncio.wait([task])
+        # Checked after the unwind, which reports the LLM calls of shared work it left
+        if deadline.llm_calls == 0:
+            # The whole LLM call was avoided
+            self._stats["cancelled_before_llm"] += 1
+            if self._request_tokens is not None:
+                deadline.save_tokens(round(self._request_tokens))
+        logger.info("Request cancelled", extra={
+            "service": self.name, "reason": reason,
+            "elapsed_seconds": round(deadline.elapsed(), 3), "tokens_saved": deadline.tokens_saved
+        })
+        if reason == "deadline":
+            return DeadlineExceeded(f"Deadline exceeded after {deadline.elapsed():.2f}s")
+        return ClientDisconnected("Client disconnected")
+
+    def _completed(self, deadline: Deadline):
+        self._stats["completed"] += 1
+        seconds, tokens = deadline.elapsed(), deadline.tokens_used
+        if self._request_seconds is None:
+            self._request_seconds, self._request_tokens = seconds, tokens
+        else:
+            self._request_seconds = 0.8 * self._request_seconds + 0.2 * seconds
+            self._request_tokens = 0.8 * self._request_tokens + 0.2 * tokens
+
+    async def _run(
+        self,
+        request,
+        deadline: Deadline,
+        func: Callable[[], Awaitable[Any]],
+        release: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        task = self._start(deadline, func())
+        try:
+            reason = await self._supervise(request, deadline, task)
+        except asyncio.CancelledError:
+            # The server dropped the request itself
+            await self._abort(deadline, task, "disconnect")
+            self._discard(task, release)
+            raise
+        if reason is not None:
+            error = await self._abort(deadline, task, reason)
+            self._discard(task, release)
+            raise error
+        return task.result()
+
+    @staticmethod
+    def _discard(task: asyncio.Future, release: Optional[Callable[[Any], None]]):
+        # The work may have completed while the supervisor was deciding to
+        # abort (e.g. awaiting is_disconnected): give its result back
+        if release is not None and not task.cancelled() and task.exception() is None:
+            release(task.result())
+
+    async def queue(
+        self,
+        request,
+        deadline: Deadline,
+        func: Callable[[], Awaitable[Any]],
+        release: Optional[Callable[[Any], None]] = None
+    ) -> Any:
+        """
+        Wait for a resource (e.g. an admission slot) under the request's
+        deadline. Raises DeadlineExceeded or ClientDisconnected; a resource
+        obtained just as the request was cancelled is handed to release().
+        """
+        return await self._run(request, deadline, func, release)
+
+    async def run(self, request, deadline: Deadline, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run the work of the request, func(), cancelling it when the deadline
+        passes or the client disconnects.
+
+        Args:
+            request: Starlette request, polled for disconnect
+            deadline: Deadline of the request
+            func: Zero-argument coroutine factory doing the work
+
+        Returns:
+            The result of func()
+        """
+        result = await self._run(request, deadline, func)
+        self._completed(deadline)
+        return result
+
+    async def stream(self, request, deadline: Deadline, events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """
+        Re-yield events, cancelling their producer when the deadline passes
+        or the client disconnects.
+        """
+        items: asyncio.Queue = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for item in events:
+                    items.put_nowait(item)
+            finally:
+                items.put_nowait(_END)
+
+        task = self._start(deadline, produce())
+        try:
+            while True:
+                getter = asyncio.ensure_future(items.get())
+                try:
+                    reason = await self._supervise(request, deadline, getter)
+                finally:
+                    if not getter.done():
+                        getter.cancel()
+                if reason is not None:
+                    raise await self._abort(deadline, task, reason)
+                item = getter.result()
+                if item is _END:
+                    break
+                yield item
+            await task
+            self._completed(deadline)
+        finally:
+            if not task.done():
+                # The consumer went away (client disconnect seen by the server)
+                await self._abort(deadline, task, "disconnect")
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["seconds_saved"] = round(stats["seconds_saved"], 3)
+        stats.update({
+            "default_timeout": self.default_timeout,
+            "max_timeout": self.max_timeout,
+            "watch_disconnect": self.watch_disconnect,
+            "mean_request_seconds": round(self._request_seconds, 3) if self._request_seconds is not None else None,
+            "mean_request_tokens": round(self._request_tokens) if self._request_tokens is not None else None
+        })
+        return stats
@@ -0,0 +1,161 @@
+"""
+Dynamic micro-batching of query embeddings across concurrent requests.
+
+Every request used to run its own single-sentence forward pass through
+all-MiniLM-L6-v2. The batcher collects the queries that arrive within a
+few milliseconds (or up to max_batch_size of them), runs one batched
+embed_documents call on a background thread and hands each caller its
+vector. Sync callers block on a future, async callers await it.
+Recently embedded texts are served from a small LRU without a forward pass.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List
+
+from rag_common.histogram import Histogram
+from rag_common.prefork import register_after_fork
+
+
+class EmbeddingBatcher:
+    def __init__(
+        self,
+        embeddings,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        cache_size: int = 1024
+    ):
+        """
+        Args:
+            embeddings: LangChain embeddings object (embed_documents is used)
+            max_batch_size: Maximum queries per forward pass
+            max_wait_ms: How long the first query of a batch waits for company
+            cache_size: Number of recent query vectors kept (0 disables the cache)
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        # Seconds from submission to result
+        self.latency = Histogram([0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0])
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        register_after_fork(self._after_fork)
+
+    @classmethod
+    def from_env(cls, embeddings) -> "EmbeddingBatcher":
+        return cls(
+            embeddings,
+            max_batch_size=int(os.getenv("RAG_EMBED_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.getenv("RAG_EMBED_BATCH_WAIT_MS", "5")),
+            cache_size=int(os.getenv("RAG_EMBED_CACHE_SIZE", "1024"))
+        )
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text for embedding and return a future of its vector.
+        """
+        future = Future()
+        if self.cache_size:
+            with self._lock:
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    self._cache_hits += 1
+                    future.set_result(vector)
+                    return future
+                self._cache_misses += 1
+        self._ensure_worker()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def embed(self, text: str) -> List[float]:
+        """
+        Blocking embedding of one query through the batcher.
+        """
+        return self.submit(text).result()
+
+    async def aembed(self, text: str) -> List[float]:
+        """
+        Awaitable embedding of one query through the batcher.
+        """
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+            "cache": {
+                "size": len(self._cache),
+                "hits": self._cache_hits,
+                "misses": self._cache_misses
+            },
+            "batch_size": self.batch_sizes.snapshot(),
+            "latency_seconds": self.latency.snapshot()
+        }
+
+    def _after_fork(self):
+        # The background thread does not survive fork(); the child starts its own
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # Callers that gave up (cancelled futures) are dropped from the pass
+        batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.batch_sizes.observe(len(batch))
+        try:
+            vectors = self.embeddings.embed_documents([text for text, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        now = time.perf_counter()
+        for (_, future, submitted_at), vector in zip(batch, vectors):
+            self.latency.observe(now - submitted_at)
+            future.set_result(vector)
+        if self.cache_size:
+            with self._lock:
+                for (text, _, _), vector in zip(batch, vectors):
+                    self._cache[text] = vector
+                    self._cache.move_to_end(text)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
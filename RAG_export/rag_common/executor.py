@@ -0,0 +1,53 @@
+"""
+Bounded thread pool used to run blocking RAG work (embedding, retrieval)
+off the asyncio event loop.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Return the process-wide executor, creating it on first use.
+
+    The pool size is read from RAG_EXECUTOR_WORKERS (default: 4).
+    """
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                max_workers = int(os.getenv("RAG_EXECUTOR_WORKERS", "4"))
+                _executor = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix="rag-worker"
+                )
+    return _executor
+
+
+def _reset_after_fork():
+    # Pool threads do not survive fork(); children create their own pool
+    global _executor, _lock
+    _executor = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking callable in the bounded executor and await its result.
+    The call sees the caller's context variables (request id, deadline).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,160 @@
+"""
+Local stand-in for the Groq chat completions API, to exercise the
+client-side rate limiter without an account or real limits.
+
+It answers every chat completion with a small fixed to-do list, enforces
+its own per-model requests and tokens per minute (prompt + max_tokens, like
+Groq), and sends Groq's rate-limit headers:
+
+    x-ratelimit-limit-requests / x-ratelimit-remaining-requests / x-ratelimit-reset-requests
+    x-ratelimit-limit-tokens   / x-ratelimit-remaining-tokens   / x-ratelimit-reset-tokens
+    retry-after (429 only)
+
+Usage (from RAG_export/):
+    python -m rag_common.groq_stub [--port 8090] [--rpm 30] [--tpm 6000] [--latency 0.5]
+    GROQ_API_BASE=http://127.0.0.1:8090 python rag_service/main.py
+
+GET /stats returns how many calls were served and rejected.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+import uuid
+from typing import Deque, Dict, Tuple
+
+from rag_common.context_builder import estimate_tokens
+
+ANSWER = {
+    "title": "Stub plan",
+    "tasks": ["Clarify the goal", "List the steps", "Do the first step", "Review the result"]
+}
+
+_WINDOW = 60.0
+
+
+class StubLimits:
+    """
+    Sliding one-minute windows of requests and tokens, per model.
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.calls: Dict[str, Deque[Tuple[float, int]]] = collections.defaultdict(collections.deque)
+        self.stats = {"served": 0, "rejected": 0}
+
+    def _window(self, model: str, now: float) -> Deque[Tuple[float, int]]:
+        calls = self.calls[model]
+        while calls and now - calls[0][0] >= _WINDOW:
+            calls.popleft()
+        return calls
+
+    def admit(self, model: str, cost: int) -> Tuple[bool, Dict[str, str]]:
+        now = time.monotonic()
+        calls = self._window(model, now)
+        used_tokens = sum(tokens for _, tokens in calls)
+        allowed = len(calls) < self.rpm and used_tokens + cost <= self.tpm
+        if allowed:
+            calls.append((now, cost))
+            used_tokens += cost
+        self.stats["served" if allowed else "rejected"] += 1
+
+        oldest = calls[0][0] if calls else now
+        reset = max(0.0, _WINDOW - (now - oldest))
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(max(0, self.rpm - len(calls))),
+            "x-ratelimit-reset-requests": f"{reset:.2f}s",
+            "x-ratelimit-limit-tokens": str(self.tpm),
+            "x-ratelimit-remaining-tokens": str(max(0, self.tpm - used_tokens)),
+            "x-ratelimit-reset-tokens": f"{reset:.2f}s"
+        }
+        if not allowed:
+            headers["retry-after"] = str(max(1, int(reset) + 1))
+        return allowed, headers
+
+
+def create_app(limits: StubLimits, latency: float):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    app = FastAPI(title="Groq stub")
+
+    @app.get("/stats")
+    async def stats():
+        return limits.stats
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "unknown")
+        prompt = "".join(str(message.get("content", "")) for message in body.get("messages", []))
+        prompt_tokens = estimate_tokens(prompt)
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens") or 1024
+        allowed, headers = limits.admit(model, prompt_tokens + max_tokens)
+        if not allowed:
+            return JSONResponse(
+                status_code=429,
+                headers=headers,
+                content={"error": {"message": f"Rate limit reached for model {model}", "type": "tokens", "code": "rate_limit_exceeded"}}
+            )
+
+        await asyncio.sleep(latency)
+        content = json.dumps(ANSWER)
+        completion_tokens = estimate_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            def chunk(delta, finish_reason=None, extra=None):
+                data = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                data.update(extra or {})
+                return f"data: {json.dumps(data)}\n\n"
+
+            async def events():
+                yield chunk({"role": "assistant", "content": ""})
+                for start in range(0, len(content), 16):
+                    yield chunk({"content": content[start:start + 16]})
+                yield chunk({}, "stop", {"x_groq": {"usage": usage}})
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+        return JSONResponse(headers=headers, content={
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--rpm", type=int, default=30, help="Requests per minute per model")
+    parser.add_argument("--tpm", type=int, default=6000, help="Tokens per minute per model")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before each answer")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(StubLimits(args.rpm, args.tpm), args.latency), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
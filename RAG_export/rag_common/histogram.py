@@ -0,0 +1,46 @@
+"""
+Minimal thread-safe histogram with fixed bucket upper bounds.
+"""
+
+import bisect
+import threading
+from typing import Dict, List
+
+
+class Histogram:
+    def __init__(self, buckets: List[float]):
+        """
+        Args:
+            buckets: Sorted upper bounds; values above the last one go to +Inf
+        """
+        self.buckets = list(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self) -> Dict:
+        """
+        Return cumulative bucket counts (Prometheus style), sum, count and mean.
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self.buckets + ["+Inf"], counts):
+            running += bucket_count
+            cumulative[str(bound)] = running
+        return {
+            "buckets": cumulative,
+            "sum": total,
+            "count": count,
+            "mean": total / count if count else 0.0
+        }
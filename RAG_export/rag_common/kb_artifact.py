@@ -0,0 +1,203 @@
+"""
+Precomputed, memory-mapped knowledge base embeddings.
+
+A build step embeds the shipped knowledge base once and writes an artifact
+next to each service's knowledge_base.py:
+
+    kb_artifact/manifest.json          format, model, dim, ids, content hashes, version
+    kb_artifact/vectors-<version>.f32  L2-normalized float32 matrix, row-major
+
+At startup the services np.memmap the matrix read-only instead of running
+the embedding model over the corpus. The pages live in the OS page cache,
+so several processes on one host share them. Documents added or edited
+since the build are embedded at startup; the rest still come from the
+artifact.
+
+Usage (from RAG_export/):
+    python -m rag_common.kb_artifact
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag_common.kb_index import content_hash
+from rag_common.log import get_logger
+
+ARTIFACT_FORMAT = 1
+ARTIFACT_DIRNAME = "kb_artifact"
+MANIFEST_NAME = "manifest.json"
+
+# Service folder -> knowledge_base.py function returning (doc_id, text) pairs
+SERVICES = {
+    "rag_service": "get_knowledge_base_documents",
+    "daily_planner_service": "get_daily_kb_documents",
+}
+
+logger = get_logger("kb_artifact")
+
+
+class KBArtifact:
+    def __init__(self, manifest: Dict, matrix: np.ndarray):
+        """
+        Args:
+            manifest: Parsed manifest.json
+            matrix: Memory-mapped (count, dim) float32 matrix
+        """
+        self.manifest = manifest
+        self.matrix = matrix
+        self.model = manifest["model"]
+        self.version = manifest["version"]
+        self._rows = {
+            doc_id: (row, digest)
+            for row, (doc_id, digest) in enumerate(zip(manifest["ids"], manifest["hashes"]))
+        }
+
+    def matches(self, documents: List[Tuple[str, str]]) -> bool:
+        """
+        True when the artifact holds exactly these documents, in this order.
+        """
+        return self.manifest["ids"] == [doc_id for doc_id, _ in documents] and \
+            self.manifest["hashes"] == [content_hash(text) for _, text in documents]
+
+    def vector(self, doc_id: str, digest: str) -> Optional[np.ndarray]:
+        """
+        Stored vector of a document, or None if it is missing or was edited.
+        """
+        entry = self._rows.get(doc_id)
+        if entry is None or entry[1] != digest:
+            return None
+        return self.matrix[entry[0]]
+
+
+def _artifact_version(model_name: str, ids: List[str], hashes: List[str]) -> str:
+    payload = json.dumps([ARTIFACT_FORMAT, model_name, ids, hashes], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def build_kb_artifact(directory: str, documents: List[Tuple[str, str]], embeddings, model_name: str) -> Dict:
+    """
+    Embed the documents and write the artifact to directory.
+
+    Args:
+        directory: Artifact directory (created if missing)
+        documents: (doc_id, text) pairs of the knowledge base
+        embeddings: LangChain embeddings (embed_documents is used)
+        model_name: Embedding model name recorded in the manifest
+
+    Returns:
+        The written manifest
+    """
+    ids = [doc_id for doc_id, _ in documents]
+    hashes = [content_hash(text) for _, text in documents]
+    matrix = np.asarray(embeddings.embed_documents([text for _, text in documents]), dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix = np.ascontiguousarray(matrix / norms)
+
+    version = _artifact_version(model_name, ids, hashes)
+    vectors_name = f"vectors-{version}.f32"
+    os.makedirs(directory, exist_ok=True)
+
+    vectors_path = os.path.join(directory, vectors_name)
+    matrix.tofile(vectors_path + ".tmp")
+    os.replace(vectors_path + ".tmp", vectors_path)
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "model": model_name,
+        "dim": int(matrix.shape[1]),
+        "count": int(matrix.shape[0]),
+        "dtype": "float32",
+        "ids": ids,
+        "hashes": hashes,
+        "version": version,
+        "vectors": vectors_name
+    }
+    # The manifest is swapped in last, so it always names a complete matrix
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    # Older matrices (still mapped by running processes keep their pages)
+    for name in os.listdir(directory):
+        if name.startswith("vectors-") and name.endswith(".f32") and name != vectors_name:
+            os.remove(os.path.join(directory, name))
+    return manifest
+
+
+def load_kb_artifact(directory: str, model_name: str) -> Optional[KBArtifact]:
+    """
+    Memory-map the artifact in directory. Returns None when there is no
+    artifact or it was built with another format or embedding model.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format") != ARTIFACT_FORMAT or manifest.get("model") != model_name:
+        logger.warning("Ignoring KB artifact built for another model or format", extra={
+            "directory": directory, "model": manifest.get("model"), "format": manifest.get("format")
+        })
+        return None
+    try:
+        matrix = np.memmap(
+            os.path.join(directory, manifest["vectors"]),
+            dtype=np.float32,
+            mode="r",
+            shape=(manifest["count"], manifest["dim"])
+        )
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable KB artifact", extra={"directory": directory, "error": str(e)})
+        return None
+    return KBArtifact(manifest, matrix)
+
+
+def load_kb_vectors(directory: str, documents: List[Tuple[str, str]], embeddings) -> np.ndarray:
+    """
+    Normalized (len(documents), dim) matrix for the documents.
+
+    The memory-mapped artifact is returned as is (no copy, no embedding)
+    when it matches the documents. Otherwise its still valid rows are
+    reused and only new or edited documents are embedded.
+    """
+    artifact = load_kb_artifact(directory, embeddings.model_name)
+    if artifact is not None and artifact.matches(documents):
+        logger.info("Loaded KB embeddings from artifact", extra={"version": artifact.version, "documents": len(documents)})
+        return artifact.matrix
+
+    rows: List[Optional[np.ndarray]] = [
+        artifact.vector(doc_id, content_hash(text)) if artifact is not None else None
+        for doc_id, text in documents
+    ]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        logger.info("Embedding KB documents missing from the artifact", extra={"missing": len(missing), "documents": len(documents)})
+        vectors = embeddings.embed_documents([documents[i][1] for i in missing])
+        for i, vector in zip(missing, vectors):
+            rows[i] = np.asarray(vector, dtype=np.float32)
+    return np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+
+
+def main() -> int:
+    from rag_common.compare_retrievers import load_knowledge_base
+    from rag_common.shared import EMBEDDING_MODEL_NAME, create_embeddings
+
+    embeddings = create_embeddings()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for service, documents_fn in SERVICES.items():
+        documents = getattr(load_knowledge_base(service), documents_fn)()
+        directory = os.path.join(root, service, ARTIFACT_DIRNAME)
+        manifest = build_kb_artifact(directory, documents, embeddings, EMBEDDING_MODEL_NAME)
+        print(f"[{service}] {manifest['count']} x {manifest['dim']} -> {directory} (version {manifest['version']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Fingerprinted, incremental knowledge-base indexing for ChromaDB.
+
+Every knowledge base document has a stable id and a content hash stored in
+its metadata. A manifest next to the collection records the indexed
+{id: hash} map and the embedding model. At startup the current documents
+are diffed against the manifest, so only new or changed documents are
+embedded and removed ones are deleted. Editing knowledge_base.py no longer
+requires deleting the persist directory.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+MANIFEST_NAME = "kb_manifest.json"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _load_manifest(path: str) -> Dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(path: str, manifest: Dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _kb_metadata(doc_id: str, digest: str) -> Dict:
+    return {"source": doc_id, "content_hash": digest, "kb_document": True}
+
+
+def _indexed_from_collection(vector_store, source_ids: set) -> Dict[str, str]:
+    """
+    Rebuild the {id: hash} map from the collection when the manifest is
+    missing. Knowledge base documents without a hash (indexes built before
+    fingerprinting) get an empty hash so they are replaced.
+    """
+    existing = vector_store._collection.get(include=["metadatas"])
+    indexed = {}
+    for doc_id, metadata in zip(existing["ids"], existing["metadatas"]):
+        metadata = metadata or {}
+        if "content_hash" in metadata or doc_id in source_ids or metadata.get("kb_document"):
+            indexed[doc_id] = metadata.get("content_hash", "")
+        elif str(metadata.get("source", "")).startswith(("template_", "daily_")):
+            # Legacy positional ids from the "build once" index
+            indexed[doc_id] = ""
+    return indexed
+
+
+def sync_chroma_index(
+    vector_store,
+    persist_directory: str,
+    documents: List[Tuple[str, str]],
+    model_name: str,
+    collection_name: Optional[str] = None,
+    artifact=None
+) -> Dict[str, int]:
+    """
+    Bring a Chroma collection in line with the knowledge base documents.
+
+    Args:
+        vector_store: LangChain Chroma store persisted in persist_directory
+        persist_directory: Directory holding the collection and its manifest
+        documents: (doc_id, text) pairs of the current knowledge base
+        model_name: Embedding model; a different model forces a full reindex
+        collection_name: Set when several collections share persist_directory,
+            so each one gets its own manifest
+        artifact: Optional KBArtifact; documents it holds unchanged are
+            added with their precomputed vectors instead of being embedded
+
+    Returns:
+        Counts of added, updated, removed and unchanged documents
+    """
+    manifest_name = f"kb_manifest_{collection_name}.json" if collection_name else MANIFEST_NAME
+    os.makedirs(persist_directory, exist_ok=True)
+    manifest_path = os.path.join(persist_directory, manifest_name)
+    manifest = _load_manifest(manifest_path)
+    current = {doc_id: (text, content_hash(text)) for doc_id, text in documents}
+
+    if manifest and manifest.get("model") == model_name:
+        indexed = manifest.get("documents", {})
+    else:
+        indexed = _indexed_from_collection(vector_store, set(current))
+        if manifest:
+            # The embedding model changed: every stored vector is stale
+            indexed = {doc_id: "" for doc_id in indexed}
+
+    added = [doc_id for doc_id in current if doc_id not in indexed]
+    updated = [doc_id for doc_id in current if doc_id in indexed and indexed[doc_id] != current[doc_id][1]]
+    removed = [doc_id for doc_id in indexed if doc_id not in current]
+
+    stale = updated + removed
+    if stale:
+        vector_store.delete(ids=stale)
+
+    to_embed = added + updated
+    precomputed = {}
+    if artifact is not None and artifact.model == model_name:
+        for doc_id in to_embed:
+            vector = artifact.vector(doc_id, current[doc_id][1])
+            if vector is not None:
+                precomputed[doc_id] = vector
+        to_embed = [doc_id for doc_id in to_embed if doc_id not in precomputed]
+
+    if precomputed:
+        ids = list(precomputed)
+        vector_store._collection.upsert(
+            ids=ids,
+            embeddings=[[float(x) for x in precomputed[doc_id]] for doc_id in ids],
+            documents=[current[doc_id][0] for doc_id in ids],
+            metadatas=[_kb_metadata(doc_id, current[doc_id][1]) for doc_id in ids]
+        )
+    if to_embed:
+        vector_store.add_texts(
+            texts=[current[doc_id][0] for doc_id in to_embed],
+            metadatas=[_kb_metadata(doc_id, current[doc_id][1]) for doc_id in to_embed],
+            ids=to_embed
+        )
+
+    _write_manifest(manifest_path, {
+        "model": model_name,
+        "documents": {doc_id: digest for doc_id, (_, digest) in current.items()}
+    })
+
+    return {
+        "added": len(added),
+        "updated": len(updated),
+        "removed": len(removed),
+        "unchanged": len(current) - len(added) - len(updated),
+        "from_artifact": len(precomputed)
+    }
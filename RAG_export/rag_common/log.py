@@ -0,0 +1,168 @@
+"""
+Structured, leveled logging with a per-request id.
+
+RAG_LOG_LEVEL sets the level (default INFO). RAG_LOG_FORMAT is "json" (one
+object per line, the default) or "text". Both are read when the first
+record is written, so a .env loaded after the imports still applies.
+Fields passed with extra={...} become keys of the JSON object, or
+key=value pairs in text.
+
+Every record carries the id of the request being served. RequestIdMiddleware
+takes it from the X-Request-ID header (or makes one up), sends it back in
+the response and keeps it in a context variable, which follows the
+request into its tasks and executor jobs.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_request_id: "contextvars.ContextVar[str]" = contextvars.ContextVar("rag_request_id", default="-")
+_configured = False
+_lock = threading.Lock()
+
+# Attributes every LogRecord has; anything else came from extra={...}
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+def bind_request_id(request_id: str):
+    """
+    Set the request id of the current context (e.g. a fresh one for a task).
+    """
+    _request_id.set(request_id)
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+def _extra_fields(record: logging.LogRecord):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": record.request_id,
+            "message": record.getMessage()
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _Handler(logging.StreamHandler):
+    """
+    Stdout handler taking its level and format from the environment when
+    it writes its first record, not when the modules are imported.
+    """
+
+    def __init__(self):
+        super().__init__(sys.stdout)
+        self._settings_applied = False
+        self.addFilter(_RequestIdFilter())
+
+    def _apply_settings(self):
+        json_format = os.getenv("RAG_LOG_FORMAT", "json").lower() == "json"
+        self.setFormatter(JsonFormatter() if json_format else TextFormatter())
+        level = os.getenv("RAG_LOG_LEVEL", "INFO").upper()
+        self.setLevel(level)
+        # Later records below the level are dropped before they are built
+        logging.getLogger("rag").setLevel(level)
+        self._settings_applied = True
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        if not self._settings_applied:
+            self._apply_settings()
+            if record.levelno < self.level:
+                return False
+        return super().handle(record)
+
+
+def configure_logging():
+    """
+    Attach the handler of the "rag" loggers (settings are read on first use).
+    Called by get_logger(); safe to call more than once.
+    """
+    global _configured
+    if _configured:
+        return
+    with _lock:
+        if _configured:
+            return
+        root = logging.getLogger("rag")
+        root.addHandler(_Handler())
+        # Everything reaches the handler until it has read RAG_LOG_LEVEL
+        root.setLevel(logging.DEBUG)
+        # uvicorn configures the root logger; keep our records out of it
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Logger "rag.<name>", e.g. get_logger("todo.engine").
+    """
+    configure_logging()
+    return logging.getLogger(f"rag.{name}")
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving each HTTP request an id (X-Request-ID) for its
+    log records and echoing it in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = REQUEST_ID_HEADER.lower().encode()
+        request_id = next(
+            (value.decode("latin-1") for key, value in scope.get("headers", []) if key == header),
+            None
+        ) or uuid.uuid4().hex[:16]
+        request_id = request_id[:64]
+        token = _request_id.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
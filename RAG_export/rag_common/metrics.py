@@ -0,0 +1,317 @@
+"""
+Prometheus metrics for the RAG services, rendered in the text exposition
+format by /metrics (no client library needed).
+
+- rag_stage_seconds{stage}: time per request in each pipeline stage,
+  one of STAGES (llm_first_token is the whole answer time for calls
+  that do not stream, which receive every token at once)
+- rag_llm_tokens_total{model,kind}: prompt and completion tokens reported
+  by Groq, repair re-asks included
+- rag_parse_total{outcome}: how LLM answers were parsed (first try,
+  extracted, repaired, re-asked or failed)
+- rag_kb_documents: documents in the knowledge base
+
+Each service has its own registry. MetricsMiddleware tells which service
+a request belongs to, so with unified_host.py both apps keep separate
+metrics in one process; work done outside a request (warmup) is not
+counted. Every sample has a service label and a pid label: with
+RAG_WORKERS > 1 each worker keeps its own registries, and a scrape
+reaches one of them.
+
+The same stage timings are kept per request: MetricsMiddleware sends
+them back in a Server-Timing header (RAG_SERVER_TIMING, on by default),
+e.g. "embed;dur=3.1, retrieve;dur=1.2, llm_total;dur=812.4, total;dur=830.0".
+Streamed responses have no such header: it leaves before the stages run.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from rag_common.histogram import Histogram
+from rag_common.prefork import register_after_fork
+
+STAGES = (
+    "language_detect",
+    "embed",
+    "retrieve",
+    "prompt_build",
+    "llm_first_token",
+    "llm_total",
+    "parse",
+    "serialize"
+)
+
+_STAGE_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+_PARSE_OUTCOMES = ("compact", "json", "extracted", "repaired", "reasked", "failed")
+
+# Service of the request being served (None outside a request)
+_service: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("rag_service", default=None)
+# Stage -> seconds of the request being served (None outside a request)
+_request_stages: "contextvars.ContextVar[Optional[Dict[str, float]]]" = contextvars.ContextVar(
+    "rag_request_stages", default=None
+)
+
+# (name, type, help, [(labels, value), ...]) produced by a collector at scrape time
+Metric = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.stages = {stage: Histogram(_STAGE_BUCKETS) for stage in STAGES}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+        self._lock = threading.Lock()
+        register_after_fork(self._after_fork)
+
+    def _after_fork(self):
+        # Workers report their own requests only
+        self.stages = {stage: Histogram(_STAGE_BUCKETS) for stage in STAGES}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        self.stages[stage].observe(seconds)
+
+    def inc(self, name: str, help_text: str, value: float = 1.0, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._help[name] = help_text
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        self._collectors.append(collector)
+
+    def render(self, service: str) -> str:
+        base = {"service": service, "pid": str(os.getpid())}
+        lines = [
+            "# HELP rag_stage_seconds Time spent per request in each pipeline stage",
+            "# TYPE rag_stage_seconds histogram"
+        ]
+        for stage, histogram in self.stages.items():
+            snapshot = histogram.snapshot()
+            labels = dict(base, stage=stage)
+            for bound, count in snapshot["buckets"].items():
+                lines.append(f"rag_stage_seconds_bucket{_labels(dict(labels, le=bound))} {count}")
+            lines.append(f"rag_stage_seconds_sum{_labels(labels)} {snapshot['sum']}")
+            lines.append(f"rag_stage_seconds_count{_labels(labels)} {snapshot['count']}")
+
+        with self._lock:
+            counters = sorted(self._counters.items())
+            help_texts = dict(self._help)
+        metrics: List[Metric] = []
+        for (name, label_items), value in counters:
+            if not metrics or metrics[-1][0] != name:
+                metrics.append((name, "counter", help_texts[name], []))
+            metrics[-1][3].append((dict(label_items), value))
+        for collector in self._collectors:
+            metrics.extend(collector())
+
+        for name, metric_type, help_text, samples in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(dict(base, **labels))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels: Dict[str, Any]) -> str:
+    pairs = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+_registries: Dict[str, MetricsRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def _registry(service: str) -> MetricsRegistry:
+    registry = _registries.get(service)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(service, MetricsRegistry())
+    return registry
+
+
+def _current_registry() -> Optional[MetricsRegistry]:
+    service = _service.get()
+    return _registry(service) if service is not None else None
+
+
+def current_service() -> Optional[str]:
+    return _service.get()
+
+
+def bind_service(service: Optional[str]):
+    """
+    Set the service of the current context (e.g. a fresh one for a task).
+    """
+    _service.set(service)
+
+
+def observe_stage(stage: str, seconds: float):
+    registry = _current_registry()
+    if registry is not None:
+        registry.observe(stage, seconds)
+    stages = _request_stages.get()
+    if stages is not None:
+        # A stage may run more than once per request (repair re-ask, batch)
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def bind_request_stages(stages: Optional[Dict[str, float]]):
+    """
+    Set the stage accumulator of the current context (e.g. a fresh one for a task).
+    """
+    _request_stages.set(stages)
+
+
+def add_request_stages(stages: Dict[str, float]):
+    """
+    Add stage timings measured elsewhere (a shared task) to the current request.
+    """
+    current = _request_stages.get()
+    if current is not None:
+        for stage, seconds in stages.items():
+            current[stage] = current.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Record the wall time of the block as one observation of the stage.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+class Stopwatch:
+    """
+    Adds up several blocks (e.g. every SSE event of a stream) into one
+    observation of a stage, made by observe().
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.elapsed = 0.0
+        self._start = 0.0
+
+    def __enter__(self) -> "Stopwatch":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed += time.perf_counter() - self._start
+        return False
+
+    def observe(self):
+        observe_stage(self.stage, self.elapsed)
+
+
+def record_llm_usage(model: str, message: Optional[Any]):
+    """
+    Count the prompt and completion tokens of an LLM response.
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    for kind, key, legacy_key in (("prompt", "input_tokens", "prompt_tokens"), ("completion", "output_tokens", "completion_tokens")):
+        tokens = usage.get(key) or token_usage.get(legacy_key)
+        registry = _current_registry()
+        if tokens and registry is not None:
+            registry.inc("rag_llm_tokens_total", "Tokens reported by the LLM provider", tokens, model=model, kind=kind)
+
+
+def register_collector(service: str, collector: Callable[[], Iterable[Metric]]):
+    """
+    Add metrics of a service computed at scrape time, from a callable
+    returning Metric tuples.
+    """
+    _registry(service).add_collector(collector)
+
+
+def engine_metrics(engine) -> List[Metric]:
+    """
+    Parse outcomes and knowledge base size of a loaded engine (none before).
+    """
+    if engine is None:
+        return []
+    parser_stats = engine.parser.stats()
+    return [
+        ("rag_parse_total", "counter", "LLM answers by parse outcome",
+         [({"outcome": outcome}, parser_stats[outcome]) for outcome in _PARSE_OUTCOMES]),
+        ("rag_parse_validation_errors_total", "counter", "Parsed answers rejected by the schema",
+         [({}, parser_stats["validation_errors"])]),
+        ("rag_kb_documents", "gauge", "Documents in the knowledge base",
+         [({}, engine.retriever.count())])
+    ]
+
+
+def render_metrics(service: str) -> str:
+    return _registry(service).render(service)
+
+
+def server_timing(stages: Dict[str, float], total: float) -> str:
+    """
+    Server-Timing header value: stages in pipeline order, then total, in ms.
+    """
+    order = [stage for stage in STAGES if stage in stages] + sorted(set(stages) - set(STAGES))
+    entries = [f"{stage};dur={stages[stage] * 1000:.1f}" for stage in order]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording each HTTP request's metrics in the registry
+    of its service. It also collects the request's stage timings and sends
+    them in a Server-Timing header when any stage ran before the response
+    started.
+    """
+
+    def __init__(self, app, service: str, server_timing: Optional[bool] = None):
+        self.app = app
+        self.service = service
+        if server_timing is None:
+            server_timing = os.getenv("RAG_SERVER_TIMING", "true").lower() not in ("0", "false", "no")
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        service_token = _service.set(self.service)
+        if not self.server_timing:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _service.reset(service_token)
+            return
+        stages: Dict[str, float] = {}
+        start = time.perf_counter()
+        # The dict itself is shared with the tasks and executor jobs of the request
+        token = _request_stages.set(stages)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and stages:
+                value = server_timing(stages, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", value.encode("latin-1")),
+                    # Lets browser clients on other origins read it (CORS allows any origin)
+                    (b"timing-allow-origin", b"*")
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
+            _service.reset(service_token)
@@ -0,0 +1,482 @@
+"""
+Model tiering and latency hedging between a fast and a slow Groq model.
+
+Every request used to go to llama-3.3-70b-versatile. ModelRouter sends it
+to one of two tiers instead:
+
+- "fast" (RAG_FAST_MODEL, default llama-3.1-8b-instant) for the modes
+  listed in RAG_ROUTER_FAST_MODES (default: STRICT extraction) and, when
+  RAG_ROUTER_FAST_MAX_CHARS is set (default 0: off), for prompts up to
+  that length, in the languages of RAG_ROUTER_FAST_LANGUAGES,
+- "slow" (RAG_SLOW_MODEL, default llama-3.3-70b-versatile) otherwise.
+
+When the primary tier has not produced a first token after
+RAG_HEDGE_AFTER_MS, the same prompt is sent to the other tier, provided
+its rate-limit budget allows the extra call right away. For a complete
+answer the first attempt to finish wins; for a stream, the first to
+produce a token. The loser is cancelled.
+
+Each tier calls the model through its own GroqRateLimiter. Per-tier
+latency, time to first token, hedges and win rates are in stats().
+
+A call cancelled because its request hit its deadline or lost its client
+(rag_common.deadline) reports the tokens it will not generate.
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from rag_common.context_builder import estimate_tokens
+from rag_common.deadline import current_deadline
+from rag_common.histogram import Histogram
+from rag_common.log import get_logger
+from rag_common.metrics import observe_stage, record_llm_usage
+from rag_common.rate_limiter import (
+    INTERACTIVE, PROMPT_OVERHEAD_TOKENS, GroqRateLimiter, get_rate_limiter, groq_client_kwargs
+)
+
+TIERS = ("fast", "slow")
+
+_LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0]
+_TOKEN_BUCKETS = [50, 100, 200, 400, 800, 1600, 3200]
+_END = object()
+
+logger = get_logger("router")
+
+
+class ModelTier:
+    def __init__(self, name: str, llm, limiter: Optional[GroqRateLimiter]):
+        """
+        Args:
+            name: "fast" or "slow"
+            llm: ChatGroq client of the tier
+            limiter: Rate limiter of the tier's model (None when disabled)
+        """
+        self.name = name
+        self.llm = llm
+        self.limiter = limiter
+        self.first_token = Histogram(_LATENCY_BUCKETS)
+        self.latency = Histogram(_LATENCY_BUCKETS)
+        self.completion_tokens = Histogram(_TOKEN_BUCKETS)
+        self.counts = {
+            "routed": 0, "hedges": 0, "races": 0, "wins": 0, "errors": 0, "cancelled": 0,
+            "aborted": 0, "tokens_saved": 0
+        }
+
+    @property
+    def model_name(self) -> str:
+        return self.llm.model_name
+
+    def cost(self, prompt_text: str) -> int:
+        if self.limiter is None:
+            return 0
+        return self.limiter.estimate_cost(prompt_text, self.llm.max_tokens)
+
+    def reserve(self, prompt_text: str) -> int:
+        cost = self.cost(prompt_text)
+        if self.limiter is not None:
+            self.limiter.acquire(cost)
+        self._started()
+        return cost
+
+    async def areserve(self, prompt_text: str, priority: int) -> int:
+        cost = self.cost(prompt_text)
+        if self.limiter is not None:
+            try:
+                await self.limiter.aacquire(cost, priority)
+            except asyncio.CancelledError:
+                # Left the rate-limit queue: the whole call is saved
+                self.abort(prompt_text, None, 0.0, started=False)
+                raise
+        self._started()
+        return cost
+
+    def try_reserve(self, prompt_text: str) -> Optional[int]:
+        cost = self.cost(prompt_text)
+        if self.limiter is not None and not self.limiter.try_acquire(cost):
+            return None
+        self._started()
+        return cost
+
+    def _started(self):
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.llm_calls += 1
+
+    def settle(self, cost: int, message):
+        if message is None:
+            return
+        if self.limiter is not None:
+            self.limiter.settle(cost, message)
+        record_llm_usage(self.model_name, message)
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.tokens_used += _usage(message, "total_tokens", "total_tokens") or 0
+
+    def observe_first_token(self, elapsed: float):
+        """
+        Record the time to the first token (the whole answer for a blocking
+        call, which receives it at once).
+        """
+        self.first_token.observe(elapsed)
+        observe_stage("llm_first_token", elapsed)
+
+    def observe(self, elapsed: float, message):
+        """
+        Record a call that ran to completion.
+        """
+        self.latency.observe(elapsed)
+        observe_stage("llm_total", elapsed)
+        completion_tokens = _usage(message, "output_tokens", "completion_tokens")
+        if completion_tokens:
+            self.completion_tokens.observe(completion_tokens)
+
+    def abort(self, prompt_text: str, generated: Optional[int], elapsed: float, started: bool = True):
+        """
+        Account for a call cancelled by its request's deadline or client
+        disconnect (cancelled hedge losers are not savings).
+
+        Args:
+            prompt_text: Variable part of the prompt
+            generated: Tokens streamed so far (None for a blocking call)
+            elapsed: Seconds the call had been running
+            started: False when it was still waiting for rate-limit budget
+        """
+        deadline = current_deadline()
+        if deadline is None or deadline.reason is None:
+            return
+        # Mean completion of the tier (0 until a call has completed)
+        expected = self.completion_tokens.snapshot()["mean"]
+        if not started:
+            saved = estimate_tokens(prompt_text) + PROMPT_OVERHEAD_TOKENS + expected
+        elif generated is not None:
+            saved = expected - generated
+        else:
+            # Blocking call: assume tokens come at the usual pace
+            latency = self.latency.snapshot()
+            done = min(1.0, elapsed / latency["mean"]) if latency["count"] else 0.0
+            saved = expected * (1.0 - done)
+        saved = max(0, round(saved))
+        self.counts["aborted"] += 1
+        self.counts["tokens_saved"] += saved
+        deadline.save_tokens(saved)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self.counts)
+        stats["model"] = self.model_name
+        stats["win_rate"] = round(stats["wins"] / stats["races"], 3) if stats["races"] else None
+        stats["first_token_seconds"] = self.first_token.snapshot()
+        stats["latency_seconds"] = self.latency.snapshot()
+        stats["completion_tokens"] = self.completion_tokens.snapshot()
+        return stats
+
+
+class _Attempt:
+    """
+    One streamed call to a tier, run as a task; chunks are queued so the
+    winner of a stream race can be replayed from its first token.
+    """
+
+    def __init__(self, tier: ModelTier, chain, inputs: Dict[str, Any], prompt_text: str, cost: int):
+        self.tier = tier
+        self.prompt_text = prompt_text
+        self.message = None
+        self.error: Optional[BaseException] = None
+        self.cancelled = False
+        self.chunks: asyncio.Queue = asyncio.Queue()
+        self.first_token = asyncio.Event()
+        self.finished = asyncio.Event()
+        self.task = asyncio.ensure_future(self._run(chain, inputs, cost))
+
+    async def _run(self, chain, inputs: Dict[str, Any], cost: int):
+        start = time.monotonic()
+        try:
+            async for chunk in chain.astream(inputs):
+                if self.message is None:
+                    self.tier.observe_first_token(time.monotonic() - start)
+                    self.message = chunk
+                    self.first_token.set()
+                else:
+                    self.message = self.message + chunk
+                self.chunks.put_nowait(chunk)
+            self.tier.observe(time.monotonic() - start, self.message)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            self.tier.counts["cancelled"] += 1
+            generated = estimate_tokens(self.message.content) if self.message is not None else 0
+            self.tier.abort(self.prompt_text, generated, time.monotonic() - start)
+            raise
+        except Exception as e:
+            self.tier.counts["errors"] += 1
+            self.error = e
+        finally:
+            self.tier.settle(cost, self.message)
+            self.finished.set()
+            self.chunks.put_nowait(_END)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.finished.is_set() and self.error is None and not self.cancelled
+
+    def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+
+
+def _usage(message, key: str, legacy_key: str) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get(key):
+        return usage[key]
+    return ((getattr(message, "response_metadata", None) or {}).get("token_usage") or {}).get(legacy_key)
+
+
+async def _wait_any(events: List[asyncio.Event], timeout: Optional[float] = None):
+    waiters = [asyncio.ensure_future(event.wait()) for event in events]
+    try:
+        await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        name: str,
+        tiers: Dict[str, ModelTier],
+        enabled: bool = True,
+        fast_max_chars: int = 0,
+        fast_modes: Optional[List[str]] = None,
+        fast_languages: Optional[List[str]] = None,
+        hedge_after: Optional[float] = 1.5
+    ):
+        """
+        Args:
+            name: Service name used in log lines
+            tiers: ModelTier per tier name
+            enabled: When False every request goes to the slow tier, unhedged
+            fast_max_chars: Prompts up to this length go to the fast tier (0: none)
+            fast_modes: Modes always sent to the fast tier
+            fast_languages: Languages the fast tier may answer
+            hedge_after: Seconds without a first token before hedging (None: never)
+        """
+        self.name = name
+        self.tiers = tiers
+        self.enabled = enabled
+        self.fast_max_chars = fast_max_chars
+        self.fast_modes = set(fast_modes or [])
+        self.fast_languages = set(fast_languages or [])
+        same_model = tiers["fast"].model_name == tiers["slow"].model_name
+        self.hedge_after = hedge_after if enabled and not same_model else None
+
+    @classmethod
+    def from_env(cls, name: str, groq_api_key: str, temperature: float, max_tokens: int) -> "ModelRouter":
+        """
+        Build both tiers' ChatGroq clients and the routing rules from
+        RAG_FAST_MODEL / RAG_SLOW_MODEL / RAG_ROUTER_* / RAG_HEDGE_* variables.
+        """
+        from langchain_groq import ChatGroq
+
+        models = {
+            "fast": os.getenv("RAG_FAST_MODEL", "llama-3.1-8b-instant"),
+            "slow": os.getenv("RAG_SLOW_MODEL", "llama-3.3-70b-versatile")
+        }
+        tiers = {}
+        for tier, model_name in models.items():
+            limiter = get_rate_limiter(model_name)
+            llm = ChatGroq(
+                groq_api_key=groq_api_key,
+                model_name=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **groq_client_kwargs(limiter)
+            )
+            tiers[tier] = ModelTier(tier, llm, limiter)
+
+        hedge_after_ms = float(os.getenv("RAG_HEDGE_AFTER_MS", "1500"))
+        hedging = os.getenv("RAG_HEDGE_ENABLED", "true").lower() not in ("0", "false", "no")
+        return cls(
+            name,
+            tiers,
+            enabled=os.getenv("RAG_ROUTER_ENABLED", "true").lower() not in ("0", "false", "no"),
+            fast_max_chars=int(os.getenv("RAG_ROUTER_FAST_MAX_CHARS", "0")),
+            fast_modes=[mode for mode in os.getenv("RAG_ROUTER_FAST_MODES", "strict").split(",") if mode],
+            fast_languages=[language for language in os.getenv("RAG_ROUTER_FAST_LANGUAGES", "fr,en").split(",") if language],
+            hedge_after=hedge_after_ms / 1000.0 if hedging else None
+        )
+
+    def route(self, user_prompt: str, language: str, mode: str) -> str:
+        """
+        Tier for a request: "fast" or "slow".
+        """
+        if not self.enabled or language not in self.fast_languages:
+            return "slow"
+        if mode in self.fast_modes:
+            return "fast"
+        if self.fast_max_chars and len(user_prompt.strip()) <= self.fast_max_chars:
+            return "fast"
+        return "slow"
+
+    @staticmethod
+    def other(tier: str) -> str:
+        return "slow" if tier == "fast" else "fast"
+
+    def invoke(self, chains: Dict[str, Any], inputs: Dict[str, Any], tier: str, prompt_text: str):
+        """
+        Blocking call on one tier (no hedging).
+
+        Args:
+            chains: Prompt | LLM chain per tier for this request
+            inputs: Chain inputs
+            tier: Tier chosen by route()
+            prompt_text: Variable part of the prompt, for the rate-limit cost
+        """
+        model_tier = self.tiers[tier]
+        model_tier.counts["routed"] += 1
+        cost = model_tier.reserve(prompt_text)
+        start = time.monotonic()
+        message = None
+        try:
+            message = chains[tier].invoke(inputs)
+        except Exception:
+            model_tier.counts["errors"] += 1
+            raise
+        finally:
+            model_tier.settle(cost, message)
+        elapsed = time.monotonic() - start
+        model_tier.observe_first_token(elapsed)
+        model_tier.observe(elapsed, message)
+        return message
+
+    async def _race(
+        self,
+        chains: Dict[str, Any],
+        inputs: Dict[str, Any],
+        tier: str,
+        prompt_text: str,
+        priority: int,
+        ready: Callable[[_Attempt], bool],
+        signals: Callable[[_Attempt], List[asyncio.Event]]
+    ) -> _Attempt:
+        """
+        Run the primary attempt, hedge it if it is slow to start, and return
+        the first attempt for which ready() holds. The others are cancelled.
+        """
+        primary_tier = self.tiers[tier]
+        primary_tier.counts["routed"] += 1
+        cost = await primary_tier.areserve(prompt_text, priority)
+        attempts = [_Attempt(primary_tier, chains[tier], inputs, prompt_text, cost)]
+        try:
+            primary = attempts[0]
+            if self.hedge_after is not None:
+                await _wait_any([primary.first_token, primary.finished], self.hedge_after)
+                if not primary.first_token.is_set() and not primary.finished.is_set():
+                    hedge_tier = self.tiers[self.other(tier)]
+                    hedge_cost = hedge_tier.try_reserve(prompt_text)
+                    if hedge_cost is not None:
+                        logger.info("No first token, hedging on the other tier", extra={
+                            "service": self.name, "model": primary_tier.model_name,
+                            "hedge_model": hedge_tier.model_name, "after_seconds": self.hedge_after
+                        })
+                        hedge_tier.counts["hedges"] += 1
+                        attempts.append(_Attempt(hedge_tier, chains[hedge_tier.name], inputs, prompt_text, hedge_cost))
+
+            while True:
+                for attempt in attempts:
+                    if ready(attempt):
+                        if len(attempts) > 1:
+                            for raced in attempts:
+                                raced.tier.counts["races"] += 1
+                            attempt.tier.counts["wins"] += 1
+                        return attempt
+                if all(attempt.finished.is_set() for attempt in attempts):
+                    errors = [attempt.error for attempt in attempts if attempt.error is not None]
+                    if errors:
+                        raise errors[0]
+                    raise RuntimeError(f"Every {self.name} LLM attempt was cancelled")
+                await _wait_any([event for attempt in attempts for event in signals(attempt)])
+        finally:
+            for attempt in attempts:
+                if not ready(attempt):
+                    attempt.cancel()
+
+    async def ainvoke(
+        self,
+        chains: Dict[str, Any],
+        inputs: Dict[str, Any],
+        tier: str,
+        prompt_text: str,
+        priority: int = INTERACTIVE
+    ):
+        """
+        Complete answer from the routed tier, hedged on the other one when
+        the first token is late. The first attempt to finish wins.
+        """
+        if self.hedge_after is None:
+            model_tier = self.tiers[tier]
+            model_tier.counts["routed"] += 1
+            cost = await model_tier.areserve(prompt_text, priority)
+            start = time.monotonic()
+            message = None
+            try:
+                message = await chains[tier].ainvoke(inputs)
+            except asyncio.CancelledError:
+                model_tier.counts["cancelled"] += 1
+                model_tier.abort(prompt_text, None, time.monotonic() - start)
+                raise
+            except Exception:
+                model_tier.counts["errors"] += 1
+                raise
+            finally:
+                model_tier.settle(cost, message)
+            elapsed = time.monotonic() - start
+            model_tier.observe_first_token(elapsed)
+            model_tier.observe(elapsed, message)
+            return message
+
+        winner = await self._race(
+            chains, inputs, tier, prompt_text, priority,
+            ready=lambda attempt: attempt.succeeded,
+            signals=lambda attempt: [attempt.finished]
+        )
+        return winner.message
+
+    async def astream(
+        self,
+        chains: Dict[str, Any],
+        inputs: Dict[str, Any],
+        tier: str,
+        prompt_text: str,
+        priority: int = INTERACTIVE
+    ) -> AsyncIterator[Any]:
+        """
+        Stream chunks from the routed tier, hedged on the other one when the
+        first token is late. The first attempt to produce a token wins.
+        """
+        winner = await self._race(
+            chains, inputs, tier, prompt_text, priority,
+            ready=lambda attempt: attempt.first_token.is_set() or attempt.succeeded,
+            signals=lambda attempt: [attempt.first_token, attempt.finished]
+        )
+        try:
+            while True:
+                chunk = await winner.chunks.get()
+                if chunk is _END:
+                    break
+                yield chunk
+            if winner.error is not None:
+                raise winner.error
+        finally:
+            winner.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hedge_after_seconds": self.hedge_after,
+            "fast_max_chars": self.fast_max_chars,
+            "fast_modes": sorted(self.fast_modes),
+            "fast_languages": sorted(self.fast_languages),
+            "tiers": {name: tier.stats() for name, tier in self.tiers.items()}
+        }
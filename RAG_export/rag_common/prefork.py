@@ -0,0 +1,171 @@
+"""
+Pre-fork multi-worker server mode.
+
+With uvicorn's own --workers every worker is an independent interpreter
+that imports torch and loads the MiniLM weights and the knowledge base
+embeddings again. serve_prefork() builds and warms up the engine once in
+the parent process, then forks the workers. The model tensors and the KB
+matrix are inherited copy-on-write, so memory stays nearly flat as workers
+are added, and every worker accepts connections on the same socket.
+
+Each worker limits torch to RAG_TORCH_THREADS intra-op threads (default:
+CPU cores // workers) so N workers do not oversubscribe the cores.
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+import weakref
+from typing import Dict, Optional
+
+from rag_common.log import get_logger
+
+logger = get_logger("prefork")
+
+
+def register_after_fork(method):
+    """
+    Call a bound method in every forked child, to drop the threads, locks
+    and connections inherited from the parent. Only a weak reference to the
+    object is kept.
+    """
+    if not hasattr(os, "register_at_fork"):
+        return
+    ref = weakref.WeakMethod(method)
+
+    def _after_fork():
+        bound = ref()
+        if bound is not None:
+            bound()
+
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def set_torch_threads(num_threads: int):
+    """
+    Set torch's intra-op thread count (no-op when torch is not installed).
+    """
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(num_threads)
+
+
+def default_torch_threads(workers: int) -> int:
+    configured = os.getenv("RAG_TORCH_THREADS")
+    if configured:
+        return int(configured)
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def _listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, torch_threads: int):
+    # The parent's supervisor handlers must not run in the worker
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    set_torch_threads(torch_threads)
+
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app))
+    server.run(sockets=[sock])
+
+
+def serve_prefork(
+    app,
+    engine_loader,
+    host: str,
+    port: int,
+    workers: int,
+    torch_threads: Optional[int] = None
+):
+    """
+    Load the engine once, then fork workers serving app on host:port.
+    Blocks until every worker has exited; dead workers are restarted.
+
+    Args:
+        app: FastAPI app of the service
+        engine_loader: The service's EngineLoader; its engine is built here,
+            so the app's lifespan finds it ready in every worker
+        host: Bind address
+        port: Bind port
+        workers: Number of worker processes
+        torch_threads: Intra-op threads per worker (default: RAG_TORCH_THREADS
+            or CPU cores // workers)
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("Pre-fork mode requires os.fork (Linux/macOS)")
+    if torch_threads is None:
+        torch_threads = default_torch_threads(workers)
+
+    # The in-memory KB matrix is what the workers share; ChromaDB's SQLite
+    # connections must not cross fork()
+    if not os.getenv("RAG_RETRIEVER_BACKEND"):
+        os.environ["RAG_RETRIEVER_BACKEND"] = "numpy"
+    elif os.environ["RAG_RETRIEVER_BACKEND"].lower() == "chroma":
+        raise RuntimeError("RAG_RETRIEVER_BACKEND=chroma cannot be shared by forked workers; use numpy or RAG_WORKERS=1")
+    # An OpenMP pool started in the parent is unusable in forked children,
+    # so the parent's load and warmup run single-threaded
+    set_torch_threads(1)
+
+    engine_loader.load()
+    if engine_loader.engine is None:
+        raise RuntimeError(f"{engine_loader.name} failed to load: {engine_loader.error}")
+
+    sock = _listen(host, port)
+    # Keep the garbage collector from writing to (and so copying) the
+    # pages of every object loaded so far
+    gc.collect()
+    gc.freeze()
+
+    children: Dict[int, int] = {}
+    stopping = False
+
+    def spawn(index: int):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(app, sock, torch_threads)
+            finally:
+                os._exit(0)
+        children[pid] = index
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info("Starting workers", extra={
+        "service": engine_loader.name, "workers": workers, "address": f"{host}:{port}", "torch_threads": torch_threads
+    })
+    for index in range(workers):
+        spawn(index)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = children.pop(pid, None)
+        if index is not None and not stopping:
+            logger.warning("Worker exited, restarting", extra={"pid": pid, "status": status})
+            time.sleep(1)
+            spawn(index)
+    sock.close()
@@ -0,0 +1,141 @@
+"""
+On-demand sampling profiler for live traffic.
+
+A background thread wakes up every interval, reads the current stack of
+every other thread (sys._current_frames) and counts identical stacks. The
+result is returned in the collapsed-stack format of flamegraph.pl,
+speedscope and inferno, one line per distinct stack:
+
+    MainThread;run (asyncio/runners.py:86);...;embed_query (rag_engine.py:201) 42
+
+Nothing is instrumented and the workers are never paused for longer than
+it takes to copy their stacks, so a profile can run on a production
+process. With RAG_WORKERS > 1 it samples the worker that received the
+request.
+
+The endpoint is admin only: it is disabled unless RAG_ADMIN_TOKEN is set,
+and callers must send that token in the X-Admin-Token header.
+"""
+
+import asyncio
+import collections
+import hmac
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+class ProfilerBusy(Exception):
+    """
+    A profile is already running in this process.
+    """
+
+
+def _frame_label(code) -> str:
+    # Last two path components keep labels short but tell __init__.py files apart
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, admin_token: str, max_seconds: float = 60.0, min_interval: float = 0.001):
+        """
+        Args:
+            admin_token: Token expected in the X-Admin-Token header
+            max_seconds: Longest profile allowed, in seconds
+            min_interval: Shortest sampling interval allowed, in seconds
+        """
+        self.admin_token = admin_token
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self._running = False
+        self._stats = {"profiles": 0, "samples": 0, "sampling_seconds": 0.0}
+
+    @classmethod
+    def from_env(cls) -> Optional["SamplingProfiler"]:
+        """
+        Build from RAG_ADMIN_TOKEN / RAG_PROFILE_MAX_SECONDS.
+        Returns None when no admin token is configured.
+        """
+        admin_token = os.getenv("RAG_ADMIN_TOKEN", "")
+        if not admin_token:
+            return None
+        return cls(admin_token, max_seconds=float(os.getenv("RAG_PROFILE_MAX_SECONDS", "60")))
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return token is not None and hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def _sample(self, stop: threading.Event, interval: float, counts: collections.Counter):
+        me = threading.get_ident()
+        cost = 0.0
+        while not stop.wait(interval):
+            start = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                counts[";".join(reversed(stack))] += 1
+            cost += time.perf_counter() - start
+        self._stats["sampling_seconds"] += cost
+
+    async def profile(self, seconds: float, interval: float = 0.01) -> Dict[str, Any]:
+        """
+        Sample every thread of the process for the given time while it keeps
+        serving requests.
+
+        Args:
+            seconds: Duration of the profile
+            interval: Seconds between two samples
+
+        Returns:
+            {"collapsed": collapsed stacks, "samples": stacks taken,
+             "overhead": fraction of the time spent sampling}
+
+        Raises:
+            ValueError: On a duration or interval out of bounds
+            ProfilerBusy: When another profile is running
+        """
+        if not 0 < seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be in (0, {self.max_seconds:g}]")
+        if not self.min_interval <= interval <= seconds:
+            raise ValueError(f"The sampling interval must be between {self.min_interval * 1000:g} ms and the duration")
+        if self._running:
+            raise ProfilerBusy("A profile is already running")
+        self._running = True
+        counts: collections.Counter = collections.Counter()
+        stop = threading.Event()
+        sampling_before = self._stats["sampling_seconds"]
+        thread = threading.Thread(target=self._sample, args=(stop, interval, counts), name="rag-profiler", daemon=True)
+        thread.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            # At most one sample away; off the loop so other requests go on
+            await asyncio.get_running_loop().run_in_executor(None, thread.join)
+            self._running = False
+
+        samples = sum(counts.values())
+        self._stats["profiles"] += 1
+        self._stats["samples"] += samples
+        lines = [f"{stack} {count}" for stack, count in counts.most_common()]
+        return {
+            "collapsed": "\n".join(lines) + "\n" if lines else "",
+            "samples": samples,
+            "overhead": (self._stats["sampling_seconds"] - sampling_before) / seconds
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["sampling_seconds"] = round(stats["sampling_seconds"], 3)
+        stats.update({"running": self._running, "max_seconds": self.max_seconds})
+        return stats
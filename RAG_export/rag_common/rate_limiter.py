@@ -0,0 +1,442 @@
+"""
+Client-side Groq rate limiting.
+
+Groq enforces requests-per-minute and tokens-per-minute limits per model
+and account. Without a client-side budget a burst runs into provider 429s,
+and the retries make the burst worse. GroqRateLimiter keeps one token
+bucket per limit and makes every LLM call wait, in priority order
+(interactive before batch), until both buckets can pay for it:
+
+- the cost of a call is estimated as its input tokens plus max_tokens,
+  and the unused part is given back once the response reports its usage,
+- the x-ratelimit-* headers of every Groq response lower the local
+  buckets to what the provider says is left, so calls made by other
+  processes or workers on the same key are accounted for; a 429 pauses
+  all dispatch for its retry-after.
+
+The limiter is off unless RAG_GROQ_RPM or RAG_GROQ_TPM is set: Groq's
+limits depend on the account tier, and a guessed default would cap a paid
+account at free-tier throughput. A configured limit is a ceiling the
+headers can only lower; a limit left unset follows the provider's
+x-ratelimit-limit-tokens header (the request limit can be per day, so an
+unset RPM stays unlimited).
+
+Waiting callers do not poll: the first in line sleeps until its refill
+time, and is woken early when tokens are given back or the headers move
+the buckets; the others sleep until they become first.
+
+The headers are read through httpx event hooks on the clients handed to
+ChatGroq (http_client / http_async_client). One limiter exists per model
+and process, shared by every engine in it. With RAG_WORKERS > 1 each
+worker gets an equal share of the configured limits.
+
+To try it without a Groq account, run the stub server
+(python -m rag_common.groq_stub) and set GROQ_API_BASE to its URL.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from rag_common.context_builder import estimate_tokens
+from rag_common.prefork import register_after_fork
+
+# Priorities: lower is dispatched first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+# System message and answer format around the context and user prompt
+PROMPT_OVERHEAD_TOKENS = 400
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds in a rate-limit reset header: "7.66s", "2m59.56s", "120ms" or "3".
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    def __init__(self, per_minute: Optional[float], share: float = 1.0):
+        """
+        Args:
+            per_minute: Capacity, refilled evenly over one minute (None: no
+                limit until the provider reports one)
+            share: Part of the provider's limit this bucket may use (1 / workers)
+        """
+        self.configured = float(per_minute) if per_minute else None
+        self.share = share
+        self.capacity = self.configured
+        self.rate = self.capacity / 60.0 if self.capacity else 0.0
+        self.level = self.capacity or 0.0
+        self._updated = time.monotonic()
+
+    @property
+    def limited(self) -> bool:
+        return self.capacity is not None
+
+    def refill(self, now: float):
+        if self.limited:
+            self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if not self.limited:
+            return 0.0
+        # A call larger than the whole bucket goes through once it is full
+        missing = min(amount, self.capacity) - self.level
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        if self.limited:
+            self.level -= amount
+
+    def give_back(self, amount: float):
+        if self.limited:
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining: Optional[int], limit: Optional[int] = None):
+        """
+        Apply provider headers, which are for the whole account: budget this
+        bucket's share of the provider's limit (never more than the configured
+        limit, if any), never hold more than that share of what it says is left.
+        """
+        if limit:
+            capacity = limit * self.share
+            if self.configured is not None:
+                capacity = min(self.configured, capacity)
+            if not self.limited:
+                # First limit reported: start full, what is left is applied below
+                self.level = capacity
+            self.capacity = capacity
+            self.rate = self.capacity / 60.0
+            self.level = min(self.level, self.capacity)
+        if self.limited and remaining is not None and remaining * self.share < self.level:
+            self.level = remaining * self.share
+
+
+class GroqRateLimiter:
+    def __init__(
+        self,
+        model_name: str,
+        requests_per_minute: Optional[float],
+        tokens_per_minute: Optional[float],
+        share: float = 1.0
+    ):
+        """
+        Args:
+            model_name: Groq model the limits apply to
+            requests_per_minute: Request budget of this process (None: unlimited)
+            tokens_per_minute: Token budget of this process (None: from the headers)
+            share: Part of the account's limits this process may use (1 / workers)
+        """
+        self.model_name = model_name
+        self.requests = TokenBucket(requests_per_minute, share)
+        self.tokens = TokenBucket(tokens_per_minute, share)
+        self._lock = threading.Lock()
+        self._queue = []
+        # Queue entry -> callable waking its caller
+        self._wakers: Dict[Tuple[int, int], Callable[[], None]] = {}
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._stats = {
+            "dispatched": {name: 0 for name in PRIORITY_NAMES.values()},
+            "delayed": 0,
+            "wait_seconds": 0.0,
+            "tokens_reserved": 0,
+            "tokens_returned": 0,
+            "header_updates": 0,
+            "provider_429": 0
+        }
+        register_after_fork(self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._queue = []
+        self._wakers = {}
+
+    @classmethod
+    def from_env(cls, model_name: str) -> Optional["GroqRateLimiter"]:
+        """
+        Build from RAG_GROQ_* environment variables.
+        Returns None unless RAG_GROQ_RPM or RAG_GROQ_TPM is set, or when
+        RAG_GROQ_RATE_LIMIT_ENABLED is false.
+        """
+        if os.getenv("RAG_GROQ_RATE_LIMIT_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        rpm = float(os.getenv("RAG_GROQ_RPM") or 0)
+        tpm = float(os.getenv("RAG_GROQ_TPM") or 0)
+        if not rpm and not tpm:
+            return None
+        workers = max(1, int(os.getenv("RAG_WORKERS", "1")))
+        return cls(
+            model_name,
+            requests_per_minute=rpm / workers or None,
+            tokens_per_minute=tpm / workers or None,
+            share=1.0 / workers
+        )
+
+    def estimate_cost(self, prompt_text: str, max_tokens: int) -> int:
+        """
+        Tokens a call may use: its input (plus the fixed prompt around it) and max_tokens.
+        """
+        return estimate_tokens(prompt_text) + PROMPT_OVERHEAD_TOKENS + (max_tokens or 0)
+
+    def _poll(self, entry: Tuple[int, int], cost: int) -> Optional[float]:
+        """
+        Dispatch entry if it is first in line and within budget.
+
+        Returns:
+            0 when dispatched, the time until the budget is there when first
+            in line, otherwise None (wait to be woken)
+        """
+        with self._lock:
+            if self._queue[0] != entry:
+                return None
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self._paused_until - now, self.requests.wait_time(1), self.tokens.wait_time(cost))
+            if wait > 0:
+                return wait
+            heapq.heappop(self._queue)
+            del self._wakers[entry]
+            self.requests.take(1)
+            self.tokens.take(cost)
+            self._stats["tokens_reserved"] += cost
+            self._wake_first()
+            return 0.0
+
+    def _wake_first(self):
+        # Under self._lock: the first in line re-checks the budget
+        if self._queue:
+            self._wakers[self._queue[0]]()
+
+    def _enqueue(self, priority: int, waker: Callable[[], None]) -> Tuple[int, int]:
+        entry = (priority, next(self._sequence))
+        with self._lock:
+            heapq.heappush(self._queue, entry)
+            self._wakers[entry] = waker
+        return entry
+
+    def _cancel(self, entry: Tuple[int, int]):
+        with self._lock:
+            if entry in self._queue:
+                first = self._queue[0] == entry
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                del self._wakers[entry]
+                if first:
+                    self._wake_first()
+
+    def _dispatched(self, priority: int, waited: float):
+        with self._lock:
+            self._stats["dispatched"][PRIORITY_NAMES.get(priority, str(priority))] += 1
+            if waited > 0.001:
+                self._stats["delayed"] += 1
+                self._stats["wait_seconds"] += waited
+
+    def acquire(self, cost: int, priority: int = INTERACTIVE):
+        """
+        Block until the call fits in the budget.
+        """
+        woken = threading.Event()
+        entry = self._enqueue(priority, woken.set)
+        start = time.monotonic()
+        try:
+            wait = self._poll(entry, cost)
+            while wait != 0:
+                woken.wait(wait)
+                woken.clear()
+                wait = self._poll(entry, cost)
+        except BaseException:
+            self._cancel(entry)
+            raise
+        self._dispatched(priority, time.monotonic() - start)
+
+    def try_acquire(self, cost: int) -> bool:
+        """
+        Take the budget for one call only if it is available right now and
+        nobody is queued (used for optional calls such as hedges).
+        """
+        with self._lock:
+            if self._queue:
+                return False
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if max(self._paused_until - now, self.requests.wait_time(1), self.tokens.wait_time(cost)) > 0:
+                return False
+            self.requests.take(1)
+            self.tokens.take(cost)
+            self._stats["tokens_reserved"] += cost
+        self._dispatched(INTERACTIVE, 0.0)
+        return True
+
+    async def aacquire(self, cost: int, priority: int = INTERACTIVE):
+        """
+        Async version of acquire; a cancelled caller leaves the queue.
+        """
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+        # Woken from other threads too (sync callers, HTTP hooks)
+        entry = self._enqueue(priority, lambda: loop.call_soon_threadsafe(woken.set))
+        start = time.monotonic()
+        try:
+            wait = self._poll(entry, cost)
+            while wait != 0:
+                try:
+                    await asyncio.wait_for(woken.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                woken.clear()
+                wait = self._poll(entry, cost)
+        except BaseException:
+            self._cancel(entry)
+            raise
+        self._dispatched(priority, time.monotonic() - start)
+
+    def settle(self, cost: int, message: Optional[Any]):
+        """
+        Give back the reserved tokens the call did not use, from its usage metadata.
+        """
+        usage = getattr(message, "usage_metadata", None) or {}
+        used = usage.get("total_tokens")
+        if not used:
+            used = ((getattr(message, "response_metadata", None) or {}).get("token_usage") or {}).get("total_tokens")
+        if not used or used >= cost:
+            return
+        with self._lock:
+            self.tokens.give_back(cost - used)
+            self._stats["tokens_returned"] += cost - used
+            self._wake_first()
+
+    def observe_response(self, status_code: int, headers):
+        """
+        Sync the buckets with the x-ratelimit-* headers of a Groq response.
+        """
+        remaining_tokens = _int_header(headers, "x-ratelimit-remaining-tokens")
+        remaining_requests = _int_header(headers, "x-ratelimit-remaining-requests")
+        retry_after = parse_reset(headers.get("retry-after"))
+        if remaining_tokens is None and remaining_requests is None and status_code != 429:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            # x-ratelimit-limit-tokens is per minute; the request limit can be per day
+            self.tokens.sync(remaining_tokens, _int_header(headers, "x-ratelimit-limit-tokens"))
+            self.requests.sync(remaining_requests)
+            if remaining_tokens == 0:
+                reset = parse_reset(headers.get("x-ratelimit-reset-tokens"))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+            if remaining_requests == 0:
+                reset = parse_reset(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+            if status_code == 429:
+                self._stats["provider_429"] += 1
+                self._paused_until = max(self._paused_until, now + (retry_after or 1.0))
+            self._stats["header_updates"] += 1
+            self._wake_first()
+
+    def http_clients(self):
+        """
+        httpx clients for ChatGroq(http_client=..., http_async_client=...)
+        that report every response to this limiter.
+        """
+        import httpx
+
+        def on_response(response):
+            self.observe_response(response.status_code, response.headers)
+
+        async def aon_response(response):
+            self.observe_response(response.status_code, response.headers)
+
+        return (
+            httpx.Client(event_hooks={"response": [on_response]}),
+            httpx.AsyncClient(event_hooks={"response": [aon_response]})
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            stats = {key: dict(value) if isinstance(value, dict) else value for key, value in self._stats.items()}
+            stats.update({
+                "model": self.model_name,
+                "queued": len(self._queue),
+                "requests_available": round(self.requests.level, 2) if self.requests.limited else None,
+                "requests_per_minute": self.requests.capacity,
+                "tokens_available": round(self.tokens.level) if self.tokens.limited else None,
+                "tokens_per_minute": self.tokens.capacity,
+                "paused_for": round(max(0.0, self._paused_until - now), 2)
+            })
+        delayed, wait_seconds = stats["delayed"], stats.pop("wait_seconds")
+        stats["avg_wait_seconds"] = round(wait_seconds / delayed, 3) if delayed else 0.0
+        return stats
+
+
+_limiters: Dict[str, Optional[GroqRateLimiter]] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str) -> Optional[GroqRateLimiter]:
+    """
+    The process-wide limiter of a Groq model, shared by all engines (None when disabled).
+    """
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = GroqRateLimiter.from_env(model_name)
+        return _limiters[model_name]
+
+
+def groq_client_kwargs(limiter: Optional[GroqRateLimiter]) -> Dict[str, Any]:
+    """
+    Extra ChatGroq arguments wiring its HTTP responses to the limiter.
+    """
+    if limiter is None:
+        return {}
+    http_client, http_async_client = limiter.http_clients()
+    return {"http_client": http_client, "http_async_client": http_async_client}
+
+
+def rate_limiter_stats() -> Dict[str, Any]:
+    """
+    Stats of every model limiter of this process.
+    """
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {
+        model_name: limiter.stats() if limiter is not None else {"enabled": False}
+        for model_name, limiter in limiters.items()
+    }
@@ -0,0 +1,228 @@
+"""
+Two-tier exact-match response cache for generated to-do lists and plans.
+
+Tier 1 is a bounded in-memory LRU, tier 2 a SQLite file that survives
+restarts. Keys are built from a normalized prompt (case, whitespace and
+accents folded) plus the generation parameters (language, mode, model...).
+"""
+
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from rag_common.prefork import register_after_fork
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Normalize a prompt so trivially different spellings share a cache entry.
+    Lowercases, strips accents and collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.split())
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        namespace: str,
+        db_path: Optional[str] = None,
+        max_memory_entries: int = 256,
+        max_disk_entries: int = 10000,
+        ttl_seconds: float = 7 * 24 * 3600
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            namespace: Name separating entries of different services in a shared file
+            db_path: SQLite file for the persistent tier (None disables it)
+            max_memory_entries: Size of the in-memory LRU
+            max_disk_entries: Maximum number of rows kept on disk
+            ttl_seconds: Lifetime of an entry in both tiers
+        """
+        self.namespace = namespace
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "invalidations": 0
+        }
+
+        self._conn = None
+        if db_path:
+            directory = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " namespace TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            self._conn.commit()
+        register_after_fork(self._after_fork)
+
+    def _after_fork(self):
+        # SQLite connections must not be used across fork(); open a fresh one
+        self._lock = threading.Lock()
+        if self._conn is not None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+
+    @classmethod
+    def from_env(cls, namespace: str, default_db_path: str) -> Optional["ResponseCache"]:
+        """
+        Build a cache configured from RAG_CACHE_* environment variables.
+        Returns None when RAG_CACHE_ENABLED is false.
+        """
+        if os.getenv("RAG_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        db_path = os.getenv("RAG_CACHE_DB_PATH", default_db_path) or None
+        return cls(
+            namespace=namespace,
+            db_path=db_path,
+            max_memory_entries=int(os.getenv("RAG_CACHE_MEMORY_SIZE", "256")),
+            max_disk_entries=int(os.getenv("RAG_CACHE_DISK_SIZE", "10000")),
+            ttl_seconds=float(os.getenv("RAG_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+
+    def make_key(self, prompt: str, **params) -> str:
+        """
+        Build a cache key from the normalized prompt and generation parameters.
+        """
+        payload = json.dumps(
+            {"prompt": normalize_prompt(prompt), "params": params},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a key in memory, then on disk. Returns a copy of the value or None.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return copy.deepcopy(value)
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM response_cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is not None:
+                    value_json, created_at = row
+                    if now - created_at <= self.ttl_seconds:
+                        self._conn.execute(
+                            "UPDATE response_cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                            (now, self.namespace, key)
+                        )
+                        self._conn.commit()
+                        value = json.loads(value_json)
+                        self._remember(key, created_at, value)
+                        self._stats["disk_hits"] += 1
+                        return copy.deepcopy(value)
+                    self._conn.execute(
+                        "DELETE FROM response_cache WHERE namespace = ? AND key = ?",
+                        (self.namespace, key)
+                    )
+                    self._conn.commit()
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict):
+        """
+        Store a value in both tiers.
+        """
+        now = time.time()
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._remember(key, now, value)
+            self._stats["writes"] += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO response_cache (namespace, key, value, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now)
+                )
+                self._evict_disk(now)
+                self._conn.commit()
+
+    def clear(self):
+        """
+        Drop every entry of this namespace, e.g. after the knowledge base changed.
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM response_cache WHERE namespace = ?", (self.namespace,))
+                self._conn.commit()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        """
+        Return hit/miss counters and current sizes.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._conn is not None:
+                stats["disk_entries"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM response_cache WHERE namespace = ?", (self.namespace,)
+                ).fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, created_at: float, value: Dict):
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        self._conn.execute(
+            "DELETE FROM response_cache WHERE namespace = ? AND created_at < ?",
+            (self.namespace, now - self.ttl_seconds)
+        )
+        count = self._conn.execute(
+            "SELECT COUNT(*) FROM response_cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE rowid IN ("
+                " SELECT rowid FROM response_cache WHERE namespace = ?"
+                " ORDER BY accessed_at ASC LIMIT ?)",
+                (self.namespace, overflow)
+            )
+            self._stats["evictions"] += overflow
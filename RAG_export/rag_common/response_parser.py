@@ -0,0 +1,387 @@
+"""
+Shared parsing of LLM answers into validated to-do lists and plans.
+
+Both engines used to strip ``` fences and call json.loads, and on any
+error returned a canned task list as if it were a real answer. Clients
+retried those, doubling the LLM load. ResponseParser instead:
+
+1. reads the compact line format when it is enabled,
+2. parses the answer as JSON, else the outermost {...} object found in
+   the surrounding prose or fences,
+3. repairs common defects: trailing commas, smart quotes, and arrays or
+   strings cut off by max_tokens (the incomplete last element is dropped),
+4. validates the result against a typed schema,
+5. makes at most one cheap re-ask (small model, temperature 0) showing the
+   broken answer, and raises ResponseParseError if that fails too.
+
+Every outcome is counted; stats() is served by /parser/stats.
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, field_validator, model_validator
+
+from rag_common.compact_format import parse_compact
+from rag_common.log import get_logger
+from rag_common.metrics import record_llm_usage
+
+logger = get_logger("parser")
+
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‟": '"', "″": '"', "‘": "'", "’": "'"})
+
+
+class ResponseParseError(ValueError):
+    """
+    The LLM answer could not be turned into a valid result, even after repair and re-ask.
+    """
+
+
+def _optional_text(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    value = value.strip()
+    return None if value.lower() in ("", "null", "none", "n/a", "-") else value
+
+
+class TodoSchema(BaseModel):
+    title: Optional[str] = None
+    tasks: List[str]
+
+    @field_validator("tasks", mode="before")
+    @classmethod
+    def _task_strings(cls, tasks):
+        if not isinstance(tasks, list):
+            return tasks
+        strings = []
+        for task in tasks:
+            if isinstance(task, dict):
+                # {"task": "..."} or {"title": "...", "description": "..."}
+                task = task.get("task") or task.get("title") or task.get("description") or \
+                    next((value for value in task.values() if isinstance(value, str)), None)
+            task = _optional_text(task)
+            if task:
+                strings.append(task)
+        if not strings:
+            raise ValueError("no tasks")
+        return strings
+
+
+class PlanTask(BaseModel):
+    time: Optional[str] = None
+    duration: Optional[str] = None
+    activity: str
+    description: Optional[str] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _from_string(cls, task):
+        # A bare "Yoga" task is an activity without details
+        return {"activity": task} if isinstance(task, str) else task
+
+    @field_validator("time", "duration", "description", mode="before")
+    @classmethod
+    def _optional(cls, value):
+        return _optional_text(value)
+
+
+class PlanSchema(BaseModel):
+    title: Optional[str] = None
+    tasks: List[PlanTask]
+
+    @field_validator("tasks")
+    @classmethod
+    def _not_empty(cls, tasks):
+        if not tasks:
+            raise ValueError("no tasks")
+        return tasks
+
+
+class ActivityTask(BaseModel):
+    activity: str
+    description: Optional[str] = None
+    category: Optional[str] = None
+    time: Optional[str] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _from_string(cls, task):
+        # A bare "Yoga" task is an activity without details
+        return {"activity": task} if isinstance(task, str) else task
+
+    @field_validator("description", "category", "time", mode="before")
+    @classmethod
+    def _optional(cls, value):
+        return _optional_text(value)
+
+
+class ActivityPlanSchema(BaseModel):
+    title: Optional[str] = None
+    tasks: List[ActivityTask]
+
+    @field_validator("tasks")
+    @classmethod
+    def _not_empty(cls, tasks):
+        if not tasks:
+            raise ValueError("no tasks")
+        return tasks
+
+
+def extract_json_object(text: str) -> Tuple[Optional[str], bool]:
+    """
+    The outermost {...} object in text, ignoring prose and fences around it.
+
+    Returns:
+        (object text or None, complete) where complete is False when the
+        text ends before the object is closed (truncated answer)
+    """
+    start = text.find("{")
+    if start == -1:
+        return None, False
+    depth = 0
+    in_string = False
+    escape = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1], True
+    return text[start:], False
+
+
+def repair_json(text: str) -> List[str]:
+    """
+    Candidate repairs of a broken JSON object, most likely first: trailing
+    commas removed, then for a truncated object either the containers
+    closed as they are, or the text cut back to one of the last complete
+    elements and closed (tried first when the cut fell inside a string).
+    """
+    out = []
+    stack = []
+    in_string = False
+    escape = False
+    # (length of out, open containers) where the text can be cut and closed
+    cuts = []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+            cuts.append((len(out), list(stack)))
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            out.append(char)
+        elif char == ",":
+            rest = text[index + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                # Trailing comma
+                index += 1
+                continue
+            cuts.append((len(out), list(stack)))
+            out.append(char)
+        else:
+            out.append(char)
+        index += 1
+
+    repaired = "".join(out)
+    if not stack and not in_string:
+        return [repaired]
+    closed = (repaired + ('"' if in_string else "")).rstrip().rstrip(",:") + "".join(reversed(stack))
+    cut_back = [
+        "".join(out[:length]).rstrip().rstrip(",") + "".join(reversed(open_containers))
+        for length, open_containers in reversed(cuts[-4:])
+    ]
+    # A string cut by max_tokens is an incomplete task: prefer dropping it
+    return cut_back + [closed] if in_string else [closed] + cut_back
+
+
+class ResponseParser:
+    def __init__(self, name: str):
+        """
+        Args:
+            name: Service name used in log lines
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats = {
+            "compact": 0,
+            "json": 0,
+            "extracted": 0,
+            "repaired": 0,
+            "reasked": 0,
+            "failed": 0,
+            "validation_errors": 0
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        total = sum(stats[key] for key in ("compact", "json", "extracted", "repaired", "reasked", "failed"))
+        stats["total"] = total
+        stats["failure_rate"] = round(stats["failed"] / total, 4) if total else 0.0
+        return stats
+
+    def _validate(self, data: Any, schema: Type[BaseModel], default_title: str) -> Optional[Dict[str, Any]]:
+        if not isinstance(data, dict):
+            return None
+        try:
+            result = schema.model_validate(data).model_dump()
+        except ValidationError:
+            self._count("validation_errors")
+            return None
+        result["title"] = result.get("title") or default_title
+        return result
+
+    def try_parse(
+        self,
+        raw_content: str,
+        schema: Type[BaseModel],
+        default_title: str,
+        compact_fields: Optional[List[str]] = None,
+        compact: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Parse without re-asking.
+
+        Returns:
+            (validated result or None, stage that succeeded or "failed")
+        """
+        if compact:
+            result = self._validate(parse_compact(raw_content, compact_fields), schema, default_title)
+            if result is not None:
+                return result, "compact"
+
+        content = raw_content.strip()
+        try:
+            result = self._validate(json.loads(content), schema, default_title)
+            if result is not None:
+                return result, "json"
+        except ValueError:
+            pass
+
+        candidate, complete = extract_json_object(content)
+        if candidate is None:
+            return None, "failed"
+        if complete:
+            try:
+                result = self._validate(json.loads(candidate), schema, default_title)
+                if result is not None:
+                    return result, "extracted"
+            except ValueError:
+                pass
+
+        for text in (candidate, candidate.translate(_SMART_QUOTES)):
+            for repaired in repair_json(text):
+                try:
+                    data = json.loads(repaired)
+                except ValueError:
+                    continue
+                result = self._validate(data, schema, default_title)
+                if result is not None:
+                    return result, "repaired"
+        return None, "failed"
+
+    def parse(
+        self,
+        raw_content: str,
+        schema: Type[BaseModel],
+        default_title: str,
+        compact_fields: Optional[List[str]] = None,
+        compact: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """
+        try_parse() that records the outcome; None means a re-ask is needed.
+        """
+        result, stage = self.try_parse(raw_content, schema, default_title, compact_fields, compact)
+        if result is not None:
+            self._count(stage)
+        return result
+
+    def _reask_messages(self, raw_content: str, schema: Type[BaseModel]):
+        schema_json = json.dumps(schema.model_json_schema(), ensure_ascii=False)
+        return [
+            ("system", "Convert the answer below into ONE valid JSON object matching this JSON schema. "
+                       "Keep its content and language. Respond with the JSON only.\n" + schema_json),
+            ("user", raw_content[-6000:])
+        ]
+
+    def _after_reask(self, raw_content: str, reply, schema: Type[BaseModel], default_title: str) -> Dict[str, Any]:
+        result, _ = self.try_parse(getattr(reply, "content", "") or "", schema, default_title)
+        if result is None:
+            self._count("failed")
+            logger.error("Unparseable LLM response after re-ask", extra={"service": self.name, "response": raw_content[:500]})
+            raise ResponseParseError("The language model returned a response that could not be parsed")
+        self._count("reasked")
+        return result
+
+    def parse_or_reask(
+        self,
+        raw_content: str,
+        schema: Type[BaseModel],
+        default_title: str,
+        repair_llm,
+        compact_fields: Optional[List[str]] = None,
+        compact: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Parse, re-asking repair_llm once if needed. Raises ResponseParseError.
+        """
+        result = self.parse(raw_content, schema, default_title, compact_fields, compact)
+        if result is not None:
+            return result
+        logger.warning("Re-asking for a valid response", extra={"service": self.name})
+        reply = repair_llm.invoke(self._reask_messages(raw_content, schema))
+        record_llm_usage(getattr(repair_llm, "model_name", "repair"), reply)
+        return self._after_reask(raw_content, reply, schema, default_title)
+
+    async def aparse_or_reask(
+        self,
+        raw_content: str,
+        schema: Type[BaseModel],
+        default_title: str,
+        repair_llm,
+        compact_fields: Optional[List[str]] = None,
+        compact: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Async version of parse_or_reask.
+        """
+        result = self.parse(raw_content, schema, default_title, compact_fields, compact)
+        if result is not None:
+            return result
+        logger.warning("Re-asking for a valid response", extra={"service": self.name})
+        reply = await repair_llm.ainvoke(self._reask_messages(raw_content, schema))
+        record_llm_usage(getattr(repair_llm, "model_name", "repair"), reply)
+        return self._after_reask(raw_content, reply, schema, default_title)
@@ -0,0 +1,160 @@
+"""
+Pluggable retrievers for the knowledge base.
+
+Both backends take query vectors and return (page_content, similarity)
+pairs, best first, where similarity is the cosine similarity.
+
+- ChromaRetriever wraps the persisted ChromaDB collection (large corpora).
+- NumpyRetriever keeps the KB embeddings as one contiguous, L2-normalized
+  float32 matrix and answers top-k with a matrix product plus argpartition.
+  For the few dozen shipped templates this skips Chroma's client,
+  persistence and HNSW layers entirely.
+
+all-MiniLM-L6-v2 produces unit vectors, so Chroma's default squared-L2
+ranking (d = 2 - 2 cos) and the NumPy cosine ranking give the same top-k.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SearchResult = List[Tuple[str, float]]
+
+
+def get_retriever_backend() -> str:
+    """
+    Backend selected by RAG_RETRIEVER_BACKEND: "chroma" (default) or "numpy".
+    """
+    backend = (os.getenv("RAG_RETRIEVER_BACKEND") or "chroma").lower()
+    if backend not in ("chroma", "numpy"):
+        raise ValueError(f"Unknown RAG_RETRIEVER_BACKEND: {backend}")
+    return backend
+
+
+class Retriever(ABC):
+    """
+    Interface shared by the retriever backends.
+    """
+
+    def search_by_vector(self, query_embedding: List[float], k: int) -> SearchResult:
+        return self.search_by_vectors([query_embedding], k)[0]
+
+    @abstractmethod
+    def search_by_vectors(self, query_embeddings: List[List[float]], k: int) -> List[SearchResult]:
+        ...
+
+    @abstractmethod
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None):
+        ...
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+
+class ChromaRetriever(Retriever):
+    def __init__(self, vector_store):
+        """
+        Args:
+            vector_store: LangChain Chroma vector store
+        """
+        self.vector_store = vector_store
+        metadata = vector_store._collection.metadata or {}
+        self.space = metadata.get("hnsw:space", "l2")
+
+    def _similarity(self, distance: float) -> float:
+        if self.space == "l2":
+            # Squared L2 between unit vectors
+            return 1.0 - distance / 2.0
+        # "cosine" and "ip" distances are 1 - similarity
+        return 1.0 - distance
+
+    def search_by_vectors(self, query_embeddings: List[List[float]], k: int) -> List[SearchResult]:
+        if not query_embeddings:
+            return []
+        results = self.vector_store._collection.query(
+            query_embeddings=[list(map(float, embedding)) for embedding in query_embeddings],
+            n_results=k,
+            include=["documents", "distances"]
+        )
+        return [
+            [(document, self._similarity(distance)) for document, distance in zip(documents, distances)]
+            for documents, distances in zip(results["documents"], results["distances"])
+        ]
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None):
+        self.vector_store.add_texts(texts, metadatas=metadatas)
+
+    def count(self) -> int:
+        return self.vector_store._collection.count()
+
+
+class NumpyRetriever(Retriever):
+    def __init__(self, embeddings, texts: List[str], metadatas: Optional[List[Dict]] = None, vectors=None):
+        """
+        Args:
+            embeddings: LangChain embeddings used to embed the texts
+            texts: Knowledge base documents
+            metadatas: Optional metadata per document
+            vectors: Precomputed embeddings for the texts (skips embedding)
+        """
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+        self.texts: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        if texts:
+            self.add_texts(texts, metadatas, vectors)
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        if np.allclose(norms, 1.0, atol=1e-4):
+            # Already unit vectors (e.g. a memory-mapped KB artifact): no copy
+            return matrix
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def search_by_vectors(self, query_embeddings: List[List[float]], k: int) -> List[SearchResult]:
+        if not query_embeddings:
+            return []
+        # Read a consistent snapshot; add_texts swaps in new objects
+        matrix, texts = self.matrix, self.texts
+        if not texts:
+            return [[] for _ in query_embeddings]
+
+        queries = self._normalize(query_embeddings)
+        scores = queries @ matrix.T
+        k = min(k, len(texts))
+        if k < len(texts):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(texts)), (len(queries), 1))
+
+        results = []
+        for row, candidates in zip(scores, top):
+            ordered = candidates[np.argsort(-row[candidates], kind="stable")]
+            results.append([(texts[i], float(row[i])) for i in ordered])
+        return results
+
+    def add_texts(self, texts: List[str], metadatas: Optional[List[Dict]] = None, vectors=None):
+        if vectors is None:
+            vectors = self.embeddings.embed_documents(list(texts))
+        new_rows = self._normalize(vectors)
+        with self._lock:
+            if self.matrix.size:
+                matrix = np.ascontiguousarray(np.vstack([self.matrix, new_rows]))
+            else:
+                matrix = np.ascontiguousarray(new_rows)
+            self.metadatas = self.metadatas + list(metadatas or [{} for _ in texts])
+            self.texts = self.texts + list(texts)
+            self.matrix = matrix
+
+    def count(self) -> int:
+        return len(self.texts)
@@ -0,0 +1,153 @@
+"""
+Semantic response cache keyed on the MiniLM query embedding.
+
+Paraphrased prompts ("create a mobile fitness app" / "build a fitness
+mobile application") land close to each other in embedding space, so a
+previous {title, tasks} result can be reused when the cosine similarity of
+the new query to a cached one is above a threshold. Entries are scoped
+(language, mode, model) so a French STRICT extraction can never answer an
+English SUGGESTION request.
+"""
+
+import copy
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class _ScopeIndex:
+    """
+    Fixed-capacity vector store for one scope. Rows are L2-normalized so a
+    dot product is the cosine similarity.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.matrix = np.zeros((capacity, dim), dtype=np.float32)
+        self.values: List[Optional[Dict]] = [None] * capacity
+        self.created_at = np.zeros(capacity, dtype=np.float64)
+        self.accessed_at = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+
+    def free_slot(self, now: float, ttl_seconds: float) -> int:
+        if self.size < len(self.values):
+            slot = self.size
+            self.size += 1
+            return slot
+        expired = np.flatnonzero(now - self.created_at > ttl_seconds)
+        if expired.size:
+            return int(expired[0])
+        # Least recently used entry
+        return int(np.argmin(self.accessed_at))
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        max_entries_per_scope: int = 512,
+        ttl_seconds: float = 7 * 24 * 3600
+    ):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            threshold: Minimum cosine similarity for a hit
+            max_entries_per_scope: Capacity of each scope before LRU eviction
+            ttl_seconds: Lifetime of an entry
+        """
+        self.threshold = threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl_seconds = ttl_seconds
+
+        self._scopes: Dict[str, _ScopeIndex] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "invalidations": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """
+        Build a semantic cache configured from RAG_SEMANTIC_CACHE_* variables.
+        Returns None when RAG_SEMANTIC_CACHE_ENABLED is false.
+        """
+        if os.getenv("RAG_SEMANTIC_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            threshold=float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.92")),
+            max_entries_per_scope=int(os.getenv("RAG_SEMANTIC_CACHE_SIZE", "512")),
+            ttl_seconds=float(os.getenv("RAG_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        )
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, embedding, scope: str, threshold: Optional[float] = None) -> Optional[Dict]:
+        """
+        Return a copy of the closest cached result in the scope, or None if
+        nothing is similar enough.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            index = self._scopes.get(scope)
+            if index is None or index.size == 0:
+                self._stats["misses"] += 1
+                return None
+
+            similarities = index.matrix[:index.size] @ query
+            similarities[now - index.created_at[:index.size] > self.ttl_seconds] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < threshold:
+                self._stats["misses"] += 1
+                return None
+
+            index.accessed_at[best] = now
+            self._stats["hits"] += 1
+            return copy.deepcopy(index.values[best])
+
+    def store(self, embedding, scope: str, value: Dict):
+        """
+        Add a result to the scope, evicting the least recently used entry if full.
+        """
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            index = self._scopes.get(scope)
+            if index is None:
+                index = _ScopeIndex(vector.shape[0], self.max_entries_per_scope)
+                self._scopes[scope] = index
+
+            full = index.size == len(index.values)
+            slot = index.free_slot(now, self.ttl_seconds)
+            if full:
+                self._stats["evictions"] += 1
+            index.matrix[slot] = vector
+            index.values[slot] = copy.deepcopy(value)
+            index.created_at[slot] = now
+            index.accessed_at[slot] = now
+            self._stats["writes"] += 1
+
+    def clear(self):
+        """
+        Drop every scope, e.g. after the knowledge base changed.
+        """
+        with self._lock:
+            self._scopes.clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict:
+        """
+        Return hit/miss counters and per-scope sizes.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["scopes"] = {scope: index.size for scope, index in self._scopes.items()}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,82 @@
+"""
+Process-wide resources shared by RAGEngine and DailyRAGEngine.
+
+When both services run in one process (see unified_host.py), the host
+calls enable_shared_resources() before the engines are built. The engines
+then reuse one embedding model, one embedding batcher (and its cache) and
+one ChromaDB client, with a separate collection per service. Without it,
+every engine builds its own, as in the separate-port mode.
+"""
+
+import os
+import threading
+from typing import Optional
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def create_embeddings():
+    """
+    Load the local MiniLM embedding model (imports sentence-transformers/torch).
+    """
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'}
+    )
+
+
+class SharedResources:
+    def __init__(self, persist_directory: str):
+        """
+        Args:
+            persist_directory: Directory of the shared ChromaDB client
+        """
+        self.persist_directory = persist_directory
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._embedding_batcher = None
+        self._chroma_client = None
+
+    def embeddings(self):
+        with self._lock:
+            if self._embeddings is None:
+                self._embeddings = create_embeddings()
+            return self._embeddings
+
+    def embedding_batcher(self):
+        embeddings = self.embeddings()
+        with self._lock:
+            if self._embedding_batcher is None:
+                from rag_common.embedding_batcher import EmbeddingBatcher
+                self._embedding_batcher = EmbeddingBatcher.from_env(embeddings)
+            return self._embedding_batcher
+
+    def chroma_client(self):
+        with self._lock:
+            if self._chroma_client is None:
+                import chromadb
+                self._chroma_client = chromadb.PersistentClient(path=self.persist_directory)
+            return self._chroma_client
+
+
+_resources: Optional[SharedResources] = None
+
+
+def enable_shared_resources(persist_directory: Optional[str] = None) -> SharedResources:
+    """
+    Turn on resource sharing for every engine built afterwards in this process.
+    """
+    global _resources
+    if _resources is None:
+        _resources = SharedResources(
+            persist_directory or os.getenv("RAG_SHARED_CHROMA_DIR", "./chroma_db_shared")
+        )
+    return _resources
+
+
+def get_shared_resources() -> Optional[SharedResources]:
+    """
+    Return the shared resources, or None when each engine owns its own.
+    """
+    return _resources
@@ -0,0 +1,103 @@
+"""
+Request coalescing ("single-flight") for identical in-flight generations.
+
+Concurrent callers with the same key share one underlying task; its result
+or exception is fanned out to every waiter. A waiter that is cancelled only
+stops waiting: the shared task keeps running for the others and is
+cancelled only once nobody is waiting for it anymore. An abandoned call is
+forgotten at once, so a later caller starts a new one.
+
+The shared task runs in a context of its own rather than the leader's: it
+does not run under the leader's deadline nor time the leader's stages. Its
+LLM usage and stage timings are handed to every waiter it completes for;
+only the leader's request id (for its log lines) and service (for its
+metrics) are kept.
+"""
+
+import asyncio
+import contextvars
+import copy
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from rag_common.deadline import Deadline, bind_deadline, current_deadline
+from rag_common.log import bind_request_id, current_request_id
+from rag_common.metrics import add_request_stages, bind_request_stages, bind_service, current_service
+
+
+class _Call:
+    def __init__(self, guard=None):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        # Usage and timings of the shared work, handed to each waiter
+        self.deadline = Deadline(None, guard)
+        self.stages: Dict[str, float] = {}
+
+    def _bind(self, request_id: str, service: Optional[str]):
+        bind_request_id(request_id)
+        bind_service(service)
+        bind_deadline(self.deadline)
+        bind_request_stages(self.stages)
+
+    def start(self, func: Callable[[], Awaitable[Any]]):
+        context = contextvars.Context()
+        context.run(self._bind, current_request_id(), current_service())
+        self.task = asyncio.get_running_loop().create_task(func(), context=context)
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run func() for this key, or join the run already in flight.
+
+        Args:
+            key: Identity of the request (normalized prompt, language, mode...)
+            func: Zero-argument coroutine factory doing the actual work
+
+        Returns:
+            A private copy of the shared result
+        """
+        deadline = current_deadline()
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(deadline.guard if deadline is not None else None)
+            call.start(func)
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _task, key=key, call=call: self._forget(key, call))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            result = await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if deadline is not None:
+                # The request did depend on an LLM call, even if another waiter keeps it
+                deadline.llm_calls += call.deadline.llm_calls
+            raise
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every waiter went away: stop paying for the generation
+                self._forget(key, call)
+                call.deadline.reason = deadline.reason if deadline is not None and deadline.reason else "disconnect"
+                call.task.cancel()
+                self._stats["abandoned"] += 1
+        if deadline is not None:
+            deadline.llm_calls += call.deadline.llm_calls
+            deadline.tokens_used += call.deadline.tokens_used
+        add_request_stages(call.stages)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["in_flight"] = len(self._calls)
+        return stats
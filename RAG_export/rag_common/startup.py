@@ -0,0 +1,99 @@
+"""
+Background engine initialization for fast service startup.
+
+The FastAPI apps used to build their engine at import time, so uvicorn
+only accepted connections once torch, the MiniLM weights, the Groq client
+and ChromaDB were all loaded. EngineLoader builds the engine (including the
+heavy imports) on a background thread, then runs a warmup embedding and
+retrieval. /health answers immediately; /ready reports the loading state
+and per-component timings.
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+from rag_common.log import get_logger
+
+logger = get_logger("startup")
+
+
+@contextmanager
+def timed(timings: Dict[str, float], name: str):
+    """
+    Record the wall time of the block in timings[name] (seconds).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - start, 4)
+
+
+class EngineLoader:
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        """
+        Args:
+            name: Service name used in log lines
+            factory: Builds the engine; runs on a background thread, so heavy
+                imports belong inside it
+        """
+        self.name = name
+        self.factory = factory
+        self.engine = None
+        self.state = "not_started"
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._started_at = None
+        self._task = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Schedule the background load on the running event loop.
+        """
+        with self._lock:
+            if self._task is not None or self.engine is not None:
+                return
+            self.state = "starting"
+            self._started_at = time.perf_counter()
+            self._task = asyncio.get_running_loop().create_task(asyncio.to_thread(self.load))
+
+    def load(self):
+        """
+        Build and warm up the engine. Blocking; safe to call directly.
+        """
+        self.state = "starting"
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+        try:
+            with timed(self.timings, "engine"):
+                engine = self.factory()
+            self.timings.update(getattr(engine, "init_timings", {}))
+            warmup = getattr(engine, "warmup", None)
+            if warmup is not None:
+                with timed(self.timings, "warmup"):
+                    self.timings.update(warmup())
+            self.engine = engine
+            self.state = "ready"
+            logger.info("Engine ready", extra={"service": self.name, "timings": dict(self.timings)})
+        except Exception as e:
+            self.state = "failed"
+            self.error = f"{type(e).__name__}: {e}"
+            logger.exception("Engine failed to load", extra={"service": self.name})
+        finally:
+            self.timings["total"] = round(time.perf_counter() - self._started_at, 4)
+        return self.engine
+
+    def readiness(self) -> Dict:
+        """
+        Body of the /ready endpoint.
+        """
+        body = {"status": self.state, "timings_seconds": dict(self.timings)}
+        if self.state == "starting" and self._started_at is not None:
+            body["elapsed_seconds"] = round(time.perf_counter() - self._started_at, 4)
+        if self.error:
+            body["error"] = self.error
+        return body
@@ -0,0 +1,134 @@
+"""
+Incremental parsing of streamed LLM output and Server-Sent Events helpers.
+
+The LLM is asked for {"title": ..., "tasks": [...]}. While the completion
+streams in, IncrementalTaskParser pulls out the title and every element of
+the tasks array as soon as it is complete, so clients can render the first
+task long before the whole completion is done.
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class IncrementalTaskParser:
+    """
+    Character-level JSON scanner. Feed it chunks and it returns the
+    ("title", str) and ("task", item) events that became complete.
+    Text before the first '{' (prose, ```json fences) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._started = False
+        self._finished = False
+        # Each level is [kind, expecting_key, last_key, start_index]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._tasks_level = None
+        self._element_start = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of the completion and return newly completed events.
+        """
+        self.buffer += chunk
+        events = []
+        while self._pos < len(self.buffer) and not self._finished:
+            self._step(self.buffer[self._pos], self._pos, events)
+            self._pos += 1
+        return events
+
+    def finish(self) -> List[Tuple[str, Any]]:
+        """
+        Events still pending once the completion has ended (none for JSON:
+        every element is emitted when its closing character arrives).
+        """
+        return []
+
+    def _in_tasks_array(self) -> bool:
+        return self._tasks_level is not None and len(self._stack) == self._tasks_level
+
+    def _step(self, char: str, index: int, events: List[Tuple[str, Any]]):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                self._end_string(index, events)
+            return
+
+        if not self._started:
+            if char == "{":
+                self._started = True
+                self._stack.append(["obj", True, None, index])
+            return
+
+        if char == '"':
+            self._in_string = True
+            self._string_start = index
+            if self._in_tasks_array() and self._element_start is None:
+                self._element_start = index
+        elif char in "{[":
+            if self._in_tasks_array() and self._element_start is None:
+                self._element_start = index
+            parent = self._stack[-1]
+            opens_tasks = (
+                char == "[" and len(self._stack) == 1 and parent[0] == "obj" and parent[2] == "tasks"
+            )
+            self._stack.append(["obj" if char == "{" else "arr", char == "{", None, index])
+            if opens_tasks:
+                self._tasks_level = len(self._stack)
+        elif char in "}]":
+            closed = self._stack.pop()
+            if self._tasks_level is not None and len(self._stack) + 1 == self._tasks_level:
+                # The tasks array itself was closed
+                self._tasks_level = None
+            elif self._in_tasks_array() and self._element_start == closed[3]:
+                self._emit_task(index, events)
+            if not self._stack:
+                self._finished = True
+        elif char == ",":
+            top = self._stack[-1]
+            if top[0] == "obj":
+                top[1] = True
+            elif self._in_tasks_array():
+                self._element_start = None
+
+    def _end_string(self, index: int, events: List[Tuple[str, Any]]):
+        top = self._stack[-1]
+        raw = self.buffer[self._string_start:index + 1]
+        if top[0] == "obj" and top[1]:
+            top[1] = False
+            top[2] = json.loads(raw)
+        elif top[0] == "obj" and len(self._stack) == 1 and top[2] == "title":
+            events.append(("title", json.loads(raw)))
+        elif self._in_tasks_array() and self._element_start == self._string_start:
+            self._emit_task(index, events)
+
+    def _emit_task(self, end: int, events: List[Tuple[str, Any]]):
+        raw = self.buffer[self._element_start:end + 1]
+        self._element_start = None
+        try:
+            events.append(("task", json.loads(raw)))
+        except json.JSONDecodeError:
+            # Malformed element: the final validated payload will still carry the result
+            pass
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format one Server-Sent Event with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
@@ -228,3 +228,14 @@ def get_knowledge_base_text() -> str:
             text += f"{i}. {task}\n"
         texts.append(text)
     return texts
+
+def get_knowledge_base_documents() -> list:
+    """
+    Return (doc_id, text) pairs for indexing. The id is derived from the
+    template's category and prompt, so it stays stable when templates are
+    reordered or their tasks are edited.
+    """
+    return [
+        (f"template:{template['category']}:{template['prompt']}", text)
+        for template, text in zip(TASK_TEMPLATES, get_knowledge_base_text())
+    ]
@@ -2,22 +2,129 @@
 FastAPI backend for RAG-based To-Do List Generator
 """
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import os
+import sys
 from dotenv import load_dotenv
-from rag_engine import RAGEngine
 
-# Load environment variables
+# Add parent directory to path to use the shared rag_common package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Load environment variables (before rag_common, which reads RAG_* settings)
 load_dotenv()
 
+from rag_common.admission import AdmissionController, AdmissionRejected, AdmissionTicket
+from rag_common.deadline import TIMEOUT_HEADER, Deadline, RequestCancelled, RequestGuard
+from rag_common.log import RequestIdMiddleware, get_logger
+from rag_common.metrics import (
+    MetricsMiddleware, Stopwatch, engine_metrics, register_collector, render_metrics, stage_timer
+)
+from rag_common.profiler import ADMIN_TOKEN_HEADER, ProfilerBusy, SamplingProfiler
+from rag_common.rate_limiter import rate_limiter_stats
+from rag_common.response_parser import ResponseParseError
+from rag_common.startup import EngineLoader, timed
+from rag_common.streaming import SSE_HEADERS, format_sse
+
+groq_api_key = os.getenv("GROQ_API_KEY")
+if not groq_api_key:
+    raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in .env file")
+
+logger = get_logger("todo.api")
+
+
+def _build_engine():
+    """
+    Import and build the RAG engine. This is where torch, the embedding
+    model, the Groq client and ChromaDB get loaded.
+    """
+    with timed(engine_loader.timings, "import"):
+        try:
+            from .rag_engine import RAGEngine
+        except ImportError:
+            from rag_engine import RAGEngine
+    return RAGEngine(groq_api_key=groq_api_key)
+
+
+# Initialize RAG engine in the background so uvicorn accepts connections right away
+engine_loader = EngineLoader("RAG To-Do List Generator", _build_engine)
+
+# Parse outcomes and knowledge base size, read at each /metrics scrape
+register_collector("todo", lambda: engine_metrics(engine_loader.engine))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    engine_loader.start()
+    yield
+
+
+def get_rag_engine():
+    """
+    Return the RAG engine, or fail fast with 503 while it is still loading.
+    """
+    if engine_loader.engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail=f"RAG engine is not ready ({engine_loader.state})",
+            headers={"Retry-After": "5"}
+        )
+    return engine_loader.engine
+
+
+# Bounded in-flight generations and wait queue (None when disabled)
+admission = AdmissionController.from_env("todo")
+
+# Per-request deadlines and cancellation on client disconnect
+request_guard = RequestGuard.from_env("todo")
+
+
+def request_deadline(http_request: Request, timeout_ms: Optional[int]) -> Deadline:
+    """
+    Deadline from the X-Request-Timeout-Ms header or the timeout_ms field.
+    """
+    try:
+        return request_guard.deadline(http_request.headers.get(TIMEOUT_HEADER), timeout_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def cancelled(e: RequestCancelled) -> HTTPException:
+    # 504 past the deadline, 499 once the client is gone
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+
+async def admit(http_request: Request, deadline: Deadline) -> Optional[AdmissionTicket]:
+    """
+    Take a generation slot, or fail fast with 429 when overloaded.
+    Waiting in the queue stops at the deadline or when the client leaves.
+    """
+    if admission is None:
+        return None
+    try:
+        return await request_guard.queue(http_request, deadline, admission.acquire, release)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except RequestCancelled as e:
+        raise cancelled(e)
+
+
+def release(ticket: Optional[AdmissionTicket]):
+    if ticket is not None:
+        ticket.release()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG To-Do List Generator",
     description="Generate structured to-do lists using RAG and Groq",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -29,17 +136,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize RAG engine
-groq_api_key = os.getenv("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in .env file")
+# Metrics of this service, and the per-request stage breakdown in a Server-Timing header
+app.add_middleware(MetricsMiddleware, service="todo")
+# X-Request-ID on every log record and response
+app.add_middleware(RequestIdMiddleware)
+
+# Admin-only sampling profiler (None unless RAG_ADMIN_TOKEN is set)
+profiler = SamplingProfiler.from_env()
 
-rag_engine = RAGEngine(groq_api_key=groq_api_key)
+# Maximum number of prompts accepted by /generate-todo/batch
+BATCH_MAX_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", "50"))
 
 
 # Request/Response models
 class TodoRequest(BaseModel):
     prompt: str
+    # Time budget in milliseconds (also accepted as the X-Request-Timeout-Ms header)
+    timeout_ms: Optional[int] = None
     
     class Config:
         json_schema_extra = {
@@ -68,6 +181,32 @@ class TodoResponse(BaseModel):
         }
 
 
+class BatchTodoRequest(BaseModel):
+    prompts: List[str]
+    max_concurrency: Optional[int] = None
+    timeout_ms: Optional[int] = None
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "prompts": [
+                    "créer une application mobile de fitness",
+                    "organiser une conférence technique"
+                ]
+            }
+        }
+
+
+class BatchTodoItem(BaseModel):
+    title: Optional[str] = None
+    tasks: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
+class BatchTodoResponse(BaseModel):
+    results: List[BatchTodoItem]
+
+
 # Endpoints
 @app.get("/")
 async def root():
@@ -77,24 +216,41 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "generate": "/generate-todo",
-            "health": "/health"
+            "generate_batch": "/generate-todo/batch",
+            "generate_stream": "/generate-todo/stream",
+            "health": "/health",
+            "ready": "/ready",
+            "cache_stats": "/cache/stats"
         }
     }
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up, whether or not the engine has loaded"""
+    rag_engine = engine_loader.engine
     return {
         "status": "healthy",
-        "rag_engine": "initialized",
-        "llm": "Groq (llama-3.1-70b-versatile)",
-        "vector_db": "ChromaDB"
+        "rag_engine": engine_loader.state,
+        "llm": f"Groq ({rag_engine.llm.model_name})" if rag_engine else None,
+        "vector_db": (
+            ("ChromaDB" if rag_engine.vector_store is not None else "NumPy (in-memory)")
+            if rag_engine else None
+        )
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once the engine is loaded and warmed up, 503 before"""
+    body = engine_loader.readiness()
+    if engine_loader.engine is None:
+        return JSONResponse(status_code=503, content=body)
+    return body
+
+
 @app.post("/generate-todo", response_model=TodoResponse)
-async def generate_todo(request: TodoRequest):
+async def generate_todo(request: TodoRequest, http_request: Request):
     """
     Generate a to-do list based on user prompt.
     
@@ -102,28 +258,248 @@ async def generate_todo(request: TodoRequest):
         request: TodoRequest with user prompt
         
     Returns:
-        TodoResponse with title and tasks
+        TodoResponse with title and tasks. 504 once the request deadline
+        has passed; the generation is cancelled then, and when the client
+        disconnects.
     """
+    if not request.prompt or len(request.prompt.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+    rag_engine = get_rag_engine()
+    deadline = request_deadline(http_request, request.timeout_ms)
+    ticket = await admit(http_request, deadline)
     try:
-        if not request.prompt or len(request.prompt.strip()) == 0:
-            raise HTTPException(status_code=400, detail="Prompt cannot be empty")
-        
         # Generate to-do list using RAG
-        result = rag_engine.generate_todo_list(request.prompt)
-        
-        return TodoResponse(
-            title=result.get("title", "To-Do List"),
-            tasks=result.get("tasks", [])
+        result = await request_guard.run(
+            http_request, deadline, lambda: rag_engine.agenerate_todo_list(request.prompt)
         )
         
+        with stage_timer("serialize"):
+            return JSONResponse(content=TodoResponse(
+                title=result.get("title", "To-Do List"),
+                tasks=result.get("tasks", [])
+            ).model_dump())
+        
+    except HTTPException:
+        raise
+    except RequestCancelled as e:
+        raise cancelled(e)
+    except ResponseParseError as e:
+        logger.error("Unparseable to-do list", extra={"error": str(e)})
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
-        print(f"Error generating to-do list: {e}")
+        logger.exception("Error generating to-do list")
         raise HTTPException(
             status_code=500,
             detail=f"Error generating to-do list: {str(e)}"
         )
+    finally:
+        release(ticket)
+
+
+@app.post("/generate-todo/batch", response_model=BatchTodoResponse)
+async def generate_todo_batch(request: BatchTodoRequest, http_request: Request):
+    """
+    Generate to-do lists for several prompts in one call.
+    
+    Args:
+        request: BatchTodoRequest with the list of prompts
+        
+    Returns:
+        BatchTodoResponse with one item per prompt, in input order.
+        A prompt that fails gets an item with only `error` set.
+    """
+    if not request.prompts:
+        raise HTTPException(status_code=400, detail="Prompts cannot be empty")
+    if len(request.prompts) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch size cannot exceed {BATCH_MAX_SIZE}")
+    if request.max_concurrency is not None and request.max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1")
+    
+    rag_engine = get_rag_engine()
+    deadline = request_deadline(http_request, request.timeout_ms)
+    # A batch holds one slot; its own concurrency is bounded by max_concurrency
+    ticket = await admit(http_request, deadline)
+    try:
+        results = await request_guard.run(
+            http_request, deadline, lambda: rag_engine.agenerate_todo_lists(request.prompts, request.max_concurrency)
+        )
+    except RequestCancelled as e:
+        raise cancelled(e)
+    except Exception as e:
+        logger.exception("Error generating batch of to-do lists")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating batch of to-do lists: {str(e)}"
+        )
+    finally:
+        release(ticket)
+    
+    with stage_timer("serialize"):
+        items = []
+        for result in results:
+            if isinstance(result, Exception):
+                items.append(BatchTodoItem(error=str(result)))
+            else:
+                items.append(BatchTodoItem(
+                    title=result.get("title", "To-Do List"),
+                    tasks=result.get("tasks", [])
+                ))
+        return JSONResponse(content=BatchTodoResponse(results=items).model_dump())
+
+
+@app.post("/generate-todo/stream")
+async def generate_todo_stream(request: TodoRequest, http_request: Request):
+    """
+    Stream a to-do list as Server-Sent Events.
+    
+    Emits a `title` event, one `task` event per task as soon as the LLM has
+    produced it, then a `done` event carrying the same payload as
+    /generate-todo (or an `error` event).
+    """
+    if not request.prompt or len(request.prompt.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+    rag_engine = get_rag_engine()
+    deadline = request_deadline(http_request, request.timeout_ms)
+    ticket = await admit(http_request, deadline)
+    
+    async def event_stream():
+        serialize = Stopwatch("serialize")
+        try:
+            events = rag_engine.astream_todo_list(request.prompt)
+            async for event, data in request_guard.stream(http_request, deadline, events):
+                with serialize:
+                    if event == "done":
+                        data = TodoResponse(
+                            title=data.get("title", "To-Do List"),
+                            tasks=data.get("tasks", [])
+                        ).model_dump()
+                    message = format_sse(event, data)
+                yield message
+        except Exception as e:
+            logger.error("Error streaming to-do list", extra={"error": str(e)})
+            yield format_sse("error", {"detail": f"Error generating to-do list: {str(e)}"})
+        finally:
+            serialize.observe()
+            release(ticket)
+    
+    # The background task also frees the slot if the stream never started
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+        background=BackgroundTask(release, ticket)
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-stage latency, LLM tokens, parse outcomes, KB size"""
+    return PlainTextResponse(render_metrics("todo"), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def require_admin(http_request: Request):
+    if profiler is None:
+        raise HTTPException(status_code=404, detail="Profiler disabled (set RAG_ADMIN_TOKEN)")
+    if not profiler.authorized(http_request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def admin_profile(http_request: Request, seconds: float = 10.0, interval_ms: float = 10.0):
+    """
+    Sample this worker for `seconds` while it serves live traffic.
+    
+    Requires the X-Admin-Token header.
+    
+    Returns:
+        Collapsed stacks, for flamegraph.pl, speedscope or inferno
+    """
+    require_admin(http_request)
+    try:
+        result = await profiler.profile(seconds, interval_ms / 1000.0)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(result["collapsed"], headers={
+        "Content-Disposition": f'attachment; filename="todo-{os.getpid()}.collapsed"',
+        "X-Profile-Samples": str(result["samples"]),
+        "X-Profile-Overhead": f"{result['overhead']:.4f}"
+    })
+
+
+@app.get("/admin/profile/stats")
+async def admin_profile_stats(http_request: Request):
+    """Profiles taken by this worker and their sampling cost (X-Admin-Token required)"""
+    require_admin(http_request)
+    return profiler.stats()
+
+
+@app.get("/embeddings/stats")
+async def embedding_stats():
+    """Query embedding micro-batcher statistics"""
+    rag_engine = get_rag_engine()
+    return rag_engine.embedding_batcher.stats()
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Response cache hit/miss counters"""
+    rag_engine = get_rag_engine()
+    return {
+        "exact": rag_engine.response_cache.stats() if rag_engine.response_cache else {"enabled": False},
+        "semantic": rag_engine.semantic_cache.stats() if rag_engine.semantic_cache else {"enabled": False},
+        "inflight": rag_engine.inflight.stats()
+    }
+
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """In-flight requests, queue depth, wait times and rejections"""
+    if admission is None:
+        return {"enabled": False}
+    return admission.stats()
+
+
+@app.get("/ratelimit/stats")
+async def ratelimit_stats():
+    """Client-side Groq RPM/TPM budgets, queued calls and provider 429s"""
+    return rate_limiter_stats()
+
+
+@app.get("/cancellation/stats")
+async def cancellation_stats():
+    """Requests cancelled by their deadline or a client disconnect, and the tokens and seconds saved"""
+    return request_guard.stats()
+
+
+@app.get("/router/stats")
+async def router_stats():
+    """Requests per model tier, hedges, race wins and per-tier latency"""
+    rag_engine = get_rag_engine()
+    return rag_engine.router.stats()
+
+
+@app.get("/context/stats")
+async def context_stats():
+    """Retrieved context size, relevance filtering and prompt tokens sent"""
+    rag_engine = get_rag_engine()
+    return rag_engine.context_builder.stats()
+
+
+@app.get("/parser/stats")
+async def parser_stats():
+    """LLM response parsing outcomes (repairs, re-asks, failures)"""
+    rag_engine = get_rag_engine()
+    return rag_engine.parser.stats()
 
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    workers = int(os.getenv("RAG_WORKERS", "1"))
+    if workers > 1:
+        # Load the model once, then fork workers sharing it copy-on-write
+        from rag_common.prefork import serve_prefork
+        serve_prefork(app, engine_loader, host="0.0.0.0", port=8000, workers=workers)
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -2,14 +2,42 @@
 RAG Engine for generating to-do lists using LangChain, ChromaDB, and Groq.
 """
 
+import asyncio
 import os
-from typing import List, Dict
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple, Union
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
-from langchain_core.documents import Document
-from knowledge_base import get_knowledge_base_text
+try:
+    from .knowledge_base import get_knowledge_base_documents
+except ImportError:
+    from knowledge_base import get_knowledge_base_documents
+from rag_common.compact_format import CompactTaskParser, compact_instructions, get_output_format
+from rag_common.context_builder import ContextBuilder
+from rag_common.embedding_batcher import EmbeddingBatcher
+from rag_common.executor import run_blocking
+from rag_common.kb_artifact import ARTIFACT_DIRNAME, load_kb_artifact, load_kb_vectors
+from rag_common.kb_index import sync_chroma_index
+from rag_common.log import get_logger
+from rag_common.metrics import stage_timer
+from rag_common.model_router import TIERS, ModelRouter
+from rag_common.rate_limiter import BATCH, INTERACTIVE, get_rate_limiter, groq_client_kwargs
+from rag_common.retrievers import ChromaRetriever, NumpyRetriever, Retriever, get_retriever_backend
+from rag_common.response_cache import ResponseCache, normalize_prompt
+from rag_common.response_parser import ResponseParser, TodoSchema
+from rag_common.semantic_cache import SemanticCache
+from rag_common.shared import create_embeddings, get_shared_resources
+from rag_common.singleflight import SingleFlight
+from rag_common.startup import timed
+from rag_common.streaming import IncrementalTaskParser
+
+# Precomputed KB embeddings (python -m rag_common.kb_artifact)
+KB_ARTIFACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ARTIFACT_DIRNAME)
+
+# Languages returned by _detect_language; one prebuilt chain each
+LANGUAGES = ("fr", "en")
+
+logger = get_logger("todo.engine")
 
 
 class RAGEngine:
@@ -21,60 +49,133 @@ class RAGEngine:
             groq_api_key: API key for Groq
         """
         self.groq_api_key = groq_api_key
+        # Seconds spent initializing each component (reported by /ready)
+        self.init_timings = {}
+        # Set when both services run in one process (unified_host.py)
+        self.shared = get_shared_resources()
         
         # Initialize embeddings (local, free)
-        print("Initializing embeddings model...")
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2",
-            model_kwargs={'device': 'cpu'}
-        )
+        logger.info("Initializing embeddings model")
+        with timed(self.init_timings, "embeddings"):
+            if self.shared is not None:
+                self.embeddings = self.shared.embeddings()
+                self.embedding_batcher = self.shared.embedding_batcher()
+            else:
+                self.embeddings = create_embeddings()
+                # Concurrent query embeddings share one batched forward pass
+                self.embedding_batcher = EmbeddingBatcher.from_env(self.embeddings)
         
         # Initialize Groq LLM
-        print("Initializing Groq LLM...")
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
-            model_name="llama-3.3-70b-versatile",  # Updated to supported model
-            temperature=0.7,
-            max_tokens=2000
-        )
+        logger.info("Initializing Groq LLM")
+        with timed(self.init_timings, "llm"):
+            # Fast and slow model tiers, each behind its model's rate limiter
+            self.router = ModelRouter.from_env("todo", groq_api_key, temperature=0.7, max_tokens=2000)
+            self.llm = self.router.tiers["slow"].llm
+            # Small model for the single re-ask when an answer cannot be parsed
+            repair_model = os.getenv("RAG_REPAIR_MODEL", "llama-3.1-8b-instant")
+            self.repair_llm = ChatGroq(
+                groq_api_key=groq_api_key,
+                model_name=repair_model,
+                temperature=0,
+                max_tokens=2000,
+                **groq_client_kwargs(get_rate_limiter(repair_model))
+            )
+        self.parser = ResponseParser("todo")
         
-        # Initialize ChromaDB vector store
-        print("Initializing ChromaDB...")
-        self.vector_store = self._initialize_vector_store()
+        # Initialize the knowledge base retriever
+        self.vector_store = None
+        self.index_stats = {}
+        with timed(self.init_timings, "retriever"):
+            self.retriever = self._initialize_retriever()
+        
+        # Exact-match response cache (memory LRU + SQLite)
+        self.response_cache = ResponseCache.from_env("todo", "./response_cache.db")
+        if self.response_cache is not None and any(self.index_stats.get(key) for key in ("added", "updated", "removed")):
+            # Answers cached on disk were generated from the previous knowledge base
+            self.response_cache.clear()
+        # Paraphrase cache reusing the query embedding
+        self.semantic_cache = SemanticCache.from_env()
+        # Coalesces concurrent identical requests onto one generation
+        self.inflight = SingleFlight()
+        # Maximum concurrent LLM calls for one batch request
+        self.batch_concurrency = int(os.getenv("RAG_BATCH_CONCURRENCY", "8"))
+        # "json" or "compact" (one task per line, fewer output tokens)
+        self.output_format = get_output_format()
+        # Relevance filtering, task dedupe and token budget of the retrieved context
+        self.context_builder = ContextBuilder.from_env("todo", max_docs=4, max_tokens=500)
+        # Prompt | LLM chains built once; requests only look them up
+        self.chains = self._build_chains()
         
-        print("RAG Engine initialized successfully!")
+        logger.info("RAG Engine initialized", extra={"timings": self.init_timings})
+    
+    def warmup(self) -> Dict[str, float]:
+        """
+        Run one embedding and one retrieval so the first real request does
+        not pay for lazy model and index initialization.
+        
+        Returns:
+            Timings of the warmup steps in seconds
+        """
+        timings = {}
+        with timed(timings, "warmup_embedding"):
+            query_embedding = self._embed_query("créer une application web")
+        with timed(timings, "warmup_retrieval"):
+            self._retrieve_context(query_embedding)
+        return timings
+    
+    def _initialize_retriever(self) -> Retriever:
+        """
+        Initialize the retriever selected by RAG_RETRIEVER_BACKEND.
+        "numpy" keeps the small knowledge base in memory, "chroma" uses ChromaDB.
+        """
+        if get_retriever_backend() == "numpy":
+            logger.info("Initializing in-memory NumPy retriever")
+            kb_documents = get_knowledge_base_documents()
+            return NumpyRetriever(
+                self.embeddings,
+                [text for _, text in kb_documents],
+                [{"source": doc_id} for doc_id, _ in kb_documents],
+                vectors=load_kb_vectors(KB_ARTIFACT_DIR, kb_documents, self.embeddings)
+            )
+        
+        logger.info("Initializing ChromaDB")
+        self.vector_store = self._initialize_vector_store()
+        return ChromaRetriever(self.vector_store)
     
     def _initialize_vector_store(self) -> Chroma:
         """
         Initialize ChromaDB with knowledge base.
+        Only templates that are new or changed since the last start are embedded.
         """
-        # Get knowledge base texts
-        kb_texts = get_knowledge_base_text()
-        
-        # Create documents
-        documents = [
-            Document(page_content=text, metadata={"source": f"template_{i}"})
-            for i, text in enumerate(kb_texts)
-        ]
-        
         # Create or load vector store
-        persist_directory = "./chroma_db"
-        
-        # Check if database already exists
-        if os.path.exists(persist_directory):
-            print("Loading existing ChromaDB...")
+        if self.shared is not None:
+            # Own collection on the process-wide ChromaDB client
+            persist_directory = self.shared.persist_directory
+            collection_name = "todo_templates"
             vector_store = Chroma(
-                persist_directory=persist_directory,
+                client=self.shared.chroma_client(),
+                collection_name=collection_name,
                 embedding_function=self.embeddings
             )
         else:
-            print("Creating new ChromaDB with knowledge base...")
-            vector_store = Chroma.from_documents(
-                documents=documents,
-                embedding=self.embeddings,
-                persist_directory=persist_directory
+            persist_directory = "./chroma_db"
+            collection_name = None
+            vector_store = Chroma(
+                persist_directory=persist_directory,
+                embedding_function=self.embeddings
             )
         
+        # Diff the knowledge base against the index manifest
+        self.index_stats = sync_chroma_index(
+            vector_store,
+            persist_directory,
+            get_knowledge_base_documents(),
+            self.embeddings.model_name,
+            collection_name,
+            artifact=load_kb_artifact(KB_ARTIFACT_DIR, self.embeddings.model_name)
+        )
+        logger.info("Knowledge base index synced", extra={"index": self.index_stats})
+        
         return vector_store
     
     def _detect_language(self, text: str) -> str:
@@ -91,34 +192,65 @@ class RAGEngine:
             'application', 'projet', 'système', 'événement'
         ]
         
-        text_lower = text.lower()
-        french_count = sum(1 for word in french_indicators if word in text_lower)
+        with stage_timer("language_detect"):
+            text_lower = text.lower()
+            french_count = sum(1 for word in french_indicators if word in text_lower)
         
         # If we find French indicators, it's likely French
         return 'fr' if french_count >= 2 else 'en'
     
-    def generate_todo_list(self, user_prompt: str) -> Dict[str, any]:
+    def _embed_query(self, user_prompt: str) -> List[float]:
         """
-        Generate a to-do list based on user prompt using RAG.
-        Automatically detects language and responds in the same language.
-        
-        Args:
-            user_prompt: User's request/prompt
-            
-        Returns:
-            Dictionary with title and tasks
+        Embed the user prompt once. The vector is shared by the semantic
+        cache lookup and the vector store search. This is blocking; the
+        forward pass is batched with other concurrent queries.
         """
-        # Detect language
-        language = self._detect_language(user_prompt)
-        print(f"Detected language: {language}")
-        
-        # Retrieve relevant context from vector store
-        print(f"Searching for relevant context for: {user_prompt}")
-        relevant_docs = self.vector_store.similarity_search(user_prompt, k=2)
-        
-        # Combine context
-        context = "\n\n".join([doc.page_content for doc in relevant_docs])
+        with stage_timer("embed"):
+            return self.embedding_batcher.embed(user_prompt)
+    
+    def _retrieve_context(self, query_embedding: List[float]) -> str:
+        """
+        Retrieve the knowledge base context closest to the query embedding.
+        This is blocking (vector search).
+        """
+        with stage_timer("retrieve"):
+            relevant_docs = self.retriever.search_by_vector(query_embedding, k=self.context_builder.max_docs)
         
+        # Keep the relevant, non-redundant part within the token budget
+        with stage_timer("prompt_build"):
+            return self.context_builder.build(relevant_docs)
+    
+    def _retrieve_contexts(self, query_embeddings: List[List[float]]) -> List[str]:
+        """
+        Batched version of _retrieve_context: one retriever query for all vectors.
+        """
+        with stage_timer("retrieve"):
+            results = self.retriever.search_by_vectors(query_embeddings, k=self.context_builder.max_docs)
+        with stage_timer("prompt_build"):
+            return [self.context_builder.build(relevant_docs) for relevant_docs in results]
+    
+    def _build_chains(self) -> Dict[Tuple[str, str], Any]:
+        return {
+            (language, tier): self._build_chain(language, tier)
+            for language in LANGUAGES
+            for tier in TIERS
+        }
+    
+    def _chain(self, language: str, tier: str = "slow"):
+        """
+        Prebuilt prompt | LLM chain for the given language and model tier.
+        """
+        return self.chains[(language, tier)]
+    
+    def _tier_chains(self, language: str) -> Dict[str, Any]:
+        return {tier: self.chains[(language, tier)] for tier in TIERS}
+    
+    def _build_chain(self, language: str, tier: str = "slow"):
+        """
+        Build the prompt | LLM chain for the given language and tier. The
+        system message is static, so every request of a language sends the
+        same prefix and the provider can reuse its prompt cache.
+        """
         # Create prompt template based on language
         if language == 'fr':
             system_message = """Tu es un assistant expert en gestion de projet et organisation de tâches.
@@ -127,7 +259,8 @@ Ta mission est de créer des to-do lists détaillées et actionnables basées su
 Utilise le contexte fourni comme inspiration, mais adapte-le à la demande spécifique de l'utilisateur.
 Crée une liste de tâches logique, ordonnée et complète EN FRANÇAIS.
 
-Réponds UNIQUEMENT au format JSON suivant (sans markdown, sans backticks):
+"""
+            answer_format = """Réponds UNIQUEMENT au format JSON suivant (sans markdown, sans backticks):
 {{
     "title": "Titre descriptif du projet en français",
     "tasks": [
@@ -145,7 +278,8 @@ Your mission is to create detailed and actionable to-do lists based on user requ
 Use the provided context as inspiration, but adapt it to the user's specific request.
 Create a logical, ordered, and complete task list IN ENGLISH.
 
-Respond ONLY in the following JSON format (no markdown, no backticks):
+"""
+            answer_format = """Respond ONLY in the following JSON format (no markdown, no backticks):
 {{
     "title": "Descriptive project title in English",
     "tasks": [
@@ -157,6 +291,10 @@ Respond ONLY in the following JSON format (no markdown, no backticks):
 
 IMPORTANT: Respond only with JSON, nothing else. All tasks must be in English."""
         
+        if self.output_format == "compact":
+            answer_format = compact_instructions(None, language)
+        system_message += answer_format
+        
         prompt_template = ChatPromptTemplate.from_messages([
             ("system", system_message),
             ("user", """Reference context:
@@ -167,42 +305,321 @@ User request: {user_prompt}
 Generate a complete and structured to-do list.""")
         ])
         
-        # Create chain
-        chain = prompt_template | self.llm
+        return prompt_template | self.router.tiers[tier].llm
+    
+    def _parse_kwargs(self) -> Dict[str, Any]:
+        return {
+            "schema": TodoSchema,
+            "default_title": "To-Do List",
+            "compact": self.output_format == "compact"
+        }
+    
+    def _parse_response(self, raw_content: str) -> Dict[str, Any]:
+        """
+        Parse the LLM response into a dictionary with title and tasks,
+        repairing it or re-asking once if needed.
+        
+        Raises:
+            ResponseParseError: If no valid to-do list could be obtained
+        """
+        with stage_timer("parse"):
+            return self.parser.parse_or_reask(raw_content, repair_llm=self.repair_llm, **self._parse_kwargs())
+    
+    async def _aparse_response(self, raw_content: str) -> Dict[str, Any]:
+        """
+        Async version of _parse_response.
+        """
+        with stage_timer("parse"):
+            return await self.parser.aparse_or_reask(raw_content, repair_llm=self.repair_llm, **self._parse_kwargs())
+    
+    def _cache_key(self, user_prompt: str, language: str) -> Optional[str]:
+        """
+        Build the response cache key, or None if caching is disabled.
+        """
+        if self.response_cache is None:
+            return None
+        return self.response_cache.make_key(
+            user_prompt,
+            language=language,
+            mode="todo",
+            output_format=self.output_format,
+            model=self.router.tiers[self.router.route(user_prompt, language, "todo")].model_name,
+            temperature=self.llm.temperature,
+            max_tokens=self.llm.max_tokens
+        )
+    
+    def _semantic_scope(self, language: str, tier: str) -> str:
+        # Same model as the exact cache key: a fast-tier answer never serves a slow-tier request
+        return f"{language}:todo:{self.router.tiers[tier].model_name}"
+    
+    def _remember_result(
+        self,
+        cache_key: Optional[str],
+        query_embedding: List[float],
+        language: str,
+        tier: str,
+        result: Dict[str, Any]
+    ):
+        """
+        Store a successfully parsed result in the exact and semantic caches.
+        """
+        if cache_key is not None:
+            self.response_cache.set(cache_key, result)
+        if self.semantic_cache is not None:
+            self.semantic_cache.store(query_embedding, self._semantic_scope(language, tier), result)
+    
+    def generate_todo_list(self, user_prompt: str) -> Dict[str, Any]:
+        """
+        Generate a to-do list based on user prompt using RAG.
+        Automatically detects language and responds in the same language.
+        
+        Args:
+            user_prompt: User's request/prompt
+            
+        Returns:
+            Dictionary with title and tasks
+        """
+        # Detect language
+        language = self._detect_language(user_prompt)
+        logger.debug("Detected language", extra={"language": language})
+        
+        # Check the response cache
+        cache_key = self._cache_key(user_prompt, language)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Returning cached to-do list", extra={"cache": "exact"})
+                return cached
+        
+        # Embed once, then try the semantic cache before retrieval
+        logger.debug("Searching for relevant context", extra={"prompt_chars": len(user_prompt)})
+        query_embedding = self._embed_query(user_prompt)
+        # Pick the model tier
+        tier = self.router.route(user_prompt, language, "todo")
+        if self.semantic_cache is not None:
+            cached = self.semantic_cache.lookup(query_embedding, self._semantic_scope(language, tier))
+            if cached is not None:
+                logger.info("Returning cached to-do list", extra={"cache": "semantic"})
+                return cached
+        
+        # Retrieve relevant context from vector store
+        context = self._retrieve_context(query_embedding)
         
         # Generate response
-        print("Generating to-do list with Groq...")
-        response = chain.invoke({
+        logger.info("Generating to-do list", extra={"model": self.router.tiers[tier].model_name, "tier": tier})
+        response = self.router.invoke(self._tier_chains(language), {
             "context": context,
             "user_prompt": user_prompt
-        })
-        
-        # Parse response
-        import json
-        try:
-            # Clean response if it contains markdown code blocks
-            content = response.content.strip()
-            if content.startswith("```"):
-                # Remove markdown code blocks
-                content = content.split("```")[1]
-                if content.startswith("json"):
-                    content = content[4:]
-                content = content.strip()
+        }, tier, context + user_prompt)
+        self.context_builder.record_usage(response)
+        
+        result = self._parse_response(response.content)
+        self._remember_result(cache_key, query_embedding, language, tier, result)
+        return result
+    
+    async def agenerate_todo_list(self, user_prompt: str) -> Dict[str, Any]:
+        """
+        Async version of generate_todo_list.
+        Retrieval runs in the bounded executor and the LLM call uses the
+        chain's async invocation, so the event loop is never blocked.
+        
+        Args:
+            user_prompt: User's request/prompt
             
-            result = json.loads(content)
-            return result
-        except json.JSONDecodeError as e:
-            print(f"Error parsing JSON: {e}")
-            print(f"Raw response: {response.content}")
-            # Fallback response
-            return {
-                "title": "To-Do List",
-                "tasks": [
-                    "Analyser la demande en détail",
-                    "Planifier les étapes principales",
-                    "Commencer l'implémentation"
-                ]
-            }
+        Returns:
+            Dictionary with title and tasks
+        """
+        language = self._detect_language(user_prompt)
+        logger.debug("Detected language", extra={"language": language})
+        
+        # Identical prompts already being generated share that generation
+        flight_key = f"{language}:todo:{normalize_prompt(user_prompt)}"
+        return await self.inflight.do(
+            flight_key, lambda: self._agenerate_todo_list(user_prompt, language)
+        )
+    
+    async def _alookup_cached(
+        self,
+        user_prompt: str,
+        language: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], Optional[List[float]]]:
+        """
+        Check the exact cache, then embed the prompt and check the semantic cache.
+        
+        Returns:
+            (cached result or None, exact cache key, query embedding)
+        """
+        cache_key = self._cache_key(user_prompt, language)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Returning cached to-do list", extra={"cache": "exact"})
+                return cached, cache_key, None
+        
+        logger.debug("Searching for relevant context", extra={"prompt_chars": len(user_prompt)})
+        with stage_timer("embed"):
+            query_embedding = await self.embedding_batcher.aembed(user_prompt)
+        if self.semantic_cache is not None:
+            tier = self.router.route(user_prompt, language, "todo")
+            cached = self.semantic_cache.lookup(query_embedding, self._semantic_scope(language, tier))
+            if cached is not None:
+                logger.info("Returning cached to-do list", extra={"cache": "semantic"})
+                return cached, cache_key, query_embedding
+        
+        return None, cache_key, query_embedding
+    
+    async def _agenerate_todo_list(self, user_prompt: str, language: str) -> Dict[str, Any]:
+        cached, cache_key, query_embedding = await self._alookup_cached(user_prompt, language)
+        if cached is not None:
+            return cached
+        
+        context = await run_blocking(self._retrieve_context, query_embedding)
+        
+        return await self._acomplete(user_prompt, language, context, cache_key, query_embedding)
+    
+    async def _acomplete(
+        self,
+        user_prompt: str,
+        language: str,
+        context: str,
+        cache_key: Optional[str],
+        query_embedding: List[float],
+        priority: int = INTERACTIVE
+    ) -> Dict[str, Any]:
+        """
+        Run the LLM on an already retrieved context, parse and cache the result.
+        """
+        tier = self.router.route(user_prompt, language, "todo")
+        
+        logger.info("Generating to-do list", extra={"model": self.router.tiers[tier].model_name, "tier": tier})
+        response = await self.router.ainvoke(self._tier_chains(language), {
+            "context": context,
+            "user_prompt": user_prompt
+        }, tier, context + user_prompt, priority)
+        self.context_builder.record_usage(response)
+        
+        result = await self._aparse_response(response.content)
+        await run_blocking(self._remember_result, cache_key, query_embedding, language, tier, result)
+        return result
+    
+    async def agenerate_todo_lists(
+        self,
+        user_prompts: List[str],
+        max_concurrency: Optional[int] = None
+    ) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Generate to-do lists for many prompts at once.
+        All prompts are embedded in one pass and retrieved in one query, then
+        the Groq calls are fanned out with a concurrency cap.
+        
+        Args:
+            user_prompts: List of user prompts
+            max_concurrency: Maximum concurrent LLM calls (default: RAG_BATCH_CONCURRENCY)
+            
+        Returns:
+            One entry per prompt, in input order: the result dictionary, or the
+            exception raised for that prompt
+        """
+        results: List[Union[Dict[str, Any], Exception, None]] = [None] * len(user_prompts)
+        languages = [self._detect_language(prompt) for prompt in user_prompts]
+        cache_keys = [None] * len(user_prompts)
+        
+        # Exact cache first
+        pending = []
+        for i, prompt in enumerate(user_prompts):
+            if not prompt or not prompt.strip():
+                results[i] = ValueError("Prompt cannot be empty")
+                continue
+            cache_keys[i] = self._cache_key(prompt, languages[i])
+            cached = self.response_cache.get(cache_keys[i]) if cache_keys[i] is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending.append(i)
+        
+        if not pending:
+            return results
+        
+        # One embedding pass for the whole batch, then the semantic cache
+        logger.info("Embedding prompts for batch generation", extra={"prompts": len(pending)})
+        with stage_timer("embed"):
+            embeddings = await run_blocking(self.embeddings.embed_documents, [user_prompts[i] for i in pending])
+        to_generate = []
+        for i, query_embedding in zip(pending, embeddings):
+            cached = None
+            if self.semantic_cache is not None:
+                tier = self.router.route(user_prompts[i], languages[i], "todo")
+                cached = self.semantic_cache.lookup(query_embedding, self._semantic_scope(languages[i], tier))
+            if cached is not None:
+                results[i] = cached
+            else:
+                to_generate.append((i, query_embedding))
+        
+        # One retrieval query for the remaining prompts
+        contexts = await run_blocking(self._retrieve_contexts, [embedding for _, embedding in to_generate])
+        
+        semaphore = asyncio.Semaphore(max_concurrency or self.batch_concurrency)
+        
+        async def generate(i: int, query_embedding: List[float], context: str):
+            async with semaphore:
+                try:
+                    # Duplicates inside the batch (or already in flight) share one call
+                    flight_key = f"{languages[i]}:todo:{normalize_prompt(user_prompts[i])}"
+                    results[i] = await self.inflight.do(flight_key, lambda: self._acomplete(
+                        user_prompts[i], languages[i], context, cache_keys[i], query_embedding, BATCH
+                    ))
+                except Exception as e:
+                    logger.warning("Error generating batch item", extra={"item": i, "error": str(e)})
+                    results[i] = e
+        
+        await asyncio.gather(*(
+            generate(i, query_embedding, context)
+            for (i, query_embedding), context in zip(to_generate, contexts)
+        ))
+        return results
+    
+    async def astream_todo_list(self, user_prompt: str) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a to-do list while Groq generates it.
+        
+        Args:
+            user_prompt: User's request/prompt
+            
+        Yields:
+            ("title", str) and ("task", str) as soon as each one is complete in
+            the LLM output, then ("done", result) with the parsed result
+        """
+        language = self._detect_language(user_prompt)
+        logger.debug("Detected language", extra={"language": language})
+        
+        cached, cache_key, query_embedding = await self._alookup_cached(user_prompt, language)
+        if cached is not None:
+            yield "title", cached.get("title", "To-Do List")
+            for task in cached.get("tasks", []):
+                yield "task", task
+            yield "done", cached
+            return
+        
+        context = await run_blocking(self._retrieve_context, query_embedding)
+        tier = self.router.route(user_prompt, language, "todo")
+        
+        logger.info("Streaming to-do list", extra={"model": self.router.tiers[tier].model_name, "tier": tier})
+        parser = CompactTaskParser() if self.output_format == "compact" else IncrementalTaskParser()
+        chunk = None
+        async for chunk in self.router.astream(self._tier_chains(language), {
+            "context": context,
+            "user_prompt": user_prompt
+        }, tier, context + user_prompt):
+            for event in parser.feed(chunk.content):
+                yield event
+        # Groq reports usage on the last chunk
+        self.context_builder.record_usage(chunk)
+        for event in parser.finish():
+            yield event
+        
+        result = await self._aparse_response(parser.buffer)
+        await run_blocking(self._remember_result, cache_key, query_embedding, language, tier, result)
+        yield "done", result
     
     def add_to_knowledge_base(self, text: str, metadata: Dict = None):
         """
@@ -212,6 +629,11 @@ Generate a complete and structured to-do list.""")
             text: Text content to add
             metadata: Optional metadata
         """
-        doc = Document(page_content=text, metadata=metadata or {})
-        self.vector_store.add_documents([doc])
-        print("Added new content to knowledge base")
+        self.retriever.add_texts([text], [metadata or {}])
+        
+        # Cached answers were generated from the previous knowledge base
+        if self.response_cache is not None:
+            self.response_cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+        logger.info("Added new content to knowledge base")
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the packages the way the services do, from RAG_export/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
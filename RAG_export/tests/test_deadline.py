@@ -0,0 +1,34 @@
+import asyncio
+
+import pytest
+
+from rag_common.admission import AdmissionController
+from rag_common.deadline import ClientDisconnected, RequestGuard
+
+
+class DisconnectOnGrant:
+    """
+    Client that disconnects while the supervisor checks on it, right as
+    the slot it was waiting for is handed over.
+    """
+
+    def __init__(self, holder):
+        self.holder = holder
+
+    async def is_disconnected(self):
+        self.holder.release()
+        await asyncio.sleep(0)
+        return True
+
+
+def test_slot_granted_during_disconnect_is_released():
+    async def main():
+        admission = AdmissionController("test", max_in_flight=1, max_queue=4, queue_timeout=5)
+        guard = RequestGuard("test", poll_interval=0.01)
+        holder = await admission.acquire()
+        request = DisconnectOnGrant(holder)
+        with pytest.raises(ClientDisconnected):
+            await guard.queue(request, guard.deadline(None, None), admission.acquire, lambda ticket: ticket.release())
+        assert admission.stats()["in_flight"] == 0
+
+    asyncio.run(main())
@@ -0,0 +1,46 @@
+import asyncio
+
+from rag_common.metrics import MetricsMiddleware, observe_stage, register_collector, render_metrics
+
+
+async def _request(app):
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent
+
+
+def _app(stage):
+    async def app(scope, receive, send):
+        observe_stage(stage, 0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+    return app
+
+
+def test_services_in_one_process_keep_their_own_metrics():
+    register_collector("svc_a", lambda: [("rag_test_documents", "gauge", "Documents", [({}, 1)])])
+    register_collector("svc_b", lambda: [("rag_test_documents", "gauge", "Documents", [({}, 2)])])
+
+    async def main():
+        await _request(MetricsMiddleware(_app("parse"), service="svc_a"))
+        await _request(MetricsMiddleware(_app("serialize"), service="svc_b"))
+
+    asyncio.run(main())
+    # Outside a request, e.g. warmup: not counted
+    observe_stage("parse", 0.01)
+    a, b = render_metrics("svc_a"), render_metrics("svc_b")
+    assert a.count("# TYPE rag_test_documents") == 1
+    assert b.count("# TYPE rag_test_documents") == 1
+    assert 'rag_stage_seconds_count{service="svc_a",' in a
+    assert a.split('stage="parse"} ')[-1].startswith("1\n")
+    assert a.split('stage="serialize"} ')[-1].startswith("0\n")
+    assert b.split('stage="parse"} ')[-1].startswith("0\n")
+    assert b.split('stage="serialize"} ')[-1].startswith("1\n")
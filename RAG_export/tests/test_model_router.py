@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from rag_common.model_router import ModelRouter, ModelTier
+
+
+class FakeLLM:
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.max_tokens = 100
+
+
+class FakeChain:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+
+    async def astream(self, inputs):
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        yield Message("answer")
+
+    async def ainvoke(self, inputs):
+        await asyncio.sleep(self.delay)
+        return Message("answer")
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+    def __add__(self, other):
+        return Message(self.content + other.content)
+
+
+def make_router(**kwargs):
+    tiers = {name: ModelTier(name, FakeLLM(f"{name}-model"), None) for name in ("fast", "slow")}
+    return ModelRouter("test", tiers, fast_languages=["en"], **kwargs)
+
+
+def test_only_listed_modes_go_to_the_fast_tier_by_default():
+    router = make_router(fast_modes=["strict"])
+    assert router.route("short", "en", "todo") == "slow"
+    assert router.route("short", "en", "strict") == "fast"
+    assert make_router(fast_max_chars=80).route("short", "en", "todo") == "fast"
+
+
+def test_cancelled_attempts_are_not_a_success():
+    router = make_router(hedge_after=0.01)
+    chains = {"fast": FakeChain(0.05, asyncio.CancelledError()), "slow": FakeChain(0.05, asyncio.CancelledError())}
+    with pytest.raises(RuntimeError):
+        asyncio.run(router.ainvoke(chains, {}, "slow", "prompt"))
+
+
+def test_failed_race_raises_the_attempt_error():
+    router = make_router(hedge_after=0.01)
+    chains = {"fast": FakeChain(0.05, ValueError("fast down")), "slow": FakeChain(0.05, ValueError("slow down"))}
+    with pytest.raises(ValueError):
+        asyncio.run(router.ainvoke(chains, {}, "slow", "prompt"))
+
+
+def test_blocking_calls_record_the_first_token():
+    router = make_router()
+    message = asyncio.run(router.ainvoke({"slow": FakeChain(0.01)}, {}, "slow", "prompt"))
+    assert message.content == "answer"
+    first_token = router.tiers["slow"].stats()["first_token_seconds"]
+    assert first_token["count"] == 1
+    assert first_token["sum"] >= 0.01
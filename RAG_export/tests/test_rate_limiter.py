@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+from rag_common.rate_limiter import BATCH, GroqRateLimiter, TokenBucket
+
+
+def test_header_limit_keeps_the_worker_share():
+    # 12000 TPM configured, split between 4 workers
+    bucket = TokenBucket(3000, share=0.25)
+    bucket.sync(remaining=11000, limit=12000)
+    assert bucket.capacity == 3000
+    assert bucket.level == 2750
+
+
+def test_lower_header_limit_is_adopted_for_the_share():
+    bucket = TokenBucket(3000, share=0.25)
+    bucket.sync(remaining=None, limit=6000)
+    assert bucket.capacity == 1500
+    assert bucket.level == 1500
+
+
+def test_headers_never_raise_the_configured_limit():
+    bucket = TokenBucket(12000)
+    bucket.sync(remaining=None, limit=30000)
+    assert bucket.capacity == 12000
+
+
+def test_unset_limit_follows_the_provider():
+    bucket = TokenBucket(None, share=0.5)
+    assert bucket.wait_time(50000) == 0
+    bucket.sync(remaining=20000, limit=60000)
+    assert bucket.capacity == 30000
+    assert bucket.level == 10000
+    bucket.sync(remaining=None, limit=120000)
+    assert bucket.capacity == 60000
+
+
+def test_limiter_is_off_without_configured_limits(monkeypatch):
+    monkeypatch.delenv("RAG_GROQ_RPM", raising=False)
+    monkeypatch.delenv("RAG_GROQ_TPM", raising=False)
+    assert GroqRateLimiter.from_env("model") is None
+    monkeypatch.setenv("RAG_GROQ_TPM", "12000")
+    limiter = GroqRateLimiter.from_env("model")
+    assert limiter.tokens.capacity == 12000
+    assert not limiter.requests.limited
+
+
+class _Usage:
+    usage_metadata = {"total_tokens": 100}
+
+
+def test_waiters_are_woken_when_tokens_come_back():
+    async def main():
+        # 600 tokens per minute: 10 per second
+        limiter = GroqRateLimiter("model", requests_per_minute=None, tokens_per_minute=600)
+        await limiter.aacquire(600)
+        polls = []
+        poll = limiter._poll
+        limiter._poll = lambda entry, cost: polls.append(entry) or poll(entry, cost)
+        first = asyncio.create_task(limiter.aacquire(200))
+        second = asyncio.create_task(limiter.aacquire(200, priority=BATCH))
+        await asyncio.sleep(0.05)
+        assert not first.done() and not second.done()
+        # One check each, then they sleep until woken
+        assert len(polls) == 2
+        start = time.monotonic()
+        # The first call used 100 of its 600: both waiters fit at once
+        limiter.settle(600, _Usage())
+        await asyncio.wait_for(asyncio.gather(first, second), 1)
+        return time.monotonic() - start
+
+    assert asyncio.run(main()) < 0.5
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from rag_common.response_parser import (
+    ResponseParseError, ResponseParser, TodoSchema, extract_json_object, repair_json
+)
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+
+class RepairLLM:
+    model_name = "repair"
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = []
+
+    def invoke(self, messages):
+        self.calls.append(messages)
+        return Reply(self.content)
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def parse(raw):
+    return ResponseParser("test").try_parse(raw, TodoSchema, "Default")
+
+
+def test_fenced_json_is_extracted():
+    result, stage = parse('Here you go:\n```json\n{"title": "Shopping", "tasks": ["Milk", "Eggs"]}\n```\nEnjoy!')
+    assert stage == "extracted"
+    assert result == {"title": "Shopping", "tasks": ["Milk", "Eggs"]}
+
+
+def test_braces_inside_strings_do_not_end_the_object():
+    text, complete = extract_json_object('x {"tasks": ["a } b", "c \\" {"]} y')
+    assert complete
+    assert text == '{"tasks": ["a } b", "c \\" {"]}'
+
+
+def test_truncated_object_is_reported_incomplete():
+    text, complete = extract_json_object('{"tasks": ["a", "b')
+    assert not complete
+    assert text == '{"tasks": ["a", "b'
+
+
+def test_trailing_commas_are_removed():
+    assert repair_json('{"tasks": ["a", "b",], }') == ['{"tasks": ["a", "b"] }']
+    result, stage = parse('{"title": "T", "tasks": ["a", "b",],}')
+    assert stage == "repaired"
+    assert result["tasks"] == ["a", "b"]
+
+
+def test_task_cut_by_max_tokens_is_dropped():
+    result, stage = parse('{"title": "T", "tasks": ["Buy milk", "Call the ba')
+    assert stage == "repaired"
+    assert result["tasks"] == ["Buy milk"]
+
+
+def test_truncated_after_complete_element_is_closed():
+    result, stage = parse('{"title": "T", "tasks": ["Buy milk", "Call the bank"')
+    assert stage == "repaired"
+    assert result["tasks"] == ["Buy milk", "Call the bank"]
+
+
+def test_smart_quotes_are_repaired():
+    result, stage = parse('{“title”: “T”, “tasks”: [“Buy milk”]}')
+    assert stage == "repaired"
+    assert result["tasks"] == ["Buy milk"]
+
+
+def test_no_object_fails_without_reask():
+    assert parse("I cannot help with that.") == (None, "failed")
+
+
+def test_valid_answer_does_not_reask():
+    parser = ResponseParser("test")
+    llm = RepairLLM("{}")
+    result = parser.parse_or_reask('{"tasks": ["a"]}', TodoSchema, "Default", llm)
+    assert result == {"title": "Default", "tasks": ["a"]}
+    assert llm.calls == []
+    assert parser.stats()["json"] == 1
+
+
+def test_single_reask_recovers():
+    parser = ResponseParser("test")
+    llm = RepairLLM('{"title": "Fixed", "tasks": ["a"]}')
+    result = asyncio.run(parser.aparse_or_reask("tasks: a", TodoSchema, "Default", llm))
+    assert result == {"title": "Fixed", "tasks": ["a"]}
+    assert len(llm.calls) == 1
+    # The broken answer is shown to the repair model
+    assert llm.calls[0][-1] == ("user", "tasks: a")
+    stats = parser.stats()
+    assert (stats["reasked"], stats["failed"], stats["total"]) == (1, 0, 1)
+
+
+def test_failed_reask_raises_and_is_counted():
+    parser = ResponseParser("test")
+    llm = RepairLLM("still not JSON")
+    with pytest.raises(ResponseParseError):
+        parser.parse_or_reask("tasks: a", TodoSchema, "Default", llm)
+    assert len(llm.calls) == 1
+    stats = parser.stats()
+    assert (stats["failed"], stats["total"], stats["failure_rate"]) == (1, 1, 1.0)
+
+
+def test_schema_violation_is_counted():
+    parser = ResponseParser("test")
+    assert parser.parse('{"tasks": []}', TodoSchema, "Default") is None
+    assert parser.stats()["validation_errors"] >= 1
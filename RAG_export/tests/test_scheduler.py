@@ -0,0 +1,39 @@
+from daily_planner_service.scheduler import DayScheduler
+from daily_planner_service.strict_extractor import parse_clock_time
+
+
+def minutes(duration):
+    # format_duration output: "45 min", "2h", "1h30"
+    if duration.endswith(" min"):
+        return int(duration[:-4])
+    hours, _, rest = duration.partition("h")
+    return int(hours) * 60 + int(rest or 0)
+
+
+def slots(plan):
+    return [(parse_clock_time(task["time"]), minutes(task["duration"])) for task in plan["tasks"]]
+
+
+def test_overbooked_day_ends_in_the_window_with_long_breaks():
+    scheduler = DayScheduler()
+    plan = scheduler.schedule({"title": "t", "tasks": [{"activity": f"Task {i} (3h)"} for i in range(8)]})
+    assert max(start + duration for start, duration in slots(plan)) <= scheduler.day_end
+
+
+def test_pinned_times_are_moved_into_the_window():
+    scheduler = DayScheduler()
+    plan = scheduler.schedule({"title": "t", "tasks": [
+        {"activity": "Wake up", "time": "06:30"},
+        {"activity": "Read (1h)", "time": "23:30"}
+    ]})
+    assert [task["time"] for task in plan["tasks"]] == ["08:00", "21:00"]
+
+
+def test_late_pinned_task_gets_its_time_once_finished():
+    scheduler = DayScheduler()
+    tasks = [{"activity": "A (45 min)"}, {"activity": "B", "time": "08:30"}, {"activity": "C"}]
+    day = scheduler.new_schedule()
+    # In arrival order A takes 08:00-08:45, so B is provisionally moved
+    assert [day.place(task)["time"] for task in tasks][1] != "08:30"
+    plan = scheduler.schedule({"title": "t", "tasks": tasks})
+    assert {task["activity"]: task["time"] for task in plan["tasks"]}["B"] == "08:30"
@@ -0,0 +1,55 @@
+import asyncio
+
+from rag_common.deadline import Deadline, bind_deadline, current_deadline
+from rag_common.metrics import bind_request_stages, observe_stage
+from rag_common.singleflight import SingleFlight
+
+
+def test_join_after_cancel_starts_a_new_call():
+    async def main():
+        flight = SingleFlight()
+        runs = []
+
+        async def work():
+            runs.append(1)
+            await asyncio.sleep(0.05)
+            return {"run": len(runs)}
+
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0)
+        # The abandoned call is still unwinding: a new caller must not join it
+        result = await flight.do("k", work)
+        assert result == {"run": 2}
+        assert flight.stats()["abandoned"] == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(main())
+
+
+def test_shared_work_runs_outside_the_leader_context():
+    async def main():
+        flight = SingleFlight()
+        seen = {}
+
+        async def work():
+            seen["deadline"] = current_deadline()
+            observe_stage("llm_total", 0.5)
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        async def request():
+            deadline = Deadline(10.0)
+            stages = {}
+            bind_deadline(deadline)
+            bind_request_stages(stages)
+            await flight.do("k", work)
+            return deadline, stages
+
+        (leader, leader_stages), (follower, follower_stages) = await asyncio.gather(request(), request())
+        assert seen["deadline"] is not leader and seen["deadline"].expires_at is None
+        # Both requests get the timings of the shared work
+        assert leader_stages == follower_stages == {"llm_total": 0.5}
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from rag_common.compact_format import CompactTaskParser, parse_compact
+from rag_common.streaming import IncrementalTaskParser
+
+CHUNK_SIZES = [1, 2, 3, 5, 8, 13, 1000]
+
+PLAN_FIELDS = ["time", "duration", "activity", "description"]
+
+JSON_PAYLOAD = (
+    'Sure!\n```json\n{"title": "Ma journée \\"calme\\"", "tasks": [\n'
+    '  {"time": "07:00", "duration": "45 min", "activity": "Yoga", "description": "tapis {bleu}"},\n'
+    '  {"time": null, "duration": "1h", "activity": "Lire \\"Dune\\"", "description": "chap. [3]\\\\4"},\n'
+    '  {"time": "12:30", "duration": "1h", "activity": "Déjeuner", "description": null}\n'
+    ']}\n```'
+)
+
+COMPACT_PAYLOAD = (
+    "TITLE|Ma journée : Sport\n"
+    "07:00|45 min|Yoga|-\n"
+    "- 12:30|1h|Déjeuner|avec Paul | Marie\n"
+    "\n"
+    "18:00|-|Course|5 km"
+)
+
+
+def feed_in_chunks(parser, payload, size):
+    events = []
+    for start in range(0, len(payload), size):
+        events += parser.feed(payload[start:start + size])
+    return events + parser.finish()
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_json_events_do_not_depend_on_chunk_boundaries(size):
+    parser = IncrementalTaskParser()
+    events = feed_in_chunks(parser, JSON_PAYLOAD, size)
+    plan = json.loads(JSON_PAYLOAD[JSON_PAYLOAD.index("{"):JSON_PAYLOAD.rindex("}") + 1])
+    assert events == [("title", plan["title"])] + [("task", task) for task in plan["tasks"]]
+    assert parser.buffer == JSON_PAYLOAD
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_json_string_tasks_with_escaped_quotes(size):
+    payload = '{"title": "T", "tasks": ["Say \\"hi\\"", "a, b]", "back\\\\slash"]}'
+    events = feed_in_chunks(IncrementalTaskParser(), payload, size)
+    assert events == [("title", "T"), ("task", 'Say "hi"'), ("task", "a, b]"), ("task", "back\\slash")]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_json_truncated_element_is_not_emitted(size):
+    payload = '{"title": "T", "tasks": ["done", {"activity": "cut'
+    assert feed_in_chunks(IncrementalTaskParser(), payload, size) == [("title", "T"), ("task", "done")]
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_compact_events_do_not_depend_on_chunk_boundaries(size):
+    parser = CompactTaskParser(PLAN_FIELDS)
+    events = feed_in_chunks(parser, COMPACT_PAYLOAD, size)
+    plan = parse_compact(COMPACT_PAYLOAD, PLAN_FIELDS)
+    assert events == [("title", plan["title"])] + [("task", task) for task in plan["tasks"]]
+    # The last line has no newline: it comes from finish()
+    assert events[-1] == ("task", {"time": "18:00", "duration": None, "activity": "Course", "description": "5 km"})
+    assert events[2][1]["description"] == "avec Paul | Marie"
+
+
+@pytest.mark.parametrize("size", CHUNK_SIZES)
+def test_compact_single_field_tasks(size):
+    payload = "TITLE|Courses\nLait\n2. Oeufs\r\nPain"
+    events = feed_in_chunks(CompactTaskParser(), payload, size)
+    assert events == [("title", "Courses"), ("task", "Lait"), ("task", "Oeufs"), ("task", "Pain")]
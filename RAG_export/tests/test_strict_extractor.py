@@ -0,0 +1,54 @@
+from daily_planner_service.strict_extractor import StrictPlanExtractor
+
+
+def extract(prompt, language="en"):
+    return StrictPlanExtractor().extract(prompt, language)
+
+
+def test_named_time_is_not_matched_inside_a_word():
+    plan, confidence = extract("- réunion l'après-midi\n- sport le soir", "fr")
+    assert plan["tasks"][0]["time"] is None
+    assert plan["tasks"][0]["activity"] == "Réunion l'après-midi"
+    # Times of day are left to the LLM
+    assert confidence == 0.0
+
+
+def test_dangling_connector_is_stripped():
+    plan, _ = extract("- 2 heures de piano\n- 1h de lecture", "fr")
+    assert [(task["activity"], task["duration"], task["time"]) for task in plan["tasks"]] == [
+        ("Piano", "2h", None), ("Lecture", "1h", None)
+    ]
+
+
+def test_leftover_digits_reject_the_plan():
+    plan, confidence = extract("1. Wake up at 6:30am\n2. Gym for 1 hour\n3. Work from 9 to 5")
+    assert plan["tasks"][0]["time"] == "06:30"
+    assert plan["tasks"][1] == {"time": None, "duration": "1h", "activity": "Gym", "description": None}
+    assert confidence == 0.0
+
+
+def test_lowest_item_decides():
+    _, confidence = extract("Meeting at 2pm; lunch at 12:30; call Bob at 4")
+    assert confidence < StrictPlanExtractor().min_confidence
+
+
+def test_clean_list_is_accepted():
+    plan, confidence = extract("- Réveil à 7h\n- sport pendant 45 min\n- déjeuner à midi", "fr")
+    assert [(task["time"], task["duration"], task["activity"]) for task in plan["tasks"]] == [
+        ("07:00", None, "Réveil"), (None, "45 min", "Sport"), ("12:00", None, "Déjeuner")
+    ]
+    assert confidence == 1.0
+
+
+def test_free_form_comma_sentence_goes_to_the_llm():
+    extractor = StrictPlanExtractor()
+    assert extractor.try_extract("plan my day: work, exercise and read", "en") is None
+    assert extractor.try_extract("Demain : travail, sport, lecture", "fr") is None
+
+
+def test_timed_inline_list_is_accepted():
+    plan, confidence = extract("Demain : sport à 7h, travail pendant 2h, déjeuner à midi", "fr")
+    assert [(task["time"], task["duration"], task["activity"]) for task in plan["tasks"]] == [
+        ("07:00", None, "Sport"), (None, "2h", "Travail"), ("12:00", None, "Déjeuner")
+    ]
+    assert confidence >= StrictPlanExtractor().min_confidence
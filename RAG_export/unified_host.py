@@ -0,0 +1,83 @@
+"""
+Single-process host for both RAG services.
+
+RAGEngine and DailyRAGEngine share one embedding model, one embedding
+batcher/cache and one ChromaDB client (a collection per service) instead
+of each loading its own torch runtime and MiniLM copy.
+
+Usage (from RAG_export/):
+    python unified_host.py                   # To-Do on :8000, Daily Planner on :8001
+    python unified_host.py --single-port 8000  # both apps mounted under /todo and /daily
+
+The separate-port mode (python main.py in each service folder) still works
+unchanged.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rag_common.shared import enable_shared_resources
+
+# Must happen before either engine is built
+enable_shared_resources()
+
+from fastapi import FastAPI
+
+from daily_planner_service import main as daily_main
+from rag_service import main as todo_main
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Starlette does not run the lifespan of mounted sub-apps
+    todo_main.engine_loader.start()
+    daily_main.engine_loader.start()
+    yield
+
+
+app = FastAPI(title="RAG Services (unified host)", lifespan=lifespan)
+app.mount("/todo", todo_main.app)
+app.mount("/daily", daily_main.app)
+
+
+@app.get("/health")
+async def health_check():
+    return {
+        "status": "healthy",
+        "todo": todo_main.engine_loader.state,
+        "daily": daily_main.engine_loader.state
+    }
+
+
+async def serve_both(host: str, todo_port: int, daily_port: int):
+    """
+    Serve each app on its usual port from the same process and event loop.
+    """
+    import uvicorn
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(todo_main.app, host=host, port=todo_port)),
+        uvicorn.Server(uvicorn.Config(daily_main.app, host=host, port=daily_port)),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--todo-port", type=int, default=8000)
+    parser.add_argument("--daily-port", type=int, default=8001)
+    parser.add_argument("--single-port", type=int, default=None,
+                        help="Serve both apps on one port under /todo and /daily")
+    args = parser.parse_args()
+
+    if args.single_port is not None:
+        import uvicorn
+        uvicorn.run(app, host=args.host, port=args.single_port)
+    else:
+        asyncio.run(serve_both(args.host, args.todo_port, args.daily_port))